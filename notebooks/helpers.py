@@ -22,17 +22,25 @@ def show_num_contours(num_contours, ax, y=1.06):
          va='bottom', ha='right', size=6, fontstyle='italic', color='0.6')
 
 def load_datasets(dataset_ids=_ALL_DATASETS, include_random=True, 
-    dir='../data/phrase-contours'):
+    dir='../data/phrase-contours', format='csv'):
+    """Load the contour subsets. Use `format='npz'` to load the (much faster)
+    npz files; run `python -m src.contour_io` to generate those first."""
     import pandas as pd
     import sys
     sys.path.append('../')
     from src.contours import normalized_contours
+    from src.contour_io import read_contours
+
+    def load(name):
+        if format == 'csv':
+            return pd.read_csv(f'{dir}/{name}.csv', index_col=0)
+        return read_contours(f'{dir}/{name}.{format}')
 
     dfs = {}
     contours = {}
     for dataset_id in dataset_ids:
-        dfs[dataset_id] = pd.read_csv(f'{dir}/{dataset_id}-phrase-contours-subset.csv', index_col=0)
-        dfs[f'{dataset_id}-random'] = pd.read_csv(f'{dir}/{dataset_id}-random-contours-subset.csv', index_col=0)
+        dfs[dataset_id] = load(f'{dataset_id}-phrase-contours-subset')
+        dfs[f'{dataset_id}-random'] = load(f'{dataset_id}-random-contours-subset')
         contours[dataset_id] = normalized_contours(dfs[dataset_id])
         contours[f'{dataset_id}-random'] = normalized_contours(dfs[f'{dataset_id}-random'])
     return dfs, contours
@@ -0,0 +1,2 @@
+"""Code for generating and analyzing the contour and differentiae data.
+Run the modules from the root directory, e.g. `python -m src.cantus_filters`."""
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""Loading the chants of the CantusCorpus (`chant.csv`).
+
+The chants table has almost half a million rows with long text fields, but
+the analyses only need a couple of columns. The functions in this module only
+read those columns, and store repeated strings (mode, genre, siglum) as
+categoricals, which reduces the memory used several times. The table can
+also be read and filtered in chunks, so that it is never in memory as a
+whole. For example, pass `iter_chants(chunksize=50000)` to
+:meth:`src.cantus_filters.FilterPipeline.apply_chunks`, as
+:mod:`src.generate_differentiae` does, or combine the chunks using
+:func:`src.cantus_filters.concat_chunks`. Alternatively, the table can be read
+at once using `read_chants(cache=True)`, which stores it in a binary cache
+(a pickle in `.cache/cantuscorpus`) that is much faster to load the next time.
+Both need the CantusCorpus in `datasets/cantuscorpus`.
+"""
+import os
+import tempfile
+import pandas as pd
+
+from .helpers import md5checksum
+from .helpers import md5string
+
+_CUR_DIR = os.path.dirname(__file__)
+_ROOT_DIR = os.path.abspath(os.path.join(_CUR_DIR, os.path.pardir))
+_CHANTS_PATH = os.path.join(_ROOT_DIR, 'datasets', 'cantuscorpus', 'csv',
+    'chant.csv')
+_CACHE_DIR = os.path.join(_ROOT_DIR, '.cache', 'cantuscorpus')
+
+# Increase this whenever the format of the cached files changes
+_CACHE_VERSION = 1
+
+# All columns used by the filters in src.cantus_filters and by
+# src.generate_differentiae
+CHANT_COLUMNS = ['incipit', 'cantus_id', 'mode', 'siglum', 'genre_id',
+    'full_text', 'full_text_manuscript', 'volpiano']
+
+# Columns with few distinct values, stored as categoricals
+CATEGORICAL_COLUMNS = ['mode', 'siglum', 'genre_id']
+
+def _read_csv_options(path: str, columns: list = CHANT_COLUMNS,
+    categorical: bool = True) -> dict:
+    """Options for `pd.read_csv` that select the columns (and the index, the
+    first column) and set their dtypes. All columns are read as strings, also
+    if they look like numbers, so that every chunk has the same dtypes."""
+    header = pd.read_csv(path, nrows=0).columns
+    index_col = header[0]
+    if columns is None:
+        columns = list(header[1:])
+    missing = [column for column in columns if column not in header]
+    if len(missing) > 0:
+        raise ValueError(f'Columns {missing} do not occur in {path}')
+    dtype = {column: str for column in columns}
+    if categorical:
+        dtype.update({column: 'category' for column in columns
+                      if column in CATEGORICAL_COLUMNS})
+    return dict(index_col=index_col, usecols=[index_col] + list(columns),
+        dtype=dtype)
+
+def _cache_path(path: str, columns: list, categorical: bool,
+    cache_dir: str) -> str:
+    """Cache file of a chants table, keyed by the checksum of the file and
+    the options used to read it"""
+    options = f'{_CACHE_VERSION}-{columns}-{categorical}'
+    key = f'{md5checksum(path)}-{md5string(options)}'
+    return os.path.join(cache_dir, f'chants-{key}.pkl')
+
+def read_chants(path: str = _CHANTS_PATH, columns: list = CHANT_COLUMNS,
+    categorical: bool = True, cache: bool = False,
+    cache_dir: str = _CACHE_DIR) -> pd.DataFrame:
+    """Read the chants, but only the columns that are needed.
+
+    Parameters
+    ----------
+    path : str, optional
+        The path to the chants table, by default
+        `datasets/cantuscorpus/csv/chant.csv`
+    columns : list, optional
+        The columns to read (besides the index), by default
+        :data:`CHANT_COLUMNS`. Use `None` to read all columns.
+    categorical : bool, optional
+        Store the columns in :data:`CATEGORICAL_COLUMNS` as categoricals, by
+        default True
+    cache : bool, optional
+        Store the table in a binary cache after reading it, and read it from
+        the cache if the file has been read before, by default False
+    cache_dir : str, optional
+        The cache directory, by default `.cache/cantuscorpus`
+
+    Returns
+    -------
+    pd.DataFrame
+        The chants
+    """
+    if cache:
+        cache_path = _cache_path(path, columns, categorical, cache_dir)
+        if os.path.exists(cache_path):
+            return pd.read_pickle(cache_path)
+
+    options = _read_csv_options(path, columns=columns, categorical=categorical)
+    chants = pd.read_csv(path, **options)
+
+    if cache:
+        # Write atomically, so that a partially written file is never read
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        handle, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        os.close(handle)
+        chants.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+    return chants
+
+def iter_chants(path: str = _CHANTS_PATH, columns: list = CHANT_COLUMNS,
+    categorical: bool = True, chunksize: int = 50000):
+    """Read the chants in chunks of `chunksize` rows; see :func:`read_chants`
+    for the other options. Every chunk has its own categories; use
+    :func:`src.cantus_filters.concat_chunks` to combine chunks.
+
+    Yields
+    ------
+    pd.DataFrame
+        The chunks
+    """
+    options = _read_csv_options(path, columns=columns, categorical=categorical)
+    for chunk in pd.read_csv(path, chunksize=chunksize, **options):
+        yield chunk
@@ -29,8 +29,20 @@ Filter Chants Without Simple Mode:
 Include only chants with simple modes: 1-8, not transposed
  * include_transposed=False
  > 25.28% removed (1264 out of 5000; 3736 remain)
+
+The module imports other modules in `src`, so run these examples as a module 
+from the root directory: `python -m src.cantus_filters`.
 """
-from typing import Callable, Dict
+from typing import Callable, Dict, Iterable
+import numpy as np
+import pandas as pd
+from .volpiano import volpiano_characters
+from .volpiano import clean_volpiano
+from .volpiano import VolpianoAccessor # registers the .vp accessor
+from .volpiano import HAS_NOTES, HAS_ONLY_VOLPIANO_CHARS, HAS_F_CLEF
+from .volpiano import STARTS_WITH_G_CLEF, HAS_MISSING_PITCHES
+from .volpiano import HAS_WORD_BOUNDARY, HAS_VOLPIANO
+from .duplicates import volpiano_hashes
 
 # Filter helpers
 # --------------
@@ -103,217 +115,338 @@ def log_filter(func: Callable):
         return filtered_df
     return func_wrapper
 
+def mask_filter(func: Callable):
+    """Decorator for filters that compute a boolean mask of the rows to keep, 
+    rather than the filtered dataframe. The decorated filter can be used like
+    any other filter decorated by :func:`log_filter`, but it can also be used
+    in a :class:`FilterPipeline`::
 
-# Volpiano
-# --------
-
-def volpiano_characters(*groups):
-    """Returns accepted Volpiano characters
-
-    The characters are organized in several groups: bars, clefs, liquescents,
-    naturals, notes, flats, spaces and others. You can pass these group
-    names as optional arguments to return only those subsets:
+        @mask_filter
+        def my_filter(df, my_arg=1):
+            # ...
+            return mask
 
-    >>> volpiano_characters()
-    '3456712()ABCDEFGHJKLMNOPQRSIWXYZ89abcdefghjklmnopqrsiwxyz.,-[]{¶'
-    >>> volpiano_characters('naturals', 'flats')
-    'IWXYZiwxyz'
+    The mask function itself is available as `my_filter.mask`. Filters whose
+    mask of a row depends on other rows (like removing duplicates) should set
+    `my_filter.row_wise = False`, so that they are not applied to chunks of 
+    a dataframe separately (see :meth:`FilterPipeline.apply_chunks`).
 
     Parameters
     ----------
-    *groups : [str]
-        The groups to include: 'bars', 'clefs', 'liquescents', 'naturals', 
-        'notes', 'flats', 'spaces' or 'others'
-
+    func : Callable
+        A function returning a boolean mask (a series or array) of the rows
+        of the dataframe that should be kept
+    
     Returns
     -------
-    str
-       A string with accepted Volpiano characters
+    Callable
+        The wrapper
     """
-    symbols = {
-        'bars': '34567',
-        'clefs': '12',
-        'liquescents': '()ABCDEFGHJKLMNOPQRS',
-        'naturals': 'IWXYZ',
-        'notes': '89abcdefghjklmnopqrs',
-        'flats': 'iwxyz',
-        'spaces': '.,-',
-        'others': "[]{¶",
-    }
-    if not groups:
-        groups = symbols.keys()
-    return "".join((symbols[key] for key in groups))
-
-def clean_volpiano(volpiano, allowed_chars=None, keep_boundaries=False, 
-    neume_boundary=' ', syllable_boundary=' ', word_boundary=' ',
-    keep_bars=False, allowed_bars='345', bar='|'):
-    """Extracts only the allowed characters (and optionally boundaries) from a 
-    volpiano string.
-
-    By default, the allowed characters are only notes and accidentals. The 
-    cleaning then amounts to removing clefs, bars, etc. The function can retain 
-    boundaries, if `add_boundaries=True`. Neume, syllable and word boundaries 
-    are then replaced by special boundary markers (`neume_boundary`, 
-    `syllable_boundary` and `word_boundary`).
-
-    >>> volpiano = '1---fg---h--ij-h-3-f-4'
-    >>> clean_volpiano(volpiano)
-    'fghijhf'
-    >>> clean_volpiano(volpiano, keep_boundaries=True)
-    ' fg h ij h f '
-    >>> clean_volpiano(volpiano, keep_bars=True)
-    'fghijh|f|'
-    >>> bounds = dict(neume_boundary='.', syllable_boundary='-', word_boundary='$')
-    >>> clean_volpiano(volpiano, keep_boundaries=True, **bounds)
-    '$fg$h-ij.h-f.'
-    >>> clean_volpiano(volpiano, keep_boundaries=True, keep_bars=True, **bounds)
-    '$fg$h-ij.h|-f|.'
+    def filter_func(df, logger=None, **kwargs):
+        return df[func(df, **kwargs)]
+    filter_func.__name__ = func.__name__
+    filter_func.__doc__ = func.__doc__
+    wrapper = log_filter(filter_func)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.mask = func
+    wrapper.row_wise = True
+    return wrapper
+
+# Columns that filters can use if the dataframe does not contain them; a
+# FilterPipeline computes them at most once.
+_DERIVED_COLUMNS = {
+    'volpiano_features': lambda chants: chants['volpiano'].vp.features(),
+    'note_hash': lambda chants: pd.Series(volpiano_hashes(chants['volpiano']),
+        index=chants['volpiano'].index),
+}
+
+def get_volpiano_features(chants):
+    """Returns the volpiano feature bitmasks of all chants (see 
+    :func:`src.volpiano.volpiano_features`). If the dataframe has a column
+    `volpiano_features`, for example because the features were stored with 
+    the corpus, that column is used; otherwise the features are computed."""
+    if 'volpiano_features' in chants:
+        return chants['volpiano_features']
+    return _DERIVED_COLUMNS['volpiano_features'](chants)
+
+def get_note_hashes(chants):
+    """Returns 64-bit hashes of the notes of all chants (see 
+    :func:`src.duplicates.volpiano_hashes`). Like the volpiano features, the 
+    hashes are taken from a column `note_hash` if the dataframe has one."""
+    if 'note_hash' in chants:
+        return chants['note_hash']
+    return _DERIVED_COLUMNS['note_hash'](chants)
+
+class _FilteredColumns:
+    """Lazy view on the rows of a dataframe that passed all filters so far. 
+    Columns are only selected when a filter accesses them, as 
+    `view['column']` or `view.column`, and the dataframe itself is never 
+    copied. Derived columns are computed only once, for the rows in the 
+    first view that accesses them, and stored in `derived`, which is shared 
+    by all views on the dataframe. (Later views contain fewer rows.)"""
+
+    def __init__(self, df, keep, derived):
+        self._df = df
+        self._keep = keep
+        self._derived = derived
+        self._columns = {}
+
+    def __contains__(self, column):
+        return column in self._df.columns or column in _DERIVED_COLUMNS
+    
+    def __getitem__(self, column):
+        if column not in self._columns:
+            if column in self._df.columns:
+                values = self._df[column][self._keep]
+            elif column in self._derived:
+                computed_for, computed = self._derived[column]
+                values = computed[self._keep[computed_for]]
+            else:
+                values = _DERIVED_COLUMNS[column](self)
+                self._derived[column] = (self._keep.copy(), values)
+            self._columns[column] = values
+        return self._columns[column]
+
+    def __getattr__(self, name):
+        if not name.startswith('_') and name in self:
+            return self[name]
+        raise AttributeError(name)
+
+    def __len__(self):
+        return int(self._keep.sum())
+
+class FilterPipeline:
+    """A sequence of filters that is applied at once. The masks of the filters
+    are only computed when the pipeline is applied, and every mask only for 
+    the rows that passed all earlier filters. The dataframe is sliced only 
+    once, at the end, but the pipeline logs exactly the same as applying the 
+    filters one by one.
+
+    >>> import pandas as pd
+    >>> chants = pd.read_csv('datasets/cantuscorpus/csv/chant-demo-sample.csv')
+    >>> pipeline = FilterPipeline()
+    >>> pipeline.add(filter_chants_without_volpiano)
+    >>> pipeline.add(filter_chants_by_genre, include=['genre_a'])
+    >>> df = pipeline.apply(chants)
+    Filter Chants Without Volpiano:
+    Exclude all chants with an empty volpiano field
+     > 0.00% removed (0 out of 5000; 5000 remain)
+    Filter Chants By Genre:
+    Include only chants with a certain genre
+     * include=['genre_a']
+     > 58.10% removed (2905 out of 5000; 2095 remain)
 
     Parameters
     ----------
-    volpiano : str
-        The volpiano string
-    allowed_chars : str, optional
-        A string with all allowed characters. By default this is None, which 
-        corresponds to notes, liquescents, flats and naturals
-    keep_boundaries : bool, optional
-        If true, keeps the boundaries, by default False
-    neume_boundary : str, optional
-        Neume boundary marker, by default ' '
-    syllable_boundary : str, optional
-        Syllable boundary markers, by default ' '
-    word_boundary : str, optional
-        Word boundary marker, by default ' '
-    keep_bars : bool, optional
-        Whether to keep barlines, by default False
-    allowed_bars : str, optional
-        Barlines, by default single, double and bold barlines ('345')
-    bar : str, optional
-        Bar marker, by default '|'
-
-    Returns
-    -------
-    str
-        A clean volpiano string
+    filters : list, optional
+        A list of filters decorated by :func:`mask_filter`, or of tuples 
+        `(filter, kwargs)`, by default None
     """
-    if not allowed_chars:
-        allowed_chars = volpiano_characters('liquescents', 'notes', 'flats', 'naturals')    
-
-    if keep_boundaries:
-        # Remove dashes from the allowed characters
-        allowed_chars = ''.join(c for c in allowed_chars if c not in '-')
-
-    output = ''
-    num_spaces = 0
-    boundaries = { 1: neume_boundary, 2: syllable_boundary, 3: word_boundary }
-    for char in volpiano:
-        if char in allowed_chars:
-            if num_spaces > 0:
-                output += boundaries[num_spaces]
-                num_spaces = 0
-            output += char
-
-        elif keep_boundaries and char == '-':
-            num_spaces += 1
-            if num_spaces == 3:
-                output += word_boundary
-                num_spaces = 0
-
-        elif keep_bars and char in allowed_bars:
-            output += bar
-    
-    # Handle spaces at the end
-    if num_spaces > 0:
-        output += boundaries[num_spaces]
-        
-    return output
+
+    def __init__(self, filters: list = None):
+        self.filters = []
+        for item in filters or []:
+            if isinstance(item, tuple):
+                self.add(item[0], **item[1])
+            else:
+                self.add(item)
+
+    def add(self, func: Callable, **kwargs):
+        """Add a filter, decorated by :func:`mask_filter`, to the pipeline"""
+        if not hasattr(func, 'mask'):
+            raise ValueError(
+                f'{func.__name__} is not a mask filter and cannot be added '
+                'to a FilterPipeline')
+        self.filters.append((func, kwargs))
+
+    def _mask(self, df) -> tuple:
+        """Returns a boolean array of all rows that pass all filters, and an
+        array with the number of rows before and after every filter"""
+        keep = np.ones(len(df), dtype=bool)
+        derived = {}
+        counts = np.zeros((len(self.filters), 2), dtype=int)
+        for i, (func, kwargs) in enumerate(self.filters):
+            counts[i, 0] = keep.sum()
+            mask = func.mask(_FilteredColumns(df, keep, derived), **kwargs)
+            keep[keep] = np.asarray(mask == True, dtype=bool)
+            counts[i, 1] = keep.sum()
+        return keep, counts
+
+    def _log(self, counts, logger: Callable = print):
+        for (func, kwargs), (before, after) in zip(self.filters, counts):
+            log_filter_header(func.mask, kwargs, logger=logger)
+            log_filter_results(int(before), int(after), logger=logger)
+
+    def mask(self, df, logger: Callable = False):
+        """Returns a boolean array of all rows that pass all filters, and 
+        optionally logs the results of every filter"""
+        keep, counts = self._mask(df)
+        if not logger is False:
+            self._log(counts, logger=logger)
+        return keep
+
+    def apply(self, df, logger: Callable = print):
+        """Applies all filters to a dataframe.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The dataframe to filter
+        logger : Callable, optional
+            The logger function, by default print. Setting it to `False`
+            disables logging.
+
+        Returns
+        -------
+        pd.DataFrame
+            The rows of the dataframe that pass all filters
+        """
+        return df[self.mask(df, logger=logger)]
+
+    def apply_chunks(self, chunks, logger: Callable = print):
+        """Applies all filters to a sequence of dataframes, such as the chunks
+        returned by :func:`src.cantus_corpus.iter_chants`, and concatenates
+        the results. Only one chunk is in memory at a time (besides the rows
+        that passed the filters). The result and the log are the same as when
+        the filters are applied to all chunks at once, but filters whose 
+        results depend on other rows (`row_wise=False`) are not allowed.
+
+        Parameters
+        ----------
+        chunks : iterable
+            The dataframes to filter
+        logger : Callable, optional
+            The logger function, by default print. Setting it to `False`
+            disables logging.
+
+        Returns
+        -------
+        pd.DataFrame
+            The rows of all chunks that pass all filters
+        """
+        for func, _ in self.filters:
+            if not func.row_wise:
+                raise ValueError(f'{func.__name__} cannot be applied to '
+                    'chunks of a dataframe separately')
+        results = []
+        counts = np.zeros((len(self.filters), 2), dtype=int)
+        for chunk in chunks:
+            keep, chunk_counts = self._mask(chunk)
+            counts += chunk_counts
+            results.append(chunk[keep])
+        if not logger is False:
+            self._log(counts, logger=logger)
+        return concat_chunks(results)
+
+def concat_chunks(chunks: Iterable, columns: list = None) -> pd.DataFrame:
+    """Concatenates dataframes, such as chunks of a CSV file. Unlike 
+    `pd.concat`, categorical columns remain categorical when the chunks have 
+    different categories: the union of all categories is used. The chunks
+    can also be an iterator, such as :func:`src.cantus_corpus.iter_chants`.
+    If there are no chunks, an empty dataframe with the given `columns` is
+    returned."""
+    chunks = list(chunks)
+    if len(chunks) == 0:
+        return pd.DataFrame(columns=columns)
+    for column, dtype in chunks[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals(
+                [chunk[column] for chunk in chunks], ignore_order=True).categories
+            chunks = [chunk.assign(**{column: 
+                        chunk[column].cat.set_categories(categories)}) 
+                      for chunk in chunks]
+    return pd.concat(chunks)
+
 
 # Filters
 # -------
 
-@log_filter
-def filter_chants_without_volpiano(chants, logger=None):
+@mask_filter
+def filter_chants_without_volpiano(chants):
     """Exclude all chants with an empty volpiano field"""
     has_volpiano = chants.volpiano.isnull() == False
-    return chants[has_volpiano]
+    return has_volpiano
 
-@log_filter
-def filter_chants_without_notes(chants, logger=None):
+@mask_filter
+def filter_chants_without_notes(chants):
     """Exclude all chants without notes"""
-    notes_pattern = r'[89abcdefghjklmnopqrs\(\)ABCDEFGHJKLMNOPQRS]+'
-    contains_notes = chants.volpiano.str.contains(notes_pattern) == True
-    return chants[contains_notes]
+    features = get_volpiano_features(chants)
+    contains_notes = (features & HAS_NOTES) > 0
+    return contains_notes
 
-@log_filter
-def filter_chants_with_nonvolpiano_chars(chants, logger=None):
+@mask_filter
+def filter_chants_with_nonvolpiano_chars(chants):
     """Exclude all chants with non-volpiano characters"""
-    volpiano_chars = (
-        r'3456712\(\)'
-        r'ABCDEFGHJKLMNOPQRSIWXYZ89'
-        r'abcdefghjklmnopqrsiwxyz'
-        r'\.\,\-\[\]\{\¶')
-    pattern = f'^[{volpiano_chars}]*$'
-    contains_no_other_chars = chants.volpiano.str.match(pattern) == True
-    return chants[contains_no_other_chars]
+    features = get_volpiano_features(chants)
+    contains_no_other_chars = (features & HAS_ONLY_VOLPIANO_CHARS) > 0
+    return contains_no_other_chars
 
-@log_filter
-def filter_chants_with_F_clef(chants, logger=None):
+@mask_filter
+def filter_chants_with_F_clef(chants):
     """Exclude chants that contain an F clef"""
-    contains_F_clef = chants.volpiano.str.contains('2') == True
-    return chants[contains_F_clef == False]
+    features = get_volpiano_features(chants)
+    contains_F_clef = (features & HAS_F_CLEF) > 0
+    return contains_F_clef == False
 
-@log_filter
-def filter_chants_not_starting_with_G_clef(chants, logger=None):
+@mask_filter
+def filter_chants_not_starting_with_G_clef(chants):
     """Exclude chants that do not start with a G clef"""
-    starts_with_G_clef = chants.volpiano.str.startswith('1') == True
-    return chants[starts_with_G_clef]
+    features = get_volpiano_features(chants)
+    starts_with_G_clef = (features & STARTS_WITH_G_CLEF) > 0
+    return starts_with_G_clef
 
-@log_filter
-def filter_chants_with_missing_pitches(chants, logger=None):
+@mask_filter
+def filter_chants_with_missing_pitches(chants):
     """Filter chants with missing pitches: containing the substring 6------6"""
-    has_no_missing_pitches = chants.volpiano.str.contains('6------6') == False
-    return chants[has_no_missing_pitches]
+    features = get_volpiano_features(chants)
+    has_no_missing_pitches = (((features & HAS_VOLPIANO) > 0) 
+                              & ((features & HAS_MISSING_PITCHES) == 0))
+    return has_no_missing_pitches
 
-@log_filter
-def filter_chants_by_genre(chants, include=[], exclude=[], logger=None):
+@mask_filter
+def filter_chants_by_genre(chants, include=[], exclude=[]):
     """Include only chants with a certain genre"""
     genres = chants['genre_id'].unique().tolist()
     if len(include) == 0:
         include = [genre for genre in genres if genre not in exclude]
     has_right_genre = chants['genre_id'].isin(include)
-    return chants[has_right_genre]
+    return has_right_genre
 
-@log_filter
-def filter_chants_without_simple_mode(chants, include_transposed=True, 
-                                      logger=None):
+@mask_filter
+def filter_chants_without_simple_mode(chants, include_transposed=True):
     """Include only chants with simple modes: 1-8, not transposed"""
     pattern = '^[1-8]T?$' if include_transposed else '^[1-8]$'
     has_mode = chants['mode'].str.match(pattern) == True
-    return chants[has_mode]
+    return has_mode
 
-@log_filter
-def filter_chants_without_full_text(chants, logger=None):
+@mask_filter
+def filter_chants_without_full_text(chants):
     """Filter chants without full text"""
     has_full_text = chants.full_text.isna() == False
-    return chants[has_full_text]
+    return has_full_text
 
-@log_filter
-def filter_chants_where_incipit_is_full_text(chants, logger=None):
+@mask_filter
+def filter_chants_where_incipit_is_full_text(chants):
     """Filter chants whose incipit is identical to the full text"""
     incipit_neq_full_text = chants.full_text != chants.incipit
-    return chants[incipit_neq_full_text]
+    return incipit_neq_full_text
 
-@log_filter
-def filter_chants_with_duplicated_notes(chants, logger=None):
+@mask_filter
+def filter_chants_with_duplicated_notes(chants):
     """Filter duplicate chants: whose notes occur multiple times"""
-    is_duplicated = chants.volpiano.map(clean_volpiano).duplicated()
-    return chants[is_duplicated == False]
+    is_duplicated = get_note_hashes(chants).duplicated()
+    return is_duplicated == False
 
-@log_filter
-def filter_chants_without_word_boundary(chants, logger=None):
+# Whether a chant is a duplicate depends on the chants before it
+filter_chants_with_duplicated_notes.row_wise = False
+
+@mask_filter
+def filter_chants_without_word_boundary(chants):
     """Only include chants with '---' in their volpiano"""
-    constains_word_boundary = chants.volpiano.str.contains('---')
-    return chants[constains_word_boundary]
+    features = get_volpiano_features(chants)
+    constains_word_boundary = (features & HAS_WORD_BOUNDARY) > 0
+    return constains_word_boundary
 
 @log_filter
 def sample_one_chant_per_mode_and_cantus_id(chants, random_state=0, 
@@ -322,17 +455,38 @@ def sample_one_chant_per_mode_and_cantus_id(chants, random_state=0,
     # This results in a  set of unique (cantus_id, mode) pairs. So if there are
     # 4 chants of mode 7 and 2 of mode 3, the function returns two ids: one of 
     # a mode-7 chant, and one of a mode-3 chant.
-    ids = []
-    seed = random_state
-    unique_cantus_ids = chants['cantus_id'].unique()
-    for cantus_id in unique_cantus_ids:
-        subset = chants.query(f'cantus_id=="{cantus_id}"')
-        modes = subset['mode'].unique()
-        for mode in modes:
-            chant = subset.query(f'mode=="{mode}"').sample(random_state=seed)
-            ids.append(chant.index[0])
-            seed += 1
-    return chants.loc[ids, :]
+    #
+    # The groups are ordered by the first occurrence of the cantus_id, and 
+    # then by the first occurrence of the mode for that cantus_id. Every 
+    # group is sampled with its own seed (random_state, random_state + 1, ...)
+    # exactly like `group.sample(random_state=seed)`. Chants without cantus_id
+    # or mode are ignored.
+    cantus_ids, _ = pd.factorize(chants['cantus_id'])
+    modes, unique_modes = pd.factorize(chants['mode'])
+    positions = np.flatnonzero((cantus_ids >= 0) & (modes >= 0))
+    if len(positions) == 0:
+        return chants.iloc[[], :]
+    keys = cantus_ids[positions] * len(unique_modes) + modes[positions]
+    _, first, groups = np.unique(keys, return_index=True, return_inverse=True)
+    group_order = np.lexsort((first, cantus_ids[positions[first]]))
+
+    # Positions of all chants per group, in their original order
+    members = positions[np.argsort(groups, kind='stable')]
+    group_sizes = np.bincount(groups)
+    group_ends = np.cumsum(group_sizes)
+    group_starts = group_ends - group_sizes
+
+    # Reseeding a single RandomState is much faster than creating one for 
+    # every group, and groups with a single chant need no sampling at all
+    rs = np.random.RandomState()
+    sampled = []
+    for seed, group in enumerate(group_order, start=random_state):
+        start, end = group_starts[group], group_ends[group]
+        if end - start > 1:
+            rs.seed(seed)
+            start += rs.choice(end - start, size=1, replace=False)[0]
+        sampled.append(members[start])
+    return chants.iloc[sampled, :]
 
 if __name__ == '__main__':
     import doctest
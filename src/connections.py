@@ -0,0 +1,608 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""Analyses of the differentia-antiphon connections generated by
+:mod:`src.generate_differentiae`.
+
+The connections are a dataframe with columns `mode`, `siglum` and the
+positions `-15`, ..., `14`: the last 15 pitches of the differentia and the
+first 15 pitches of the antiphon, left-padded with missing values. A *window*
+is a slice of consecutive positions, say `-2, -1, 0, 1`. The entropy of the
+windows in a mode measures how predictable those pitches are.
+
+The connections can also be stored in a compact binary format (see
+:class:`ConnectionTable`), which stores the pitches as small integers relative
+to the final of the mode; run `python -m src.connections` to convert
+`data/differentiae/connections.csv`. All analyses accept both representations:
+
+>>> connections = read_connections('data/differentiae/connections.csv')
+>>> entropies = window_entropies(connections, window=4)
+>>> entropies.loc[-2].round(2)
+mode
+1    4.94
+2    4.17
+3    3.93
+4    5.35
+5    3.85
+6    2.52
+7    4.52
+8    3.99
+Name: -2, dtype: float64
+>>> samples = bootstrap_window_entropies(connections, window=4, num_samples=100)
+>>> samples.shape
+(100, 27, 8)
+>>> lower, upper = np.percentile(samples, [2.5, 97.5], axis=0)
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from .contour_io import load_npz
+
+def position_columns(connections: pd.DataFrame) -> list:
+    """Returns the pitch columns of a connections dataframe (the columns named
+    `-15`, ..., `14`), as stored in the dataframe"""
+    return [col for col in connections.columns
+            if str(col).lstrip('-').isdigit()]
+
+# The final (as a MIDI pitch) of modes 1-8
+MODE_FINALS = {1: 62, 2: 62, 3: 64, 4: 64, 5: 65, 6: 65, 7: 67, 8: 67}
+
+def mode_finals(modes) -> np.array:
+    """Returns the finals of a list of modes (integers or strings 1-8)"""
+    codes, categories = pd.factorize(np.asarray(modes))
+    try:
+        finals = np.array([MODE_FINALS[int(mode)] for mode in categories],
+            dtype=np.int16)
+    except (KeyError, ValueError, TypeError) as error:
+        raise ValueError(f'Connections should only have modes 1-8: {error}')
+    if (codes < 0).any():
+        raise ValueError('Connections should only have modes 1-8')
+    return finals[codes]
+
+def _encode_categories(categories: pd.Index) -> np.array:
+    """Categories as an integer array, or as an array of byte strings"""
+    categories = np.asarray(categories)
+    if categories.dtype.kind in 'iu':
+        return categories
+    return np.char.encode(categories.astype(str))
+
+class ConnectionTable(object):
+    """A compact representation of the connections, without floats or NaNs.
+
+    Pitches are stored as int8 intervals from the final of the mode of the
+    chant, and the padding (missing pitches) as a bitmask (`np.packbits`) of
+    the valid positions; the intervals at invalid positions are 0. The ids are
+    stored as a (byte) string array, and the modes and sigla as categoricals.
+    Tables stored as npz files (see :meth:`save`) are memory-mapped when they
+    are loaded, so all arrays are views on the file.
+    """
+
+    def __init__(self, ids, modes, sigla, positions, intervals, packed_valid):
+        """
+        Parameters
+        ----------
+        ids : array_like
+            The chant ids
+        modes : pd.Categorical
+            The modes of the chants
+        sigla : pd.Categorical
+            The sigla of the chants
+        positions : array_like
+            The positions of the pitch columns, usually `-15, ..., 14`
+        intervals : np.array
+            An int8 array of shape `(num_chants, num_positions)` with the
+            intervals to the final
+        packed_valid : np.array
+            A uint8 array with the (row-wise) packed validity mask
+        """
+        self.ids = np.asarray(ids)
+        self.modes = pd.Categorical(modes)
+        self.sigla = pd.Categorical(sigla)
+        self.positions = np.asarray(positions, dtype=int)
+        self.intervals = intervals
+        self.packed_valid = packed_valid
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f'<ConnectionTable: {len(self)} connections>'
+
+    @classmethod
+    def from_frame(cls, connections: pd.DataFrame) -> 'ConnectionTable':
+        """Encode a connections dataframe, as returned by
+        :func:`src.generate_differentiae.extract_connections`"""
+        columns = position_columns(connections)
+        pitches = connections[columns].to_numpy(dtype=float)
+        valid = np.isnan(pitches) == False
+        finals = mode_finals(connections['mode'])
+        intervals = np.where(valid, pitches - finals[:, np.newaxis], 0)
+        int8 = np.iinfo(np.int8)
+        if (not np.array_equal(intervals, np.round(intervals))
+            or intervals.min(initial=0) < int8.min 
+            or intervals.max(initial=0) > int8.max):
+            raise ValueError('The pitches cannot be stored as int8 intervals')
+        return cls(
+            ids=connections.index.to_numpy().astype(str),
+            modes=connections['mode'].to_numpy(),
+            sigla=connections['siglum'].to_numpy(),
+            positions=[int(str(col)) for col in columns],
+            intervals=intervals.astype(np.int8),
+            packed_valid=np.packbits(valid, axis=1))
+
+    @property
+    def valid(self) -> np.array:
+        """Boolean array of shape `(num_chants, num_positions)` that is 
+        False at the padding"""
+        valid = np.unpackbits(self.packed_valid, axis=1)
+        return valid[:, :len(self.positions)].astype(bool)
+
+    @property
+    def finals(self) -> np.array:
+        """The finals of the modes of all chants"""
+        return mode_finals(self.modes.categories)[self.modes.codes]
+
+    def pitches(self, fill_value: int = -1) -> np.array:
+        """The (MIDI) pitches as an int16 array, with `fill_value` at the
+        padding"""
+        pitches = self.intervals + self.finals[:, np.newaxis]
+        pitches[self.valid == False] = fill_value
+        return pitches
+
+    def lengths(self) -> tuple:
+        """Returns the number of pitches of the differentiae (the negative 
+        positions) and of the antiphon openings"""
+        valid = self.valid
+        is_differentia = self.positions < 0
+        return (valid[:, is_differentia].sum(axis=1),
+                valid[:, is_differentia == False].sum(axis=1))
+
+    def select(self, rows) -> 'ConnectionTable':
+        """A table with a subset of the rows (a slice, mask or positions)"""
+        return ConnectionTable(self.ids[rows], self.modes[rows], 
+            self.sigla[rows], self.positions, self.intervals[rows], 
+            self.packed_valid[rows])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Decode the table to a connections dataframe. Pitch columns without
+        padding are integers, as in the output of `extract_connections`."""
+        valid = self.valid
+        pitches = self.pitches(fill_value=0).astype(float)
+        pitches[valid == False] = np.nan
+        columns = {'mode': np.asarray(self.modes), 
+                   'siglum': np.asarray(self.sigla)}
+        for i, position in enumerate(self.positions):
+            values = pitches[:, i]
+            columns[position] = (values.astype(int) if valid[:, i].all() 
+                else values)
+        return pd.DataFrame(columns, index=pd.Index(self.ids, name='id'))
+
+    def save(self, path: str):
+        """Store the table as an (uncompressed) npz file"""
+        np.savez(path,
+            ids=np.char.encode(self.ids.astype(str)),
+            mode_codes=self.modes.codes,
+            mode_categories=_encode_categories(self.modes.categories),
+            siglum_codes=self.sigla.codes,
+            siglum_categories=np.char.encode(
+                np.asarray(self.sigla.categories).astype(str)),
+            positions=self.positions,
+            intervals=self.intervals,
+            packed_valid=self.packed_valid)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = 'r') -> 'ConnectionTable':
+        """Load a table stored by :meth:`save`. The intervals and the validity
+        mask are memory-mapped, unless `mmap_mode=None`."""
+        arrays = load_npz(path, mmap_mode=mmap_mode)
+        mode_categories = arrays['mode_categories']
+        if mode_categories.dtype.kind == 'S':
+            mode_categories = np.char.decode(mode_categories)
+        return cls(
+            ids=np.char.decode(arrays['ids']).astype(object),
+            modes=pd.Categorical.from_codes(arrays['mode_codes'], 
+                mode_categories),
+            sigla=pd.Categorical.from_codes(arrays['siglum_codes'],
+                np.char.decode(arrays['siglum_categories'])),
+            positions=arrays['positions'],
+            intervals=arrays['intervals'],
+            packed_valid=arrays['packed_valid'])
+
+def read_connections(path: str, mmap_mode: str = 'r') -> ConnectionTable:
+    """Read the connections from a CSV file, or from an npz file stored by
+    :meth:`ConnectionTable.save`"""
+    if os.path.splitext(path)[1] == '.npz':
+        return ConnectionTable.load(path, mmap_mode=mmap_mode)
+    return ConnectionTable.from_frame(pd.read_csv(path, index_col=0))
+
+def write_connections(connections, path: str):
+    """Store the connections (a dataframe or a :class:`ConnectionTable`) as
+    a CSV or npz file, depending on the extension of the path"""
+    is_frame = isinstance(connections, pd.DataFrame)
+    if os.path.splitext(path)[1] == '.npz':
+        if is_frame:
+            connections = ConnectionTable.from_frame(connections)
+        connections.save(path)
+    else:
+        if not is_frame:
+            connections = connections.to_frame()
+        connections.to_csv(path)
+
+def _positions(connections) -> list:
+    """The positions of the pitch columns of a dataframe or table"""
+    if isinstance(connections, ConnectionTable):
+        return list(connections.positions)
+    return [int(str(col)) for col in position_columns(connections)]
+
+def _column_values(connections, column: str) -> np.array:
+    """The values of the `mode` or `siglum` column of a dataframe or table"""
+    if isinstance(connections, ConnectionTable):
+        return np.asarray(getattr(connections, 
+            'modes' if column == 'mode' else 'sigla'))
+    return connections[column].to_numpy()
+
+def _pitch_symbols(connections) -> np.array:
+    """Replace the pitches by small positive integers, and missing pitches by
+    0. For a :class:`ConnectionTable`, the intervals are used instead of the
+    pitches, which gives the same windows within every mode."""
+    if isinstance(connections, ConnectionTable):
+        symbols = connections.intervals.astype(np.int64) + 129
+        symbols[connections.valid == False] = 0
+        return symbols
+    pitches = connections[position_columns(connections)].to_numpy(dtype=float)
+    codes, _ = pd.factorize(pitches.ravel())
+    return (codes + 1).reshape(pitches.shape).astype(np.int64)
+
+def _window_starts(connections, window: int, starts: list = None) -> tuple:
+    """Returns the positions and column numbers of all window starts"""
+    positions = _positions(connections)
+    if starts is None:
+        starts = positions[:len(positions) - window + 1]
+    columns = [positions.index(start) for start in starts]
+    if any(column + window > len(positions) for column in columns):
+        raise ValueError(f'Windows of length {window} do not fit at all '
+                         f'starting positions {list(starts)}')
+    return list(starts), columns
+
+def window_keys(connections, window: int,
+    starts: list = None) -> np.array:
+    """Encode every window of pitches as an integer, such that two windows get
+    the same key if and only if they contain the same pitches. Missing pitches
+    (the padding) are treated as a separate pitch.
+
+    Parameters
+    ----------
+    connections : pd.DataFrame or ConnectionTable
+        The connections
+    window : int
+        The length of the windows
+    starts : list, optional
+        The positions at which windows start, by default all positions at
+        which a window fits
+
+    Returns
+    -------
+    np.array
+        An int64 array of shape `(len(starts), len(connections))` with the
+        keys of all windows. Keys are unique across windows and starts, and
+        range from 0 to the number of distinct windows.
+    """
+    starts, columns = _window_starts(connections, window, starts)
+
+    # Pack as many pitch symbols as fit in 32 bits in a single integer
+    codes = _pitch_symbols(connections)
+    bits = max(int(codes.max()).bit_length(), 1)
+    chunk_size = max(32 // bits, 1)
+
+    keys = np.zeros((len(columns), len(connections)), dtype=np.int64)
+    for chunk_start in range(0, window, chunk_size):
+        chunk = np.zeros_like(keys)
+        for offset in range(chunk_start, min(chunk_start + chunk_size, window)):
+            shifted = codes[:, [column + offset for column in columns]].T
+            chunk = (chunk << bits) | shifted
+        # Combine with the keys of earlier chunks, which are below 2**31
+        combined = (keys << 32) | chunk
+        _, inverse = np.unique(combined, return_inverse=True)
+        keys = inverse.reshape(keys.shape).astype(np.int64)
+    return keys
+
+def _entropies_from_counts(groups, counts, num_groups) -> np.array:
+    """The entropies (in bits) of a number of groups, given the counts of all
+    distinct values in all groups"""
+    counts = np.asarray(counts, dtype=float)
+    totals = np.bincount(groups, weights=counts, minlength=num_groups)
+    plogp = np.zeros_like(counts)
+    positive = counts > 0
+    plogp[positive] = counts[positive] * np.log2(counts[positive])
+    sums = np.bincount(groups, weights=plogp, minlength=num_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropies = np.log2(totals) - sums / totals
+    entropies[totals == 0] = np.nan
+    return entropies
+
+class _WindowCounts(object):
+    """The distinct (start, mode, window) combinations of all windows"""
+
+    def __init__(self, connections, window, starts, modes):
+        self.starts, _ = _window_starts(connections, window, starts)
+        keys = window_keys(connections, window, self.starts)
+        mode_values = _column_values(connections, 'mode')
+        if modes is None:
+            modes = np.sort(pd.unique(mode_values[pd.notnull(mode_values)]))
+        self.modes = list(modes)
+        mode_codes = pd.Index(self.modes).get_indexer(mode_values)
+
+        # Windows of chants whose mode is not analyzed are ignored
+        self.num_keys = int(keys.max()) + 1 if keys.size > 0 else 1
+        self.num_groups = len(self.starts) * len(self.modes)
+        group_ids = (np.arange(len(self.starts))[:, np.newaxis] * len(self.modes)
+                     + mode_codes[np.newaxis, :])
+        included = np.broadcast_to(mode_codes >= 0, keys.shape)
+        combined = (group_ids * self.num_keys + keys)[included]
+        values, self.inverse, self.counts = np.unique(combined,
+            return_inverse=True, return_counts=True)
+        self.groups = values // self.num_keys
+        self.rows = np.broadcast_to(np.arange(keys.shape[1]), keys.shape)[included]
+        self.mode_codes = mode_codes
+
+    def entropies(self, row_weights=None) -> np.array:
+        if row_weights is None:
+            counts = self.counts
+        else:
+            counts = np.bincount(self.inverse.ravel(),
+                weights=row_weights[self.rows], minlength=len(self.groups))
+        entropies = _entropies_from_counts(self.groups, counts, self.num_groups)
+        return entropies.reshape(len(self.starts), len(self.modes))
+
+def window_entropies(connections, window: int = 4,
+    starts: list = None, modes: list = None) -> pd.DataFrame:
+    """Computes the entropy (in bits) of the pitch windows of every mode, for
+    all window positions at once. Windows with missing pitches are counted
+    like any other window. This is equivalent to, but much faster than,
+    counting the windows of every mode and position separately::
+
+        for mode in modes:
+            subset = connections.query(f'mode=={mode}')
+            counts = Counter(tuple(row) for row in subset[columns].values)
+            probs = np.array(list(counts.values())) / len(subset)
+            entropy = scipy.stats.entropy(probs, base=2)
+
+    Parameters
+    ----------
+    connections : pd.DataFrame or ConnectionTable
+        The connections
+    window : int, optional
+        The length of the windows, by default 4
+    starts : list, optional
+        The positions at which windows start, by default all positions at
+        which a window fits
+    modes : list, optional
+        The modes, by default all modes in the connections
+
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with the entropies, indexed by window start, with one
+        column per mode. The entropy of a mode without chants is NaN.
+    """
+    counts = _WindowCounts(connections, window, starts, modes)
+    return pd.DataFrame(counts.entropies(),
+        index=pd.Index(counts.starts, name='start'),
+        columns=pd.Index(counts.modes, name='mode'))
+
+def bootstrap_window_entropies(connections, window: int = 4,
+    starts: list = None, modes: list = None, num_samples: int = 1000,
+    random_state: int = 0) -> np.array:
+    """Bootstrap estimates of the window entropies (see
+    :func:`window_entropies`). For every bootstrap sample, the chants of every
+    mode are resampled with replacement, and the entropies are computed from
+    the resampled chants. The windows are only counted once; each bootstrap
+    sample only reweights the counts. Note that resampling tends to lower
+    the entropy, as rare windows are often left out.
+
+    Parameters
+    ----------
+    connections : pd.DataFrame or ConnectionTable
+        The connections
+    window, starts, modes
+        See :func:`window_entropies`
+    num_samples : int, optional
+        The number of bootstrap samples, by default 1000
+    random_state : int, optional
+        The random seed, by default 0
+
+    Returns
+    -------
+    np.array
+        An array of shape `(num_samples, len(starts), len(modes))`
+    """
+    counts = _WindowCounts(connections, window, starts, modes)
+    rows = np.flatnonzero(counts.mode_codes >= 0)
+    rows = rows[np.argsort(counts.mode_codes[rows], kind='stable')]
+    mode_codes = counts.mode_codes[rows]
+    sizes = np.bincount(mode_codes, minlength=len(counts.modes))
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    rs = np.random.RandomState(random_state)
+    samples = np.empty((num_samples, len(counts.starts), len(counts.modes)))
+    for i in range(num_samples):
+        # Draw every chant from the chants with the same mode
+        draws = (rs.random_sample(len(rows)) * sizes[mode_codes]).astype(int)
+        resampled = rows[offsets[mode_codes] + draws]
+        weights = np.bincount(resampled, minlength=len(connections))
+        samples[i] = counts.entropies(weights.astype(float))
+    return samples
+
+class ConnectionIndex(object):
+    """Index of the antiphon openings that follow every differentia suffix.
+
+    For every suffix of the differentiae (the last `n` pitches, for `n` up to
+    `max_suffix`) the index stores how often every opening (the first
+    `opening_length` pitches of the antiphon) follows it, per mode and 
+    siglum. A query looks up the suffix in a hash table and returns a
+    precomputed, contiguous slice of counts, so its cost does not depend on
+    the number of connections.
+
+    >>> connections = read_connections('data/differentiae/connections.csv')
+    >>> index = ConnectionIndex(connections, opening_length=2)
+    >>> index.distribution([67, 69, 67], by='mode').head(2)
+       mode   opening  count
+    0     1  (62, 62)    342
+    1     1  (60, 62)    114
+    >>> index.entropy([67, 69, 67], by='mode').round(2)
+    mode
+    1    3.22
+    3    1.00
+    4    1.00
+    6    1.00
+    7    0.00
+    8    2.15
+    Name: entropy, dtype: float64
+
+    Pitches are MIDI pitches; missing pitches (the padding of short 
+    differentiae or openings) are represented by `None`.
+
+    Parameters
+    ----------
+    connections : pd.DataFrame or ConnectionTable
+        The connections
+    max_suffix : int, optional
+        The maximum length of the suffixes, by default 15
+    opening_length : int, optional
+        The number of pitches of the openings, by default 4
+    """
+
+    def __init__(self, connections, max_suffix: int = 15,
+        opening_length: int = 4):
+        positions = _positions(connections)
+        if isinstance(connections, ConnectionTable):
+            pitches = connections.pitches(fill_value=-1)
+        else:
+            pitches = connections[position_columns(connections)].to_numpy(
+                dtype=float)
+            pitches = np.where(np.isnan(pitches), -1, pitches).astype(np.int16)
+        try:
+            suffix_columns = [positions.index(p) for p in range(-max_suffix, 0)]
+            opening_columns = [positions.index(p) for p in range(opening_length)]
+        except ValueError:
+            raise ValueError(f'The connections have no positions '
+                f'{-max_suffix} to {opening_length - 1}')
+        self.max_suffix = max_suffix
+        self.opening_length = opening_length
+        mode_codes, self.modes = pd.factorize(_column_values(connections, 'mode'))
+        siglum_codes, self.sigla = pd.factorize(
+            _column_values(connections, 'siglum'))
+        self.openings, opening_ids = np.unique(pitches[:, opening_columns],
+            axis=0, return_inverse=True)
+        opening_ids = opening_ids.ravel()
+
+        # For every suffix length n: a dict mapping suffixes to suffix ids,
+        # and the counts of all (suffix, mode, siglum, opening) combinations,
+        # sorted by suffix id. The counts of suffix i are in the slice 
+        # offsets[i]:offsets[i+1].
+        num_modes, num_sigla = len(self.modes) + 1, len(self.sigla) + 1
+        num_openings = len(self.openings)
+        self._suffix_ids = []
+        self._tables = []
+        for n in range(max_suffix + 1):
+            suffixes, suffix_ids = np.unique(
+                pitches[:, suffix_columns[max_suffix - n:]], axis=0,
+                return_inverse=True)
+            suffix_ids = suffix_ids.ravel()
+            self._suffix_ids.append({tuple(suffix): i 
+                for i, suffix in enumerate(suffixes.tolist())})
+            keys = (((suffix_ids.astype(np.int64) * num_modes + mode_codes + 1)
+                     * num_sigla + siglum_codes + 1) * num_openings + opening_ids)
+            keys, counts = np.unique(keys, return_counts=True)
+            keys, openings = np.divmod(keys, num_openings)
+            keys, sigla = np.divmod(keys, num_sigla)
+            ids, modes = np.divmod(keys, num_modes)
+            offsets = np.searchsorted(ids, np.arange(len(suffixes) + 1))
+            self._tables.append((offsets, modes - 1, sigla - 1, openings, counts))
+
+    def __repr__(self):
+        return (f'<ConnectionIndex: suffixes up to length {self.max_suffix}, '
+                f'openings of length {self.opening_length}>')
+
+    def _lookup(self, suffix) -> tuple:
+        """The counts of a suffix, as a tuple of arrays (modes, sigla, openings,
+        counts)"""
+        suffix = tuple(-1 if p is None or p != p else int(p) for p in suffix)
+        if len(suffix) > self.max_suffix:
+            raise ValueError(f'Suffixes can have at most {self.max_suffix} '
+                'pitches')
+        offsets, modes, sigla, openings, counts = self._tables[len(suffix)]
+        suffix_id = self._suffix_ids[len(suffix)].get(suffix)
+        if suffix_id is None:
+            rows = slice(0, 0)
+        else:
+            rows = slice(offsets[suffix_id], offsets[suffix_id + 1])
+        return modes[rows], sigla[rows], openings[rows], counts[rows]
+
+    def distribution(self, suffix, by=('mode', 'siglum')) -> pd.DataFrame:
+        """The openings that follow a differentia suffix, and their counts.
+
+        Parameters
+        ----------
+        suffix : list
+            The last pitches of the differentia (possibly empty)
+        by : str or list, optional
+            Count the openings per `mode`, `siglum`, both (the default), or
+            neither (an empty list)
+
+        Returns
+        -------
+        pd.DataFrame
+            A dataframe with the columns in `by`, a column `opening` with the
+            openings (tuples of pitches), and a column `count`, sorted by
+            `by` and by decreasing count.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        modes, sigla, openings, counts = self._lookup(suffix)
+        opening_tuples = [tuple(None if p < 0 else p for p in opening)
+                          for opening in self.openings[openings].tolist()]
+        df = pd.DataFrame({
+            'mode': self.modes.take(modes),
+            'siglum': self.sigla.take(sigla),
+            'opening': opening_tuples,
+            'count': counts,
+        })
+        df = df.groupby(by + ['opening'], sort=False)['count'].sum().reset_index()
+        df = df.sort_values(by + ['count'], ascending=[True] * len(by) + [False],
+            kind='mergesort')
+        return df.reset_index(drop=True)
+
+    def probabilities(self, suffix, by='mode') -> pd.DataFrame:
+        """The conditional probabilities of the openings, given the suffix (and
+        the mode and/or siglum). Like :meth:`distribution`, with an extra 
+        column `probability`."""
+        df = self.distribution(suffix, by=by)
+        by = [by] if isinstance(by, str) else list(by)
+        if len(by) > 0:
+            totals = df.groupby(by, sort=False)['count'].transform('sum')
+        else:
+            totals = df['count'].sum()
+        df['probability'] = df['count'] / totals
+        return df
+
+    def entropy(self, suffix, by='mode'):
+        """The entropy (in bits) of the openings that follow a suffix, per 
+        mode and/or siglum. Returns a series, or a float if `by` is empty."""
+        df = self.probabilities(suffix, by=by)
+        df['plogp'] = -df['probability'] * np.log2(df['probability'])
+        by = [by] if isinstance(by, str) else list(by)
+        if len(by) == 0:
+            return float(df['plogp'].sum())
+        return df.groupby(by)['plogp'].sum().rename('entropy')
+
+if __name__ == '__main__':
+    _CUR_DIR = os.path.dirname(__file__)
+    _ROOT_DIR = os.path.abspath(os.path.join(_CUR_DIR, os.path.pardir))
+    csv_fn = os.path.join(_ROOT_DIR, 'data', 'differentiae', 'connections.csv')
+    npz_fn = os.path.splitext(csv_fn)[0] + '.npz'
+    write_connections(read_connections(csv_fn), npz_fn)
+    print(f'Stored the connections in {os.path.relpath(npz_fn)}')
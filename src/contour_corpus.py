@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""A single memory-mapped pitch matrix with all contours of all datasets.
+
+All phrase and random contours (the full datasets, not only the subsets) are
+stored as rows of one int8 matrix in a `.npy` file, together with a small
+index that maps datasets, songs and phrases to rows. The matrix is
+memory-mapped, so analyses over all phrases only load the rows they touch.
+
+Usage: `python -m src.contour_corpus` builds the corpus from the datasets in
+`data/phrase-contours` (CSV or npz files).
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from .contour_io import read_contours
+from .contour_io import load_npz
+from .contour_io import pitch_columns
+from .contour_io import _smallest_int_dtype
+from .contours import normalized_contours
+
+_CUR_DIR = os.path.dirname(__file__)
+_ROOT_DIR = os.path.abspath(os.path.join(_CUR_DIR, os.path.pardir))
+_CONTOURS_DIR = os.path.join(_ROOT_DIR, 'data', 'phrase-contours')
+_CORPUS_DIR = os.path.join(_CONTOURS_DIR, 'corpus')
+_ALL_DATASETS = [
+    'liber-antiphons', 'liber-hymns', 'liber-alleluias', 'liber-introits',
+    'liber-communions', 'liber-responsories', 'liber-offertories',
+    'liber-graduals', 'liber-kyries', 'liber-tracts'
+]
+
+def _dataset_path(dataset: str, kind: str, subset: bool = False,
+    contours_dir: str = _CONTOURS_DIR) -> str:
+    """Path of a stored dataset, preferring npz over csv files"""
+    name = f'{dataset}-{kind}-contours' + ('-subset' if subset else '')
+    npz_path = os.path.join(contours_dir, f'{name}.npz')
+    if os.path.exists(npz_path):
+        return npz_path
+    return os.path.join(contours_dir, f'{name}.csv')
+
+def _num_rows(path: str) -> int:
+    """The number of contours in a stored dataset, without loading it"""
+    if path.endswith('.npz'):
+        return load_npz(path)['pitches'].shape[0]
+    with open(path, 'rb') as handle:
+        return sum(1 for _ in handle) - 1
+
+def build_contour_corpus(datasets: list = _ALL_DATASETS,
+    include_random: bool = True, contours_dir: str = _CONTOURS_DIR,
+    corpus_dir: str = _CORPUS_DIR):
+    """Collect the contours of several datasets in a single pitch matrix
+    (`pitches.npy`) and write an index (`index.npz`) to `corpus_dir`.
+    The random contours of dataset `liber-hymns` are stored as dataset
+    `liber-hymns-random`. The index also marks which contours are in the
+    subsets of 3000 contours. The pitches must be integers in the range of
+    int8 (as midi pitches are); otherwise a ValueError is raised."""
+    # Tuples (dataset, kind, name in the corpus)
+    sources = []
+    for dataset in datasets:
+        sources.append((dataset, 'phrase', dataset))
+        if include_random:
+            sources.append((dataset, 'random', f'{dataset}-random'))
+    paths = [_dataset_path(dataset, kind, contours_dir=contours_dir) 
+             for dataset, kind, _ in sources]
+    num_rows = [_num_rows(path) for path in paths]
+
+    if not os.path.exists(corpus_dir):
+        os.makedirs(corpus_dir)
+    pitches = None
+    index = []
+    start = 0
+    for (dataset, kind, name), path, length in zip(sources, paths, num_rows):
+        df = read_contours(path)
+        values = df[pitch_columns(df)].to_numpy()
+        if _smallest_int_dtype(values) != np.int8:
+            raise ValueError(f'The pitches in {path} are not all integers '
+                'between -128 and 127, and cannot be stored as int8')
+        if pitches is None:
+            num_samples = values.shape[1]
+            pitches = np.lib.format.open_memmap(
+                os.path.join(corpus_dir, 'pitches.npy'), mode='w+',
+                dtype=np.int8, shape=(sum(num_rows), num_samples))
+        pitches[start:start + length] = values
+
+        subset_path = _dataset_path(dataset, kind, subset=True, 
+            contours_dir=contours_dir)
+        subset_ids = read_contours(subset_path).index
+        index.append(pd.DataFrame({
+            'dataset': name,
+            'contour_id': df.index.astype(str),
+            'song_id': df['song_id'].astype(str).values,
+            'phrase_num': df['phrase_num'].values,
+            'phrase_length': df['phrase_length'].values,
+            'phrase_duration': df['phrase_duration'].values,
+            'in_subset': df.index.isin(subset_ids),
+        }))
+        start += length
+    pitches.flush()
+
+    index = pd.concat(index, ignore_index=True)
+    dataset_ids = pd.Categorical(index['dataset'])
+    song_ids = pd.Categorical(index['song_id'])
+    np.savez(os.path.join(corpus_dir, 'index.npz'),
+        dataset_codes=dataset_ids.codes,
+        dataset_categories=np.char.encode(dataset_ids.categories.to_numpy().astype(str)),
+        song_id_codes=song_ids.codes,
+        song_id_categories=np.char.encode(song_ids.categories.to_numpy().astype(str)),
+        contour_id=np.char.encode(index['contour_id'].to_numpy().astype(str)),
+        phrase_num=index['phrase_num'].to_numpy().astype(np.int32),
+        phrase_length=index['phrase_length'].to_numpy().astype(np.int32),
+        phrase_duration=index['phrase_duration'].to_numpy().astype(float),
+        in_subset=index['in_subset'].to_numpy())
+
+class ContourCorpus(object):
+    """All contours in a single memory-mapped pitch matrix, built using
+    :func:`build_contour_corpus`.
+
+    The `index` is a DataFrame with one row per contour (in the same order as
+    the rows of `pitches`) and columns `dataset`, `contour_id`, `song_id`,
+    `phrase_num`, `phrase_length`, `phrase_duration` and `in_subset`.
+    Every dataset, and every song within a dataset, occupies a contiguous
+    range of rows.
+    """
+
+    def __init__(self, corpus_dir: str = _CORPUS_DIR, mmap_mode: str = 'r'):
+        self.pitches = np.load(os.path.join(corpus_dir, 'pitches.npy'),
+            mmap_mode=mmap_mode)
+        arrays = load_npz(os.path.join(corpus_dir, 'index.npz'),
+            mmap_mode=None)
+        self.index = pd.DataFrame({
+            'dataset': pd.Categorical.from_codes(arrays['dataset_codes'],
+                np.char.decode(arrays['dataset_categories'])),
+            'contour_id': np.char.decode(arrays['contour_id']),
+            'song_id': pd.Categorical.from_codes(arrays['song_id_codes'],
+                np.char.decode(arrays['song_id_categories'])),
+            'phrase_num': arrays['phrase_num'],
+            'phrase_length': arrays['phrase_length'],
+            'phrase_duration': arrays['phrase_duration'],
+            'in_subset': arrays['in_subset'],
+        })
+
+        # Row ranges of all datasets and all songs
+        rows = np.arange(len(self.index))
+        groups = pd.DataFrame({'dataset': self.index['dataset'],
+            'song_id': self.index['song_id'], 'row': rows})
+        self.dataset_rows = {dataset: (int(group.min()), int(group.max()) + 1)
+            for dataset, group in groups.groupby('dataset', observed=True)['row']}
+        song_rows = groups.groupby(['dataset', 'song_id'], observed=True,
+            sort=False)['row'].agg(['min', 'max'])
+        song_rows['max'] += 1
+        self.song_rows = song_rows.rename(columns={'min': 'start', 'max': 'end'})
+
+    def __len__(self):
+        return len(self.pitches)
+
+    @property
+    def datasets(self) -> list:
+        return list(self.dataset_rows.keys())
+
+    def rows(self, dataset: str, song_id: str = None,
+        phrase_num: int = None) -> slice:
+        """Return the rows of a dataset, a song in a dataset, or a single
+        phrase, as a slice"""
+        if song_id is None:
+            start, end = self.dataset_rows[dataset]
+        else:
+            start, end = self.song_rows.loc[(dataset, song_id)]
+        if phrase_num is not None:
+            phrase_nums = self.index['phrase_num'].values[start:end]
+            start = start + int(np.flatnonzero(phrase_nums == phrase_num)[0])
+            end = start + 1
+        return slice(int(start), int(end))
+
+    def contours(self, dataset: str, subset: bool = False) -> np.array:
+        """Return the (memory-mapped) pitches of all contours in a dataset,
+        or only those in its subset of 3000 contours"""
+        rows = self.rows(dataset)
+        if subset:
+            in_subset = self.index['in_subset'].values[rows]
+            return self.pitches[rows][in_subset]
+        return self.pitches[rows]
+
+    def normalized(self, dataset: str = None, subset: bool = False,
+        chunk_size: int = 10000, out: np.array = None) -> np.array:
+        """Normalized contours of a dataset (or of all contours), computed
+        in chunks directly from the memory-mapped matrix. Pass a (memory-
+        mapped) array as `out` to avoid allocating the result in memory."""
+        pitches = self.pitches if dataset is None else self.contours(
+            dataset, subset=subset)
+        return normalized_contours(pitches, chunk_size=chunk_size, out=out)
+
+    def mean_normalized_contour(self, dataset: str = None,
+        subset: bool = False, chunk_size: int = 10000) -> np.array:
+        """The average normalized contour, without materializing all
+        normalized contours at once"""
+        pitches = self.pitches if dataset is None else self.contours(
+            dataset, subset=subset)
+        total = np.zeros(pitches.shape[1])
+        for start in range(0, len(pitches), chunk_size):
+            chunk = normalized_contours(pitches[start:start + chunk_size])
+            total += chunk.sum(axis=0)
+        return total / len(pitches)
+
+if __name__ == '__main__':
+    build_contour_corpus()
+    print(f'Stored the contour corpus in {os.path.relpath(_CORPUS_DIR)}')
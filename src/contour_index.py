@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""Nearest-neighbour search over normalized phrase contours.
+
+A :class:`ContourIndex` finds the contours closest (in Euclidean distance) to
+a query contour, for example to find reused formulas across genres:
+
+>>> from src.contour_io import read_contours
+>>> path = 'data/phrase-contours/liber-{}-phrase-contours-subset.csv'
+>>> index = ContourIndex(read_contours(path.format('antiphons')))
+>>> index.add(read_contours(path.format('hymns')))
+>>> len(index)
+3594
+>>> introits = read_contours(path.format('introits'))
+>>> distances, positions = index.query(introits[:2], k=3)
+>>> distances.round(2)
+array([[10.39, 10.72, 11.48],
+       [ 9.5 , 10.5 , 10.7 ]])
+>>> list(index.labels[positions[0]])
+['liber-antiphons-00285', 'liber-antiphons-03549', 'liber-antiphons-01585']
+
+An index over datasets in the contour corpus (see 
+:class:`src.contour_corpus.ContourCorpus`) can be built using 
+:meth:`ContourIndex.from_corpus`.
+
+All contours are normalized (see :func:`src.contours.normalized_contours`) and
+projected onto their first principal components. The projections are stored
+in a kd-tree (`scipy.spatial.cKDTree`), which quickly finds candidate
+neighbours; the candidates are then ranked by their distance in the full
+space. Since the projection never increases distances, radius queries are
+exact, and nearest-neighbour queries can be made exact by checking the
+candidates against the kd-tree distances.
+"""
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from .contour_io import pitch_columns
+from .contours import normalized_contours
+
+def _pitch_matrix(contours) -> np.array:
+    """The pitches of a contour dataset, or a (2-D) array of contours"""
+    if isinstance(contours, pd.DataFrame):
+        contours = contours[pitch_columns(contours)].to_numpy()
+    return np.atleast_2d(np.asarray(contours))
+
+class ContourIndex(object):
+    """Nearest-neighbour index over normalized contours. Contours can be added
+    at any time using :meth:`add`, after which the kd-tree is rebuilt (which
+    takes well under a second for all contours in the Liber Usualis).
+
+    Parameters
+    ----------
+    contours : pd.DataFrame or np.array, optional
+        Contours to index: a contour dataset or a 2-D array of pitches
+    labels : list, optional
+        Labels of the contours; by default the index of the dataset, or the
+        positions of the contours
+    num_components : int, optional
+        The number of principal components in the kd-tree, by default 16
+    """
+
+    def __init__(self, contours=None, labels=None, num_components: int = 16):
+        self.num_components = num_components
+        self.contours = None
+        self.labels = pd.Index([])
+        self._moments = 0
+        self._basis = None
+        self._tree = None
+        if contours is not None:
+            self.add(contours, labels=labels)
+
+    @classmethod
+    def from_corpus(cls, corpus, datasets: list = None, subset: bool = False,
+        **kwargs):
+        """Index the contours of several datasets (by default all) in a
+        :class:`src.contour_corpus.ContourCorpus`, labelled by contour id"""
+        datasets = datasets or corpus.datasets
+        contours, labels = [], []
+        for dataset in datasets:
+            rows = corpus.rows(dataset)
+            dataset_labels = corpus.index['contour_id'].values[rows]
+            if subset:
+                dataset_labels = dataset_labels[
+                    corpus.index['in_subset'].values[rows]]
+            contours.append(corpus.contours(dataset, subset=subset))
+            labels.append(dataset_labels)
+        return cls(np.concatenate(contours), np.concatenate(labels), **kwargs)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, contours, labels=None):
+        """Add contours to the index and rebuild the kd-tree.
+
+        Parameters
+        ----------
+        contours : pd.DataFrame or np.array
+            A contour dataset or a 2-D array of pitches
+        labels : list, optional
+            Labels of the contours; by default the index of the dataset, or
+            the positions of the contours in the index
+        """
+        if labels is None and isinstance(contours, pd.DataFrame):
+            labels = contours.index
+        normalized = normalized_contours(_pitch_matrix(contours))
+        if labels is None:
+            labels = pd.RangeIndex(len(self), len(self) + len(normalized))
+        if len(labels) != len(normalized):
+            raise ValueError('The number of labels and contours differ')
+        if self.contours is None:
+            self.contours = normalized
+        else:
+            self.contours = np.concatenate([self.contours, normalized])
+        self.labels = self.labels.append(pd.Index(labels))
+        self._moments = self._moments + normalized.T @ normalized
+        self._build()
+
+    def _build(self):
+        """Compute the principal components and build the kd-tree"""
+        _, eigenvectors = np.linalg.eigh(self._moments)
+        self._basis = eigenvectors[:, ::-1][:, :self.num_components].T
+        self._tree = cKDTree(self.contours @ self._basis.T)
+
+    def _exact_distances(self, queries: np.array,
+        positions: np.array) -> np.array:
+        """Distances between every query and the contours at the positions
+        in the corresponding row of `positions`"""
+        differences = self.contours[positions] - queries[:, np.newaxis, :]
+        return np.sqrt((differences ** 2).sum(axis=2))
+
+    def _query_chunk(self, queries, k, candidates, exact):
+        num_candidates = min(max(candidates, k), len(self))
+        bounds, positions = self._tree.query(queries @ self._basis.T,
+            k=num_candidates)
+        positions = positions.reshape(len(queries), num_candidates)
+        bounds = bounds.reshape(len(queries), num_candidates)[:, -1]
+        positions = np.sort(positions, axis=1)
+
+        distances = self._exact_distances(queries, positions)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        positions = np.take_along_axis(positions, order, axis=1)
+
+        # All other contours are at least `bounds` away from the query
+        if exact and num_candidates < len(self):
+            uncertain = np.flatnonzero(distances[:, -1] > bounds)
+            all_positions = np.arange(len(self))
+            for i in uncertain:
+                all_distances = self._exact_distances(queries[i:i + 1],
+                    all_positions[np.newaxis, :])[0]
+                order = np.argsort(all_distances, kind='stable')[:k]
+                distances[i] = all_distances[order]
+                positions[i] = order
+        return distances, positions
+
+    def query(self, contours, k: int = 1, candidates: int = 100,
+        exact: bool = False, chunk_size: int = 1000) -> tuple:
+        """Find the `k` nearest neighbours of one or more contours.
+
+        The kd-tree returns `candidates` contours whose projections are
+        closest to the query, and the `k` closest candidates are returned.
+        This can miss a neighbour (for the Liber Usualis contours, about 1% of
+        the 10 nearest neighbours are missed). With `exact=True`, queries
+        whose neighbours cannot be guaranteed to be the nearest are answered
+        by comparing them to all contours, which is much slower.
+
+        Parameters
+        ----------
+        contours : pd.DataFrame or np.array
+            The query contours (a dataset or a 1-D or 2-D array of pitches)
+        k : int, optional
+            The number of neighbours, by default 1
+        candidates : int, optional
+            The number of candidates per query, by default 100
+        exact : bool, optional
+            Whether to guarantee that the nearest neighbours are returned,
+            by default False
+        chunk_size : int, optional
+            The number of queries processed at once, by default 1000
+
+        Returns
+        -------
+        tuple
+            A tuple `(distances, positions)` of arrays of shape
+            `(num_queries, k)`, with the distances to the neighbours, sorted
+            in increasing order, and their positions in the index. The labels
+            of the neighbours are `index.labels[positions]`.
+        """
+        if k > len(self):
+            raise ValueError(f'Cannot find {k} neighbours in an index with '
+                f'{len(self)} contours')
+        queries = normalized_contours(_pitch_matrix(contours))
+        results = [self._query_chunk(queries[start:start + chunk_size], k,
+                        candidates, exact)
+                   for start in range(0, len(queries), chunk_size)]
+        distances = np.concatenate([d for d, _ in results])
+        positions = np.concatenate([p for _, p in results])
+        return distances, positions
+
+    def query_radius(self, contours, radius: float) -> tuple:
+        """Find all contours within distance `radius` of one or more
+        contours. The result is exact.
+
+        Returns
+        -------
+        tuple
+            A tuple `(distances, positions)` of lists with one array per
+            query: the distances to all contours within the radius, in
+            increasing order, and their positions in the index
+        """
+        queries = normalized_contours(_pitch_matrix(contours))
+        if len(self) == 0:
+            return [np.empty(0)] * len(queries), [np.empty(0, int)] * len(queries)
+        candidates = self._tree.query_ball_point(queries @ self._basis.T,
+            radius)
+        all_distances, all_positions = [], []
+        for query, positions in zip(queries, candidates):
+            positions = np.sort(np.asarray(positions, dtype=int))
+            distances = self._exact_distances(query[np.newaxis, :],
+                positions[np.newaxis, :])[0]
+            within = distances <= radius
+            order = np.argsort(distances[within], kind='stable')
+            all_distances.append(distances[within][order])
+            all_positions.append(positions[within][order])
+        return all_distances, all_positions
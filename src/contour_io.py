@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""Reading and writing contour datasets.
+
+Contour datasets are DataFrames indexed by `contour_id`, with columns
+`song_id`, `phrase_num`, `phrase_length`, `phrase_duration` and the pitch
+columns `0`, `1`, ... They can be stored in three formats, determined by
+the file extension:
+
+- `.csv`: the original, human-readable format.
+- `.npz`: an uncompressed numpy archive with a typed pitch matrix (int8 or
+  int16), categorical song ids and the metadata columns. The arrays are
+  memory-mapped when the file is read, so loading is nearly instantaneous.
+- `.parquet`: requires `pyarrow` (or `fastparquet`) to be installed.
+
+Usage: `python -m src.contour_io` converts all CSV files in
+`data/phrase-contours` to the npz format.
+"""
+import os
+import glob
+import struct
+import zipfile
+import numpy as np
+import pandas as pd
+
+_CUR_DIR = os.path.dirname(__file__)
+_ROOT_DIR = os.path.abspath(os.path.join(_CUR_DIR, os.path.pardir))
+_CONTOURS_DIR = os.path.join(_ROOT_DIR, 'data', 'phrase-contours')
+
+def pitch_columns(df: pd.DataFrame) -> list:
+    """Return the names of the pitch columns: all columns from `0` onwards"""
+    columns = [str(col) for col in df.columns]
+    return list(df.columns[columns.index('0'):])
+
+def _smallest_int_dtype(values: np.array) -> np.dtype:
+    """The smallest signed integer type that can hold the values exactly"""
+    if values.size == 0:
+        return np.dtype('int8')
+    if not np.array_equal(values, np.round(values)):
+        return values.dtype
+    for dtype in ['int8', 'int16', 'int32']:
+        info = np.iinfo(dtype)
+        if values.min() >= info.min and values.max() <= info.max:
+            return np.dtype(dtype)
+    return np.dtype('int64')
+
+def contours_to_arrays(df: pd.DataFrame) -> dict:
+    """Convert a contour dataset to a dictionary of typed numpy arrays"""
+    pitches = df[pitch_columns(df)].to_numpy()
+    song_ids = pd.Categorical(df['song_id'].astype(str))
+    return dict(
+        contour_id=np.char.encode(df.index.to_numpy().astype(str)),
+        song_id_codes=song_ids.codes,
+        song_id_categories=np.char.encode(
+            song_ids.categories.to_numpy().astype(str)),
+        phrase_num=df['phrase_num'].to_numpy().astype(np.int32),
+        phrase_length=df['phrase_length'].to_numpy().astype(np.int32),
+        phrase_duration=df['phrase_duration'].to_numpy().astype(float),
+        pitches=pitches.astype(_smallest_int_dtype(pitches)))
+
+def arrays_to_contours(arrays: dict) -> pd.DataFrame:
+    """Convert a dictionary of arrays (see :func:`contours_to_arrays`) to
+    a contour dataset. The pitches are not copied."""
+    pitches = arrays['pitches']
+    columns = [str(i) for i in range(pitches.shape[1])]
+    index = pd.Index(np.char.decode(arrays['contour_id']), name='contour_id')
+    df = pd.DataFrame(pitches, index=index, columns=columns, copy=False)
+    song_ids = pd.Categorical.from_codes(arrays['song_id_codes'],
+        categories=np.char.decode(arrays['song_id_categories']))
+    df.insert(0, 'song_id', song_ids)
+    df.insert(1, 'phrase_num', arrays['phrase_num'])
+    df.insert(2, 'phrase_length', arrays['phrase_length'])
+    df.insert(3, 'phrase_duration', arrays['phrase_duration'])
+    return df
+
+def load_npz(path: str, mmap_mode: str = 'r') -> dict:
+    """Load all arrays from an (uncompressed) npz file. Unlike `np.load`,
+    which ignores `mmap_mode` for npz files, the arrays are memory-mapped.
+    Compressed or empty arrays are read into memory."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as handle:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            with archive.open(info) as member:
+                version = np.lib.format.read_magic(member)
+                if version == (1, 0):
+                    header = np.lib.format.read_array_header_1_0(member)
+                else:
+                    header = np.lib.format.read_array_header_2_0(member)
+                shape, fortran_order, dtype = header
+                stored = info.compress_type == zipfile.ZIP_STORED
+                if (mmap_mode is None or not stored or dtype.hasobject
+                    or np.prod(shape) == 0):
+                    member.seek(0)
+                    arrays[name] = np.lib.format.read_array(member)
+                    continue
+                array_offset = member.tell()
+
+            # The data starts after the local file header of the member
+            handle.seek(info.header_offset)
+            local_header = handle.read(30)
+            name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+            offset = info.header_offset + 30 + name_length + extra_length
+            arrays[name] = np.memmap(path, dtype=dtype, mode=mmap_mode,
+                offset=offset + array_offset, shape=shape,
+                order='F' if fortran_order else 'C')
+    return arrays
+
+def write_contours(df: pd.DataFrame, path: str):
+    """Store a contour dataset. The format is determined by the extension
+    of the path: `.csv`, `.npz` or `.parquet`."""
+    extension = os.path.splitext(path)[1]
+    if extension == '.csv':
+        df.to_csv(path)
+    elif extension == '.npz':
+        np.savez(path, **contours_to_arrays(df))
+    elif extension == '.parquet':
+        arrays = contours_to_arrays(df)
+        arrays_to_contours(arrays).to_parquet(path)
+    else:
+        raise ValueError(f'Unknown contour format: {extension}')
+
+def read_contours(path: str, mmap_mode: str = 'r') -> pd.DataFrame:
+    """Load a contour dataset stored with :func:`write_contours`. Pitches
+    in npz files are memory-mapped, unless `mmap_mode=None`."""
+    extension = os.path.splitext(path)[1]
+    if extension == '.csv':
+        return pd.read_csv(path, index_col=0, dtype={'song_id': str})
+    elif extension == '.npz':
+        return arrays_to_contours(load_npz(path, mmap_mode=mmap_mode))
+    elif extension == '.parquet':
+        return pd.read_parquet(path)
+    else:
+        raise ValueError(f'Unknown contour format: {extension}')
+
+def convert_contours(path: str, extension: str = '.npz') -> str:
+    """Convert a stored contour dataset to another format, and return the
+    path of the new file"""
+    df = read_contours(path)
+    new_path = os.path.splitext(path)[0] + extension
+    write_contours(df, new_path)
+    return new_path
+
+def main():
+    """Convert all CSV contour datasets to npz"""
+    for path in sorted(glob.glob(os.path.join(_CONTOURS_DIR, '*.csv'))):
+        new_path = convert_contours(path, extension='.npz')
+        print(f'Converted {os.path.basename(path)} to {os.path.basename(new_path)}')
+
+if __name__ == '__main__':
+    main()
@@ -10,11 +10,62 @@ import numpy as np
 import scipy.interpolate
 import typing
 import music21
-from music21 import converter
 import pandas as pd
 import logging
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
+from .contour_io import pitch_columns
+from .helpers import md5string
+from .note_tables import NoteTable
+from .note_tables import parse_note_table
+from .parse_cache import ParseCache
 from .random_segments import extract_random_segments_from_file
+from .random_segments import batch_poisson_segment_bounds
+
+def interpolate_notes(offsets: list, pitches: list, duration: float,
+    num_samples: int = 50, dtype: typing.Any = int) -> np.array:
+    """Returns an array of pitches interpolating a sequence of notes with 
+    given offsets and pitches: the pitch at a given number of equally spaced
+    points in time. Rests are ignored and leading rests are discarded, see 
+    :func:`interpolate_stream` for details.
+    
+    Parameters
+    ----------
+    offsets : list
+        The offsets of the notes (excluding rests)
+    pitches : list
+        The pitches of the notes
+    duration : float
+        The total duration of the melody, including rests
+    num_samples : int, optional
+        The number of points at which the pitch is computed, by default 50
+    dtype : typing.Any, optional
+        The datatype of the array, defaults to int.
+    
+    Returns
+    -------
+    np.array
+        An array of length `num_samples` of pitches
+    """
+    offsets = list(offsets)
+    pitches = list(pitches)
+
+    # Deal with phrases starting with a rest
+    if offsets[0] > 0:
+        duration = duration - offsets[0]
+        offsets = [x - offsets[0] for x in offsets]
+    
+    # Ensure the final note has the proper duration
+    offsets.append(duration)
+    pitches.append(pitches[-1])
+
+    # Interpolate to previous note
+    f = scipy.interpolate.interp1d(offsets, pitches, kind='previous')
+    xs = np.linspace(0, duration, num_samples)
+    ys = f(xs).astype(dtype)
+    return ys
 
 def interpolate_stream(stream: music21.stream.Stream, num_samples: int = 50, 
     dtype: typing.Any = int) -> np.array:
@@ -25,6 +76,10 @@ def interpolate_stream(stream: music21.stream.Stream, num_samples: int = 50,
     Rests are ignored: we assume the note before a rest is extended 
     to fill the rest. If a phrase starts with a rest, this is discarded
     so the phrase starts on the first onset.
+
+    The stream is first converted to a :class:`NoteTable`. If you 
+    interpolate many phrases, it is much faster to work with note tables
+    directly, see :func:`interpolate_note_table`.
     
     Parameters
     ----------
@@ -41,43 +96,220 @@ def interpolate_stream(stream: music21.stream.Stream, num_samples: int = 50,
     np.array
         An array of length `num_samples` of pitches
     """
-    duration = stream.quarterLength
-    notes = stream.recurse().notes
-    offsets = [float(n.offset) for n in notes]
-    pitches = [n.pitch.ps for n in notes]
+    return interpolate_note_table(NoteTable.from_stream(stream), 
+        num_samples=num_samples, dtype=dtype)
+
+def interpolate_note_table(table: NoteTable, num_samples: int = 50,
+    dtype: typing.Any = int) -> np.array:
+    """Returns an array of pitches interpolating a note table, just like
+    :func:`interpolate_stream` does for music21 streams."""
+    is_note = table.is_note
+    return interpolate_notes(table.onsets[is_note], table.pitches[is_note], 
+        table.duration, num_samples=num_samples, dtype=dtype)
+
+def interpolate_batch(bounds, offsets, pitches, durations, 
+    num_samples: int = 50, dtype: typing.Any = int) -> np.array:
+    """Interpolate many phrases at once. The phrases are passed as ragged 
+    arrays of offsets and pitches (of notes only, not rests), where phrase `i`
+    consists of the entries `bounds[i]` up to `bounds[i+1]`. The results are 
+    identical to those of :func:`interpolate_notes`, but all phrases are
+    interpolated in a single vectorized pass.
+
+    >>> bounds = [0, 2, 3]
+    >>> offsets = [0, 1, 1]
+    >>> pitches = [60, 62, 64]
+    >>> interpolate_batch(bounds, offsets, pitches, [2, 2], num_samples=4)
+    array([[60, 60, 62, 62],
+           [64, 64, 64, 64]])
     
-    # Deal with phrases starting with a rest
-    if offsets[0] > 0:
-        duration = duration - offsets[0]
-        offsets = [x - offsets[0] for x in offsets]
+    Parameters
+    ----------
+    bounds : array_like
+        The phrase boundaries: an array of length N + 1
+    offsets : array_like
+        The offsets of all notes
+    pitches : array_like
+        The pitches of all notes
+    durations : array_like
+        The durations of all N phrases, including rests
+    num_samples : int, optional
+        The number of points at which the pitch is computed, by default 50
+    dtype : typing.Any, optional
+        The datatype of the array, defaults to int.
     
-    # Ensure the final note has the proper duration
-    offsets.append(duration)
-    pitches.append(pitches[-1])
+    Returns
+    -------
+    np.array
+        An array of shape `(N, num_samples)` with the interpolated pitches
+    """
+    bounds = np.asarray(bounds, dtype=int)
+    offsets = np.asarray(offsets, dtype=float)[bounds[0]:bounds[-1]]
+    pitches = np.asarray(pitches, dtype=float)[bounds[0]:bounds[-1]]
+    durations = np.asarray(durations, dtype=float)
+    bounds = bounds - bounds[0]
+    num_phrases = len(bounds) - 1
+    lengths = np.diff(bounds)
+    if np.any(lengths <= 0):
+        empty = np.flatnonzero(lengths <= 0)[0]
+        raise ValueError(f'Phrase {empty} contains no notes')
+    phrase_ids = np.repeat(np.arange(num_phrases), lengths)
 
-    # Interpolate to previous note
-    f = scipy.interpolate.interp1d(offsets, pitches, kind='previous')
-    xs = np.linspace(0, duration, num_samples)
-    ys = f(xs).astype(dtype)
-    return ys
+    # Deal with phrases starting with a rest
+    first_offsets = offsets[bounds[:-1]]
+    shifts = np.where(first_offsets > 0, first_offsets, 0.0)
+    durations = durations - shifts
+    offsets = offsets - shifts[phrase_ids]
+
+    # Ensure the final note has the proper duration: append the duration to 
+    # the offsets of every phrase, and repeat the final pitch.
+    xs = np.empty(len(offsets) + num_phrases)
+    ys = np.empty(len(offsets) + num_phrases)
+    note_positions = np.arange(len(offsets)) + phrase_ids
+    end_positions = bounds[1:] + np.arange(num_phrases)
+    xs[note_positions] = offsets
+    xs[end_positions] = durations
+    ys[note_positions] = pitches
+    ys[end_positions] = pitches[bounds[1:] - 1]
+    ext_starts = bounds[:-1] + np.arange(num_phrases)
+    ext_lengths = lengths + 1
+    ext_phrase_ids = np.repeat(np.arange(num_phrases), ext_lengths)
+
+    # Sort every phrase by offset (stable, like scipy) and move x one 
+    # floating point value to the left
+    order = np.lexsort((xs, ext_phrase_ids))
+    xs, ys = xs[order], ys[order]
+    xs_shift = np.nextafter(xs, -np.inf)
+
+    # Sample points
+    samples = np.zeros((num_phrases, num_samples))
+    nonzero = durations != 0
+    if np.any(nonzero):
+        samples[nonzero] = np.linspace(0, durations[nonzero], num_samples, 
+            axis=1)
+    if np.any(samples < xs[ext_starts][:, np.newaxis]):
+        raise ValueError('A value in x_new is below the interpolation range.')
+    if np.any(samples > xs[ext_starts + lengths][:, np.newaxis]):
+        raise ValueError('A value in x_new is above the interpolation range.')
+
+    # Vectorized np.searchsorted(xs_shift, samples, side='left') within every
+    # phrase: sort the breakpoints and samples together (samples before 
+    # breakpoints with the same value) and count the preceding breakpoints.
+    sample_phrase_ids = np.repeat(np.arange(num_phrases), num_samples)
+    values = np.concatenate([xs_shift, samples.ravel()])
+    ids = np.concatenate([ext_phrase_ids, sample_phrase_ids])
+    is_breakpoint = np.concatenate([
+        np.ones(len(xs_shift), dtype=int), 
+        np.zeros(samples.size, dtype=int)])
+    merged = np.lexsort((is_breakpoint, values, ids))
+    num_preceding = np.cumsum(is_breakpoint[merged])
+    indices = np.empty(len(merged), dtype=int)
+    indices[merged] = num_preceding
+    indices = indices[len(xs_shift):] - ext_starts[sample_phrase_ids]
+
+    # Clip the indices and look up the pitches of the previous notes
+    indices = indices.clip(1, ext_lengths[sample_phrase_ids])
+    contours = ys[ext_starts[sample_phrase_ids] + indices - 1]
+    return contours.reshape(num_phrases, num_samples).astype(dtype)
 
-def normalized_contours(df: pd.DataFrame):
+def interpolate_phrases(table: NoteTable, num_samples: int = 50,
+    dtype: typing.Any = int) -> np.array:
+    """Interpolate all phrases in a note table using 
+    :func:`interpolate_batch`. Returns an array of shape 
+    `(num_phrases, num_samples)`."""
+    is_note = table.is_note
+    cum_num_notes = np.concatenate([[0], np.cumsum(is_note)])
+    return interpolate_batch(
+        bounds=cum_num_notes[table.phrase_bounds],
+        offsets=table.onsets[is_note],
+        pitches=table.pitches[is_note],
+        durations=table.phrase_durations,
+        num_samples=num_samples, dtype=dtype)
+
+def normalized_contours(contours, chunk_size: int = None,
+    out: np.array = None) -> np.array:
     """Extract a Numpy array of normalized pitch contours from a dataframe
-    with pitch contours"""
-    start_index = list(df.columns).index('0')
-    pitches = df.iloc[:, start_index:].values
-    means = pitches.mean(axis=1)
-    normalized_pitches = pitches - means[:, np.newaxis]
-    return normalized_pitches
+    with pitch contours, or from a 2-D array of pitches (which can be
+    memory-mapped).
+
+    The contours are normalized in chunks of `chunk_size` rows, so that only
+    one chunk of the pitches is converted to floats at a time. The result is
+    written to `out` if it is passed, which can also be a memory-mapped array.
+    """
+    if isinstance(contours, pd.DataFrame):
+        pitches = contours[pitch_columns(contours)].values
+    else:
+        pitches = contours
+    if out is None:
+        out = np.empty(pitches.shape, dtype=float)
+    if chunk_size is None:
+        chunk_size = max(len(pitches), 1)
+    for start in range(0, len(pitches), chunk_size):
+        chunk = np.asarray(pitches[start:start + chunk_size], dtype=float)
+        means = chunk.mean(axis=1)
+        out[start:start + chunk_size] = chunk - means[:, np.newaxis]
+    return out
 
 def extract_phrases_from_file(filename: str) -> list:
-    chant = converter.parse(filename)
+    """Extract all phrases from a file, as music21 streams"""
+    chant = music21.converter.parse(filename)
     return chant.phrases
 
+def extract_note_table_from_file(filename: str, 
+    cache: ParseCache = None, tables: dict = None) -> NoteTable:
+    """Extract the note table of a file, whose phrases are the phrases of 
+    the chant. This is much faster to work with than the streams returned by
+    :func:`extract_phrases_from_file`. If a :class:`ParseCache` is passed, 
+    the file is only parsed if it is not in the cache. Files in `tables` 
+    (see :func:`parse_note_tables`) are not parsed again."""
+    return parse_note_table(filename, cache=cache, tables=tables)
+
+def extract_contours_from_file(filepath: str, num_samples: int = 50,
+    extractor = extract_note_table_from_file, 
+    extractor_kwargs: dict = {}) -> list:
+    """Extract the contours of all phrases in a single file. This function
+    is applied to every file by :func:`extract_phrase_contours`, possibly in 
+    a worker process. 
+
+    The extractor should return a :class:`NoteTable` whose phrases are the 
+    segments for which contours are computed, or a list of phrases (note 
+    tables or music21 streams).
+
+    Returns
+    -------
+    list
+        A list of rows `(contour, phrase_num, phrase_length, phrase_duration)`,
+        one for every phrase in the file. An exception is raised if any of the
+        phrases could not be extracted.
+    """
+    table = extractor(filepath, **extractor_kwargs)
+    if not isinstance(table, NoteTable):
+        table = NoteTable.concatenate([
+            phrase if isinstance(phrase, NoteTable) 
+            else NoteTable.from_stream(phrase) for phrase in table])
+    
+    if table.num_phrases == 0:
+        return []
+    contours = interpolate_phrases(table, num_samples=num_samples)
+    phrase_lengths = table.phrase_lengths()
+    rows = []
+    for i in range(table.num_phrases):
+        rows.append((contours[i], i, phrase_lengths[i], 
+            table.phrase_durations[i]))
+    return rows
+
+def _try_extract_contours_from_file(filepath: str, **kwargs) -> tuple:
+    """Wraps :func:`extract_contours_from_file` so that exceptions are 
+    returned rather than raised: `(rows, None)` or `(None, error_message)`."""
+    try:
+        return extract_contours_from_file(filepath, **kwargs), None
+    except Exception as e:
+        return None, str(e)
+
 def extract_phrase_contours(filepaths: list, num_samples: int = 50,
     contour_id_tmpl: str = '{i:0>3}',
-    extractor = extract_phrases_from_file,
-    extractor_kwargs: dict = {}) -> pd.DataFrame:
+    extractor = extract_note_table_from_file,
+    extractor_kwargs: dict = {},
+    workers: int = 1) -> pd.DataFrame:
     """Extract all phrase contours from an iterable of files.
     The song ids are extracted from the filenames automatically.
     
@@ -88,54 +320,110 @@ def extract_phrase_contours(filepaths: list, num_samples: int = 50,
     num_samples : int, optional
         The number of points at which the pitch is computed, by default 50
     contour_id_tmpl : str, optional
-        A template string for the contour ids, for example: `nova{i:0>3}`.
-        Defaults to `'{i:0>3}'`
+        A template string for the contour ids, for example: `nova{i:0>3}`,
+        where `i` is a sequential number starting at 1. The template can also
+        use the fields `song_id` and `phrase_num`, which gives ids that do not
+        change when other files are added or removed, for example 
+        `nova-{song_id}-{phrase_num:0>3}`. Defaults to `'{i:0>3}'`
+    workers : int, optional
+        The number of worker processes over which the files are distributed.
+        The results (and their order) do not depend on the number of workers, 
+        provided that the extractor is deterministic. By default 1, which 
+        extracts all files serially in the current process.
     
     Returns
     -------
     pd.DataFrame
         A Dataframe with song ids, phrase numbers and the contours
     """
+    batches = _iter_extracted_files(filepaths, num_samples=num_samples,
+        extractor=extractor, extractor_kwargs=extractor_kwargs, 
+        workers=workers)
+    return _contours_to_frame(list(batches), num_samples=num_samples,
+        contour_id_tmpl=contour_id_tmpl)
+
+def _iter_extracted_files(filepaths: list, num_samples: int = 50,
+    extractor = extract_note_table_from_file, extractor_kwargs: dict = {},
+    workers: int = 1):
+    """Extract the contours of all files, possibly in worker processes, and
+    yield `(song_id, rows)` for every file (in the order of `filepaths`), 
+    where `rows` are the rows returned by :func:`extract_contours_from_file`.
+    Files of which not all phrases could be extracted are skipped."""
+    filepaths = list(filepaths)
+    extract = partial(_try_extract_contours_from_file, 
+        num_samples=num_samples, 
+        extractor=extractor,
+        extractor_kwargs=extractor_kwargs)
+    if workers > 1:
+        chunksize = max(1, min(len(filepaths) // (4 * workers), 25))
+        results = _iter_parallel(extract, filepaths, workers=workers,
+            chunksize=chunksize)
+    else:
+        results = map(extract, filepaths)
+
+    try:
+        for filepath, (rows, error) in zip(filepaths, results):
+            filename = os.path.basename(filepath)
+            song_id = os.path.splitext(filename)[0]
+            
+            # Only add phrases if all phrases could be extracted
+            if error is not None:
+                logging.warn(f'Skipping {song_id}: {error}')
+                continue
+            logging.info(f'Extracted {len(rows):0>2} contours from {filename}')
+            yield song_id, rows
+    finally:
+        if workers > 1:
+            results.close()
+
+def _apply_to_chunk(func, items: list) -> list:
+    return [func(item) for item in items]
+
+def _iter_parallel(func, items: list, workers: int, chunksize: int = 1):
+    """Apply `func` to all items in worker processes and yield the results in
+    order. At most `2 * workers` chunks of `chunksize` items are submitted at
+    any time, so that when the iteration is stopped early (or fails), the 
+    remaining chunks are cancelled rather than processed."""
+    executor = ProcessPoolExecutor(max_workers=workers)
+    futures = deque()
+    try:
+        for start in range(0, len(items), chunksize):
+            futures.append(executor.submit(_apply_to_chunk, func, 
+                items[start:start + chunksize]))
+            if len(futures) >= 2 * workers:
+                yield from futures.popleft().result()
+        while len(futures) > 0:
+            yield from futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+
+def _contours_to_frame(batches: list, num_samples: int = 50,
+    contour_id_tmpl: str = '{i:0>3}', start: int = 0) -> pd.DataFrame:
+    """Package the rows of several files (see :func:`_iter_extracted_files`) 
+    in a DataFrame. Contours are numbered from `start + 1` onwards."""
     contours = []
     song_ids = []
     phrase_numbers = []
     phrase_lengths = []
     phrase_durations = []
-    for filepath in filepaths:
-        filename = os.path.basename(filepath)
-        song_id = os.path.splitext(filename)[0]
-        tmp_contours = []
-        tmp_song_ids = []
-        tmp_phrase_numbers = []
-        tmp_phrase_lengths = []
-        tmp_phrase_durations = []
-        try:
-            phrases = extractor(filepath, **extractor_kwargs)
-            for i, phrase in enumerate(phrases):
-                ys = interpolate_stream(phrase, num_samples=num_samples)
-                tmp_contours.append(ys)
-                tmp_song_ids.append(song_id)
-                tmp_phrase_numbers.append(i)
-                tmp_phrase_lengths.append(len(phrase.flat.notes))
-                tmp_phrase_durations.append(float(phrase.quarterLength))
-            
-            # Only add phrases if all phrases could be extracted
-            contours.extend(tmp_contours)
-            song_ids.extend(tmp_song_ids)
-            phrase_numbers.extend(tmp_phrase_numbers)
-            phrase_lengths.extend(tmp_phrase_lengths)
-            phrase_durations.extend(tmp_phrase_durations)
-            logging.info(f'Extracted {len(phrases):0>2} contours from {filename}')
-        except Exception as e:
-            logging.warn(f'Skipping {song_id}: {e}')
-    
-    # Package the contours in a DataFrame
-    df = pd.DataFrame(contours)
+    for song_id, rows in batches:
+        for ys, phrase_num, phrase_length, phrase_duration in rows:
+            contours.append(ys)
+            song_ids.append(song_id)
+            phrase_numbers.append(phrase_num)
+            phrase_lengths.append(phrase_length)
+            phrase_durations.append(phrase_duration)
+    
+    df = pd.DataFrame(contours, columns=range(num_samples))
     df['song_id'] = song_ids
     df['phrase_num'] = phrase_numbers
     df['phrase_duration'] = phrase_durations
     df['phrase_length'] = phrase_lengths
-    contour_ids = [contour_id_tmpl.format(i=i) for i in range(1, len(df)+1)]
+    numbers = range(start + 1, start + len(df) + 1)
+    contour_ids = [contour_id_tmpl.format(i=i, song_id=song_id, phrase_num=num) 
+        for i, song_id, num in zip(numbers, song_ids, phrase_numbers)]
     df['contour_id'] = contour_ids
     column_order = [
         'contour_id', 
@@ -146,10 +434,250 @@ def extract_phrase_contours(filepaths: list, num_samples: int = 50,
     column_order += list(range(0, num_samples))
     return df[column_order].set_index('contour_id')
 
+def iter_phrase_contours(filepaths: list, num_samples: int = 50,
+    contour_id_tmpl: str = '{i:0>3}',
+    extractor = extract_note_table_from_file,
+    extractor_kwargs: dict = {},
+    workers: int = 1, 
+    batch_size: int = 1000):
+    """Extract all phrase contours from an iterable of files, like
+    :func:`extract_phrase_contours`, but yield them in DataFrames of (at 
+    least) `batch_size` contours. The contours of a file are never split 
+    over two batches, and all batches together are identical to the 
+    DataFrame returned by :func:`extract_phrase_contours`. Only the contours
+    of a single batch are kept in memory."""
+    batch = []
+    batch_length = 0
+    num_contours = 0
+    for song_id, rows in _iter_extracted_files(filepaths, 
+        num_samples=num_samples, extractor=extractor, 
+        extractor_kwargs=extractor_kwargs, workers=workers):
+        batch.append((song_id, rows))
+        batch_length += len(rows)
+        if batch_length >= batch_size:
+            yield _contours_to_frame(batch, num_samples=num_samples, 
+                contour_id_tmpl=contour_id_tmpl, start=num_contours)
+            num_contours += batch_length
+            batch = []
+            batch_length = 0
+    if len(batch) > 0:
+        yield _contours_to_frame(batch, num_samples=num_samples, 
+            contour_id_tmpl=contour_id_tmpl, start=num_contours)
+
+def write_phrase_contours(filepaths: list, path: str, 
+    batch_size: int = 1000, **kwargs) -> int:
+    """Extract all phrase contours from an iterable of files and write them 
+    to a CSV file in batches (see :func:`iter_phrase_contours`), so that the
+    memory use does not grow with the number of files. Every batch is 
+    flushed to disk immediately, so an interrupted run leaves all complete
+    batches behind. The file is identical to the CSV file of the DataFrame
+    returned by :func:`extract_phrase_contours`. Other keyword arguments are
+    passed to :func:`iter_phrase_contours`.
+
+    Returns
+    -------
+    int
+        The number of contours written
+    """
+    batches = iter_phrase_contours(filepaths, batch_size=batch_size, **kwargs)
+    return write_contour_batches(batches, path, 
+        num_samples=kwargs.get('num_samples', 50))
+
+def write_contour_batches(batches, path: str, num_samples: int = 50) -> int:
+    """Write an iterable of contour DataFrames (e.g. from 
+    :func:`iter_phrase_contours`) to a single CSV file, flushing every batch
+    to disk immediately. If there are no batches, only the header is written.
+
+    Returns
+    -------
+    int
+        The number of contours written
+    """
+    num_contours = 0
+    with open(path, 'w') as handle:
+        for i, batch in enumerate(batches):
+            batch.to_csv(handle, header=(i == 0))
+            handle.flush()
+            num_contours += len(batch)
+        if handle.tell() == 0:
+            _contours_to_frame([], num_samples=num_samples).to_csv(handle)
+    return num_contours
+
+def _extract_seeded_random_segments_from_file(filepath: str, lam: float,
+    random_seed: int = 0, cache: ParseCache = None, 
+    tables: dict = None) -> NoteTable:
+    """Extract random segments from a file using a generator seeded with 
+    both `random_seed` and the song id, so that the segments of a file do not
+    depend on the other files"""
+    song_id = os.path.splitext(os.path.basename(filepath))[0]
+    song_seed = int(md5string(song_id)[:8], 16)
+    rng = np.random.default_rng([random_seed, song_seed])
+    return extract_random_segments_from_file(filepath, lam=lam, cache=cache,
+        rng=rng, tables=tables)
+
 def extract_random_contours(filepaths: list, lam: float,
     num_samples: int = 50, contour_id_tmpl: str = '{i:0>3}', 
-    random_seed: float = 0):
-    np.random.seed(random_seed)
-    return extract_phrase_contours(filepaths=filepaths, num_samples=num_samples,
-        contour_id_tmpl=contour_id_tmpl, extractor=extract_random_segments_from_file,
-        extractor_kwargs=dict(lam=lam))
\ No newline at end of file
+    random_seed: float = 0, cache: ParseCache = None, rng = None,
+    seed_per_file: bool = False, workers: int = 1, tables: dict = None):
+    """Extract contours of random segments with Poisson-distributed lengths
+    from an iterable of files (see :func:`extract_phrase_contours`).
+
+    By default, the segments are drawn from the global random state, seeded
+    with `random_seed`. Alternatively you can pass a `numpy.random.Generator`
+    (or a seed) as `rng`, in which case the faster, vectorized 
+    :func:`poisson_segment_bounds` is used and the global state is left 
+    untouched. The results then differ from the default ones.
+
+    With `seed_per_file=True`, every file gets its own generator, seeded with
+    `random_seed` and its song id. The random contours of a file then do not 
+    depend on the other files, which allows updating a dataset file by file.
+    Only in this mode the files can be distributed over several `workers`.
+    Files in `tables` (see :func:`parse_note_tables`) are not parsed again.
+    """
+    options = _random_extractor_options(lam, random_seed=random_seed, 
+        cache=cache, rng=rng, seed_per_file=seed_per_file, workers=workers, 
+        tables=tables)
+    return extract_phrase_contours(filepaths=filepaths, 
+        num_samples=num_samples, contour_id_tmpl=contour_id_tmpl, **options)
+
+def iter_random_contours(filepaths: list, lam: float, 
+    num_samples: int = 50, contour_id_tmpl: str = '{i:0>3}', 
+    batch_size: int = 1000, **kwargs):
+    """Extract contours of random segments like 
+    :func:`extract_random_contours` (which describes the other keyword 
+    arguments), but yield them in batches, like :func:`iter_phrase_contours`.
+    The global random state is seeded when the iteration starts."""
+    options = _random_extractor_options(lam, **kwargs)
+    yield from iter_phrase_contours(filepaths, num_samples=num_samples,
+        contour_id_tmpl=contour_id_tmpl, batch_size=batch_size, **options)
+
+def _random_extractor_options(lam: float, random_seed: float = 0, 
+    cache: ParseCache = None, rng = None, seed_per_file: bool = False, 
+    workers: int = 1, tables: dict = None) -> dict:
+    """The extractor (and its options) for the random contours, see 
+    :func:`extract_random_contours`. Seeds the global random state if the
+    segments are drawn from it."""
+    if seed_per_file:
+        return dict(extractor=_extract_seeded_random_segments_from_file,
+            extractor_kwargs=dict(lam=lam, random_seed=random_seed, 
+                cache=cache, tables=tables),
+            workers=workers)
+    if rng is None:
+        # The random segments are drawn from the global random state, so the
+        # extraction has to be serial to be reproducible.
+        np.random.seed(random_seed)
+    else:
+        rng = np.random.default_rng(rng)
+    return dict(extractor=extract_random_segments_from_file,
+        extractor_kwargs=dict(lam=lam, cache=cache, rng=rng, tables=tables))
+
+def _try_parse_note_table(filepath: str, cache: ParseCache = None) -> tuple:
+    try:
+        return parse_note_table(filepath, cache=cache), None
+    except Exception as e:
+        return None, str(e)
+
+def parse_note_tables(filepaths: list, cache: ParseCache = None,
+    workers: int = 1) -> dict:
+    """Parse all files (possibly in several worker processes) and return a
+    dictionary mapping every file path to a tuple `(table, error)`: the note
+    table and None, or None and the error message if the file could not be
+    parsed. The result can be passed as `tables` to the extraction functions,
+    so that files used several times are only parsed once."""
+    filepaths = list(filepaths)
+    extract = partial(_try_parse_note_table, cache=cache)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(filepaths) // (4 * workers))
+            results = list(executor.map(extract, filepaths, chunksize=chunksize))
+    else:
+        results = list(map(extract, filepaths))
+    return dict(zip(filepaths, results))
+
+def load_note_tables(filepaths: list, cache: ParseCache = None,
+    workers: int = 1) -> dict:
+    """Parse all files (possibly in several worker processes) and return a
+    dictionary mapping song ids to note tables. Files that cannot be parsed
+    are skipped."""
+    tables = {}
+    parsed = parse_note_tables(filepaths, cache=cache, workers=workers)
+    for filepath, (table, error) in parsed.items():
+        song_id = os.path.splitext(os.path.basename(filepath))[0]
+        if error is not None:
+            logging.warn(f'Skipping {song_id}: {error}')
+            continue
+        tables[song_id] = table
+    return tables
+
+def random_contour_bands(filepaths: list, lam: float, 
+    num_replicates: int = 100, quantiles: list = [0.025, 0.975],
+    num_samples: int = 50, min_phrase_length: int = 1, 
+    random_seed: int = 0, cache: ParseCache = None, 
+    workers: int = 1) -> dict:
+    """Compute the average (normalized) contour of many independent random 
+    baselines, and confidence bands around it.
+    
+    Every file is parsed only once. For every replicate, the random segments
+    of all files are then drawn in one batch (see 
+    :func:`batch_poisson_segment_bounds`) and interpolated in one batch. 
+    Every replicate uses its own random number generator, spawned from 
+    `random_seed`, so the results do not depend on the number of replicates.
+    Contours are normalized by subtracting their mean pitch, as in 
+    :func:`normalized_contours`. Unlike :func:`extract_random_contours`, 
+    segments without notes are dropped rather than the entire file.
+
+    Parameters
+    ----------
+    filepaths : list
+        An iterable of file paths
+    lam : float
+        The Poisson parameter: average length of the random segments
+    num_replicates : int, optional
+        The number of random baselines, by default 100
+    quantiles : list, optional
+        The quantiles of the bands, by default [0.025, 0.975]
+    num_samples : int, optional
+        The number of points at which the pitch is computed, by default 50
+    min_phrase_length : int, optional
+        Only include segments with at least this many notes, by default 1
+    random_seed : int, optional
+        The seed from which the generators of all replicates are spawned,
+        by default 0
+    cache : ParseCache, optional
+        A cache of parsed files, by default None
+    workers : int, optional
+        The number of processes used to parse the files, by default 1
+    
+    Returns
+    -------
+    dict
+        A dictionary with arrays `mean` (the average contour over all 
+        replicates, shape `(num_samples,)`), `bands` (the quantiles of
+        the average contours of the replicates, shape 
+        `(len(quantiles), num_samples)`), `replicate_means` (the average 
+        contour of every replicate, shape `(num_replicates, num_samples)`)
+        and `num_contours` (the number of contours in every replicate).
+    """
+    tables = load_note_tables(filepaths, cache=cache, workers=workers)
+    corpus = NoteTable.concatenate(list(tables.values()))
+    cum_num_notes = np.concatenate([[0], np.cumsum(corpus.is_note)])
+    seeds = np.random.SeedSequence(random_seed).spawn(num_replicates)
+    
+    replicate_means = np.zeros((num_replicates, num_samples))
+    num_contours = np.zeros(num_replicates, dtype=int)
+    for k, seed in enumerate(seeds):
+        starts, ends = batch_poisson_segment_bounds(corpus.phrase_bounds, 
+            lam=lam, rng=np.random.default_rng(seed))
+        phrase_lengths = cum_num_notes[ends] - cum_num_notes[starts]
+        is_long_enough = phrase_lengths >= max(1, min_phrase_length)
+        segments = corpus.segments(starts[is_long_enough], ends[is_long_enough])
+        contours = interpolate_phrases(segments, num_samples=num_samples)
+        normalized = contours - contours.mean(axis=1)[:, np.newaxis]
+        replicate_means[k] = normalized.mean(axis=0)
+        num_contours[k] = len(contours)
+    
+    return dict(
+        mean=replicate_means.mean(axis=0),
+        bands=np.quantile(replicate_means, quantiles, axis=0),
+        replicate_means=replicate_means,
+        num_contours=num_contours)
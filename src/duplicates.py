@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""Hash-based detection of duplicate chants and contours.
+
+Every item (the notes of a chant, or the pitches of a contour) is reduced to a
+64-bit hash, and items with the same hash are treated as duplicates. The
+chance that two different items collide is negligible (about `n**2 / 2**65`
+for `n` items; less than 1e-8 for a million items). A :class:`DuplicateIndex`
+groups the items by their hashes and can be stored, so that the hashes of a
+large dataset only have to be computed once.
+
+>>> from src.contour_io import read_contours
+>>> contours = read_contours('data/phrase-contours/liber-kyries-phrase-contours.csv')
+>>> index = DuplicateIndex.from_contours(contours)
+>>> len(index), index.num_groups
+(1730, 1258)
+>>> unique_contours = contours[~index.duplicated()]
+>>> len(unique_contours)
+1258
+
+The index can be stored in an npz file and loaded again:
+
+>>> import os, tempfile
+>>> with tempfile.TemporaryDirectory() as tmp_dir:
+...     path = os.path.join(tmp_dir, 'kyries-duplicates.npz')
+...     index.save(path)
+...     DuplicateIndex.load(path).num_groups
+1258
+
+Near-duplicates are found by hashing a normalized version of the items: the
+volpiano without liquescents, or contours that are transposed to the same
+lowest pitch and rounded to a coarser resolution.
+"""
+import numpy as np
+import pandas as pd
+
+from .contour_io import pitch_columns
+from .volpiano import volpiano_characters
+from .volpiano import VolpianoAccessor # registers the .vp accessor
+
+_HASH_SEED = np.uint64(0x9e3779b97f4a7c15)
+_LIQUESCENTS_TO_NOTES = str.maketrans(volpiano_characters('liquescents'),
+    volpiano_characters('notes'))
+
+def _mix(values: np.array) -> np.array:
+    """The splitmix64 finalizer: scrambles the bits of uint64 values"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+def hash_rows(matrix: np.array) -> np.array:
+    """Returns a 64-bit hash of the bytes of every row of a matrix.
+
+    Parameters
+    ----------
+    matrix : np.array
+        A two-dimensional array of any fixed-size dtype
+
+    Returns
+    -------
+    np.array
+        A uint64 array with one hash per row
+    """
+    matrix = np.ascontiguousarray(matrix)
+    num_rows = matrix.shape[0]
+    row_width = matrix.itemsize * int(np.prod(matrix.shape[1:]))
+    row_bytes = matrix.view(np.uint8).reshape(num_rows, row_width)
+    padding = -row_bytes.shape[1] % 8
+    if padding > 0:
+        row_bytes = np.pad(row_bytes, [(0, 0), (0, padding)])
+    words = row_bytes.view(np.uint64)
+    hashes = np.full(num_rows, _HASH_SEED, dtype=np.uint64)
+    for i in range(words.shape[1]):
+        hashes = _mix(hashes ^ _mix(words[:, i] + np.uint64(i)))
+    return hashes
+
+def hash_strings(strings) -> np.array:
+    """Returns a 64-bit hash of every string in a list, array or series.
+    Missing values all get the same hash."""
+    values = pd.Series(strings).to_numpy(dtype=object, copy=True)
+    values[pd.isnull(values)] = None
+    return pd.util.hash_array(values, categorize=False)
+
+def contour_hashes(contours, transpose: bool = False,
+    resolution: float = None) -> np.array:
+    """Returns a 64-bit hash of every contour. Contours with integer pitches
+    are hashed as rows of int8 values, and other contours as float64 values,
+    so the hash of a contour does not depend on the dtype of the dataset.
+
+    Parameters
+    ----------
+    contours : pd.DataFrame or np.array
+        A contour dataset (only the pitch columns are used), or a matrix of
+        pitches with one contour per row
+    transpose : bool, optional
+        Transpose all contours so that their lowest pitch is 0, so that
+        transpositions of a contour get the same hash. By default False
+    resolution : float, optional
+        Round the pitches to multiples of `resolution` (in semitones), so
+        that contours that differ by less get the same hash. By default
+        None: no rounding.
+
+    Returns
+    -------
+    np.array
+        A uint64 array with one hash per contour
+    """
+    if isinstance(contours, pd.DataFrame):
+        contours = contours[pitch_columns(contours)].to_numpy()
+    pitches = np.asarray(contours)
+    if transpose and pitches.shape[1] > 0:
+        pitches = pitches - pitches.min(axis=1, keepdims=True)
+    if resolution is not None:
+        pitches = np.round(pitches / resolution)
+
+    int8 = np.iinfo(np.int8)
+    is_integral = ((pitches == np.round(pitches)) 
+        & (pitches >= int8.min) & (pitches <= int8.max)).all(axis=1)
+    if is_integral.all():
+        return hash_rows(pitches.astype(np.int8))
+    hashes = np.empty(len(pitches), dtype=np.uint64)
+    hashes[is_integral] = hash_rows(pitches[is_integral].astype(np.int8))
+    hashes[~is_integral] = hash_rows(pitches[~is_integral].astype(np.float64))
+    return hashes
+
+def volpiano_hashes(volpianos, ignore_liquescents: bool = False,
+    **kwargs) -> np.array:
+    """Returns a 64-bit hash of the notes of every volpiano string.
+
+    Parameters
+    ----------
+    volpianos : pd.Series
+        The volpiano strings
+    ignore_liquescents : bool, optional
+        Treat liquescents as ordinary notes, by default False
+    **kwargs
+        Options passed to :func:`src.volpiano.clean_volpiano`. By default,
+        only the notes are kept.
+
+    Returns
+    -------
+    np.array
+        A uint64 array with one hash per string
+    """
+    notes = pd.Series(volpianos).vp.clean(**kwargs)
+    if ignore_liquescents:
+        notes = notes.str.translate(_LIQUESCENTS_TO_NOTES)
+    return hash_strings(notes)
+
+class DuplicateIndex(object):
+    """Groups items (chants, contours) by their 64-bit hashes. Items with the
+    same hash are duplicates. Groups are numbered in order of their first
+    occurrence.
+
+    Parameters
+    ----------
+    hashes : np.array
+        The hashes of all items
+    index : pd.Index or list, optional
+        The labels of the items, such as the index of the dataframe they come
+        from. By default a range index.
+    """
+
+    def __init__(self, hashes, index=None):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        if index is None:
+            index = pd.RangeIndex(len(self.hashes))
+        self.index = pd.Index(index)
+        if len(self.index) != len(self.hashes):
+            raise ValueError('The index and the hashes differ in length')
+        self._group_ids = None
+
+    @classmethod
+    def from_contours(cls, contours, transpose: bool = False,
+        resolution: float = None):
+        """Index of a contour dataset (or a pitch matrix); see
+        :func:`contour_hashes` for the options"""
+        index = contours.index if isinstance(contours, pd.DataFrame) else None
+        hashes = contour_hashes(contours, transpose=transpose,
+            resolution=resolution)
+        return cls(hashes, index=index)
+
+    @classmethod
+    def from_volpiano(cls, volpianos, ignore_liquescents: bool = False,
+        **kwargs):
+        """Index of the notes in a series of volpiano strings; see
+        :func:`volpiano_hashes` for the options"""
+        volpianos = pd.Series(volpianos)
+        hashes = volpiano_hashes(volpianos,
+            ignore_liquescents=ignore_liquescents, **kwargs)
+        return cls(hashes, index=volpianos.index)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @property
+    def group_ids(self) -> np.array:
+        """The group number of every item"""
+        if self._group_ids is None:
+            self._group_ids, _ = pd.factorize(self.hashes)
+        return self._group_ids
+
+    @property
+    def num_groups(self) -> int:
+        """The number of distinct items"""
+        return int(self.group_ids.max()) + 1 if len(self) > 0 else 0
+
+    def duplicated(self, keep='first') -> np.array:
+        """Returns a boolean array marking the duplicates, like
+        `pd.DataFrame.duplicated`. With `keep='first'` (or `'last'`), all
+        but the first (last) item of every group are marked; with
+        `keep=False` all items in groups of two or more."""
+        return pd.Index(self.hashes).duplicated(keep=keep)
+
+    def unique_index(self) -> pd.Index:
+        """The labels of the first item of every group"""
+        return self.index[~self.duplicated()]
+
+    def group_sizes(self) -> np.array:
+        """The number of items in every group"""
+        return np.bincount(self.group_ids, minlength=self.num_groups)
+
+    def groups(self) -> pd.DataFrame:
+        """Returns a dataframe with one row per group, and columns `hash`,
+        `size` (the number of items) and `first` (the label of the first item
+        in the group)"""
+        first = ~self.duplicated()
+        return pd.DataFrame({
+            'hash': self.hashes[first],
+            'size': self.group_sizes(),
+            'first': self.index[first],
+        }, index=pd.RangeIndex(self.num_groups, name='group'))
+
+    def members(self, label) -> pd.Index:
+        """The labels of all items in the same group as the item `label`"""
+        position = self.index.get_loc(label)
+        return self.index[self.group_ids == self.group_ids[position]]
+
+    def save(self, path: str):
+        """Store the index as an npz file"""
+        index = self.index.to_numpy()
+        if index.dtype.kind in 'OUS':
+            index = np.char.encode(index.astype(str))
+        name = str(self.index.name) if self.index.name is not None else ''
+        np.savez(path, hashes=self.hashes, index=index,
+            index_name=np.char.encode(np.array([name])))
+
+    @classmethod
+    def load(cls, path: str):
+        """Load an index stored by :meth:`save`"""
+        with np.load(path) as arrays:
+            index = arrays['index']
+            if index.dtype.kind == 'S':
+                index = np.char.decode(index).astype(object)
+            name = np.char.decode(arrays['index_name'])[0] or None
+            return cls(arrays['hashes'], index=pd.Index(index, name=name))
@@ -11,13 +11,29 @@ Usage:  `python generate_contours.py [--genre]`
 """
 import os
 import glob
+import json
 import logging
 import hashlib
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 from .helpers import md5checksum
 from .helpers import relpath
 from .contours import extract_phrase_contours
 from .contours import extract_random_contours
+from .contours import iter_phrase_contours
+from .contours import iter_random_contours
+from .contours import write_contour_batches
+from .contours import parse_note_tables
+from .contour_io import write_contours
+from .contour_io import read_contours
+from .contour_io import pitch_columns
+from .parse_cache import ParseCache
+from .duplicates import DuplicateIndex
+from .duplicates import contour_hashes
+from .gregobase_corpus import GregoBaseCorpus
+from .gregobase_corpus import GENRES
+from .gregobase_corpus import LIBER_USUALIS
 
 _CUR_DIR = os.path.dirname(__file__)
 _ROOT_DIR = os.path.abspath(os.path.join(_CUR_DIR, os.path.pardir))
@@ -31,18 +47,47 @@ _LOGGING_OPTIONS = dict(
     datefmt='%d-%m-%y %H:%M:%S',
     level=logging.INFO)
 
-    
+@contextmanager
+def _log_to_file(path: str):
+    """Write all log messages to a file (overwriting it) within the context.
+    Unlike `logging.basicConfig`, this also works when several datasets are
+    generated in the same process, each with its own log."""
+    handler = logging.FileHandler(path, mode=_LOGGING_OPTIONS['filemode'])
+    handler.setFormatter(logging.Formatter(_LOGGING_OPTIONS['format'],
+        datefmt=_LOGGING_OPTIONS['datefmt']))
+    logger = logging.getLogger()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(_LOGGING_OPTIONS['level'])
+    try:
+        yield
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+        handler.close()
+
+# The columns of a contour dataset, besides the pitches
+_METADATA_COLUMNS = ['song_id', 'phrase_num', 'phrase_length', 
+    'phrase_duration']
+
+# Increase this whenever the structure of the manifests changes
+_MANIFEST_VERSION = 1
 
 def sample_subset(df, min_phrase_length: int = 4, num_contours: int = 3000,
-    random_state: float = 0):
+    random_state: float = 0, duplicates: DuplicateIndex = None):
+    """Sample a subset of unique contours of length `min_phrase_length` or 
+    more. Duplicates are found using a :class:`DuplicateIndex` of the 
+    contours, which is computed unless it is passed as `duplicates`."""
     # Filter out duplicate contours
     logging.info(f'Sampling a subset of contours')
 
     orig_size = len(df)
-    unique_index = df.iloc[:, 4:].drop_duplicates().index
-    logging.info(f'>  Removed {orig_size - len(unique_index)} duplicates; {len(unique_index)} contours left.')
-    subset = df.loc[unique_index,]
-    subset.loc[unique_index, :]
+    if duplicates is None:
+        duplicates = DuplicateIndex.from_contours(df)
+    elif not duplicates.index.equals(df.index):
+        raise ValueError('The duplicate index does not match the contours')
+    subset = df[~duplicates.duplicated()]
+    logging.info(f'>  Removed {orig_size - len(subset)} duplicates; {len(subset)} contours left.')
 
     # Remove short phrases
     is_long_enough = subset['phrase_length'] >= min_phrase_length
@@ -58,56 +103,294 @@ def sample_subset(df, min_phrase_length: int = 4, num_contours: int = 3000,
     subset.sort_index(inplace=True)
     return subset
 
+def store_contours(df, name: str, description: str, 
+    formats: list = ['csv'], output_dir: str = _OUTPUT_DIR):
+    """Store a contour dataset in one or more formats (`csv`, `npz` or 
+    `parquet`, see :mod:`src.contour_io`) and log the md5 checksums"""
+    for format in formats:
+        fn = os.path.join(output_dir, f'{name}.{format}')
+        write_contours(df, fn)
+        _log_stored(fn, description)
+
+def _log_stored(fn: str, description: str):
+    md5 = md5checksum(fn)
+    logging.info(f'Stored {description} to {relpath(fn)}')
+    logging.info(f'md5 checksum: {md5}')
+
+def stream_contours(batches, name: str, description: str, 
+    num_samples: int = 50, output_dir: str = _OUTPUT_DIR) -> tuple:
+    """Write batches of contours (see :func:`src.contours.iter_phrase_contours`)
+    to a CSV file while they are extracted, and log the md5 checksum. Only 
+    the metadata and the hashes of the contours are kept in memory.
+
+    Returns
+    -------
+    tuple
+        A tuple `(metadata, duplicates)`: a DataFrame with all columns except
+        the pitches, and a :class:`DuplicateIndex` of the contours. These can
+        be passed to :func:`sample_subset`.
+    """
+    metadata, hashes = [], []
+    def summarize(batches):
+        for batch in batches:
+            metadata.append(batch[_METADATA_COLUMNS])
+            hashes.append(contour_hashes(batch))
+            yield batch
+
+    fn = os.path.join(output_dir, f'{name}.csv')
+    write_contour_batches(summarize(batches), fn, num_samples=num_samples)
+    _log_stored(fn, description)
+    if len(metadata) == 0:
+        metadata = read_contours(fn)[_METADATA_COLUMNS]
+        hashes = [np.empty(0, dtype=np.uint64)]
+    metadata = pd.concat(metadata)
+    return metadata, DuplicateIndex(np.concatenate(hashes), metadata.index)
+
+def _read_rows(fn: str, index: pd.Index, chunksize: int = 10000):
+    """Read the rows with the given index from a CSV file with contours, 
+    in chunks, in the order of the index"""
+    chunks = pd.read_csv(fn, index_col=0, dtype={'song_id': str},
+        chunksize=chunksize)
+    rows = [chunk[chunk.index.isin(index)] for chunk in chunks]
+    if len(rows) == 0:
+        return read_contours(fn)
+    return pd.concat(rows).loc[index]
+
+def _store_contours_and_subset(contours, name: str, description: str,
+    num_samples: int = 50, formats: list = ['csv'], 
+    output_dir: str = _OUTPUT_DIR) -> pd.DataFrame:
+    """Store a contour dataset and a subset of it. The contours are either a
+    DataFrame or an iterable of batches, which are streamed to a CSV file 
+    (see :func:`stream_contours`). In that case only the metadata of the 
+    contours is returned, and only the rows of the subset are read back."""
+    if isinstance(contours, pd.DataFrame):
+        store_contours(contours, name, description, formats=formats,
+            output_dir=output_dir)
+        subset = sample_subset(contours)
+    else:
+        if formats != ['csv']:
+            raise ValueError('Only CSV files can be streamed')
+        contours, duplicates = stream_contours(contours, name, description, 
+            num_samples=num_samples, output_dir=output_dir)
+        subset = sample_subset(contours, duplicates=duplicates)
+        subset = _read_rows(os.path.join(output_dir, f'{name}.csv'), 
+            subset.index)
+    store_contours(subset, f'{name}-subset', 'a subset of phrase contours', 
+        formats=formats, output_dir=output_dir)
+    return contours
+
 def generate_contour_data(dataset_id: str, filepaths: list, 
-    num_samples: int = 50, dataset_dir: str = _DATASETS_DIR):
+    num_samples: int = 50, dataset_dir: str = _DATASETS_DIR,
+    workers: int = 1, cache: ParseCache = None, formats: list = ['csv'],
+    incremental: bool = False, output_dir: str = _OUTPUT_DIR,
+    tables: dict = None):
+    """Generate the phrase and random contours of a list of files, and
+    subsets of both. With `incremental=True`, the datasets are updated
+    instead, see :func:`update_contour_data`. Files that were parsed 
+    beforehand can be passed as `tables` (see 
+    :func:`src.contours.parse_note_tables`); they are not parsed again.
+    
+    If the contours are only stored as CSV files (the default), they are 
+    written to disk in batches while they are extracted, so that the memory
+    use does not grow with the number of files and an interrupted run leaves
+    the extracted contours behind. The files are the same."""
+    if incremental:
+        return update_contour_data(dataset_id, filepaths, 
+            num_samples=num_samples, workers=workers, cache=cache, 
+            formats=formats, output_dir=output_dir)
+    stream = list(formats) == ['csv']
 
-    # Extract phrase contours
-    phrase_contours = extract_phrase_contours(filepaths, 
+    # Extract phrase contours. If a cache is used, the parsed files are reused
+    # when extracting the random contours.
+    phrase_options = dict(
         contour_id_tmpl=dataset_id+'-{i:0>5}',
-        num_samples=num_samples)
-
-    # Store csv file and log a checksum
-    phrases_contours_fn = os.path.join(_OUTPUT_DIR, f'{dataset_id}-phrase-contours.csv')
-    phrase_contours.to_csv(phrases_contours_fn)
-    md5 = md5checksum(phrases_contours_fn)
-    logging.info(f'Stored phrase contours to {relpath(phrases_contours_fn)}')
-    logging.info(f'md5 checksum: {md5}')
+        num_samples=num_samples,
+        workers=workers,
+        extractor_kwargs=dict(cache=cache, tables=tables))
+    if stream:
+        phrase_contours = iter_phrase_contours(filepaths, **phrase_options)
+    else:
+        phrase_contours = extract_phrase_contours(filepaths, **phrase_options)
 
-    # Store a subset of phrases
-    subset = sample_subset(phrase_contours)
-    subset_fn = os.path.join(_OUTPUT_DIR, f'{dataset_id}-phrase-contours-subset.csv')
-    subset.to_csv(subset_fn)
-    md5 = md5checksum(subset_fn)
-    logging.info(f'Stored a subset of phrase contours to {relpath(subset_fn)}')
-    logging.info(f'md5 checksum: {md5}')
+    # Store the contours and a subset of them, and log the checksums
+    phrase_contours = _store_contours_and_subset(phrase_contours, 
+        f'{dataset_id}-phrase-contours', 'phrase contours', 
+        num_samples=num_samples, formats=formats, output_dir=output_dir)
 
     # Extract random phrases
     mean_phrase_length = phrase_contours['phrase_length'].mean()
     logging.info(f'Extracting random contours with mean length lamb={mean_phrase_length:.2f}...' )
-    random_contours = extract_random_contours(filepaths, 
+    random_options = dict(
         lam=mean_phrase_length,
         contour_id_tmpl=dataset_id+'-rand-{i:0>5}',
-        num_samples=num_samples)
+        num_samples=num_samples,
+        cache=cache,
+        tables=tables)
+    if stream:
+        random_contours = iter_random_contours(filepaths, **random_options)
+    else:
+        random_contours = extract_random_contours(filepaths, **random_options)
+
+    # Store random phrases and a subset of them
+    random_contours = _store_contours_and_subset(random_contours,
+        f'{dataset_id}-random-contours', 'random contours', 
+        num_samples=num_samples, formats=formats, output_dir=output_dir)
     mean_random_length = random_contours['phrase_length'].mean()
     logging.info(f'Mean length of random phrases: {mean_random_length:.2f}...' )
 
-    # Store random phrases
-    random_contours_fn = os.path.join(_OUTPUT_DIR, f'{dataset_id}-random-contours.csv')
-    random_contours.to_csv(random_contours_fn)
-    md5 = md5checksum(random_contours_fn)
-    logging.info(f'Stored random contours to {relpath(random_contours_fn)}')
-    logging.info(f'md5 checksum: {md5}')
+def _song_id(filepath: str) -> str:
+    return os.path.splitext(os.path.basename(filepath))[0]
+
+def load_manifest(path: str) -> dict:
+    """Load a manifest, or return None if it does not exist or if it was
+    created by an older version of this code"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as handle:
+        manifest = json.load(handle)
+    if manifest.get('version') != _MANIFEST_VERSION:
+        return None
+    return manifest
+
+def store_manifest(manifest: dict, path: str):
+    """Store a manifest (atomically, so that an interrupted run never leaves
+    a corrupt manifest behind)"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _load_stored_contours(name: str, formats: list, 
+    output_dir: str = _OUTPUT_DIR) -> pd.DataFrame:
+    """Load a stored dataset, or return None if it does not exist. The pitch
+    columns are renamed to integers, as in :func:`extract_phrase_contours`"""
+    path = os.path.join(output_dir, f'{name}.{formats[0]}')
+    if not os.path.exists(path):
+        return None
+    df = read_contours(path, mmap_mode=None)
+    df['song_id'] = df['song_id'].astype(str)
+    num_samples = len(pitch_columns(df))
+    df.columns = list(df.columns[:-num_samples]) + list(range(num_samples))
+    return df
 
-    # Store a subset of random phrases
+def _merge_contours(old_df: pd.DataFrame, new_df: pd.DataFrame, 
+    outdated: set) -> pd.DataFrame:
+    """Replace the contours of all outdated songs by new contours"""
+    if old_df is None:
+        return new_df
+    old_df = old_df[old_df['song_id'].isin(outdated) == False]
+    if new_df is None:
+        return old_df
+    return pd.concat([old_df, new_df]).sort_index()
+
+def update_contour_data(dataset_id: str, filepaths: list, 
+    num_samples: int = 50, workers: int = 1, cache: ParseCache = None, 
+    formats: list = ['csv'], random_seed: int = 0, 
+    output_dir: str = _OUTPUT_DIR):
+    """Update the contour datasets, only extracting files that changed.
+
+    A manifest (`{dataset_id}-manifest.json`) records the md5 checksum of 
+    every file and the ids of the phrase and random contours it contributed.
+    On a rerun, only files that were changed or added are extracted, and the
+    contours of changed or removed files are dropped. The subsets are then
+    sampled again from the updated datasets. If there is no manifest yet, all
+    files are extracted.
+
+    To make this possible, the contour ids are derived from the song id and
+    phrase number (e.g. `liber-antiphons-00012-003`) rather than numbered 
+    sequentially, and the random segments of every file are drawn using a 
+    generator seeded with the song id (see :func:`extract_random_contours`).
+    The Poisson parameter of the random segments (the mean phrase length) is
+    computed once, when the datasets are first created, and stored in the
+    manifest. As a result, the datasets differ from the ones generated by
+    :func:`generate_contour_data`.
+    """
+    path = os.path.join(output_dir, f'{dataset_id}-manifest.json')
+    manifest = load_manifest(path)
+    phrase_name = f'{dataset_id}-phrase-contours'
+    random_name = f'{dataset_id}-random-contours'
+    phrase_contours = random_contours = None
+    if manifest is not None and manifest['num_samples'] == num_samples:
+        phrase_contours = _load_stored_contours(phrase_name, formats, output_dir)
+        random_contours = _load_stored_contours(random_name, formats, output_dir)
+    if phrase_contours is None or random_contours is None:
+        logging.info('No (valid) manifest found: extracting all files')
+        manifest = dict(version=_MANIFEST_VERSION, num_samples=num_samples,
+            random_seed=random_seed, lam=None, files={})
+        phrase_contours = random_contours = None
+
+    # Determine which files changed
+    files = manifest['files']
+    checksums = {_song_id(fp): md5checksum(fp) for fp in filepaths}
+    changed = [fp for fp in filepaths 
+               if files.get(_song_id(fp), {}).get('md5') != checksums[_song_id(fp)]]
+    removed = set(files.keys()) - set(checksums.keys())
+    outdated = set(_song_id(fp) for fp in changed) | removed
+    logging.info(f'Found {len(filepaths) - len(changed)} unchanged files, '
+                 f'{len(changed)} changed or new files and '
+                 f'{len(removed)} removed files')
+
+    # Update the phrase contours
+    new_phrase_contours = None
+    if len(changed) > 0:
+        new_phrase_contours = extract_phrase_contours(changed,
+            contour_id_tmpl=dataset_id+'-{song_id}-{phrase_num:0>3}',
+            num_samples=num_samples,
+            workers=workers,
+            extractor_kwargs=dict(cache=cache))
+    phrase_contours = _merge_contours(phrase_contours, new_phrase_contours, 
+        outdated)
+    store_contours(phrase_contours, phrase_name, 'phrase contours', 
+        formats=formats, output_dir=output_dir)
+    subset = sample_subset(phrase_contours)
+    store_contours(subset, f'{phrase_name}-subset', 
+        'a subset of phrase contours', formats=formats, output_dir=output_dir)
+
+    # Update the random contours
+    mean_phrase_length = phrase_contours['phrase_length'].mean()
+    if manifest['lam'] is None:
+        manifest['lam'] = float(mean_phrase_length)
+    lam = manifest['lam']
+    logging.info(f'Extracting random contours with mean length lamb={lam:.2f} '
+                 f'(current mean phrase length: {mean_phrase_length:.2f})...')
+    new_random_contours = None
+    if len(changed) > 0:
+        new_random_contours = extract_random_contours(changed, 
+            lam=lam,
+            contour_id_tmpl=dataset_id+'-rand-{song_id}-{phrase_num:0>3}',
+            num_samples=num_samples,
+            random_seed=manifest['random_seed'],
+            cache=cache,
+            seed_per_file=True,
+            workers=workers)
+    random_contours = _merge_contours(random_contours, new_random_contours, 
+        outdated)
+    store_contours(random_contours, random_name, 'random contours', 
+        formats=formats, output_dir=output_dir)
     random_subset = sample_subset(random_contours)
-    random_subset_fn = os.path.join(_OUTPUT_DIR, f'{dataset_id}-random-contours-subset.csv')
-    random_subset.to_csv(random_subset_fn)
-    md5 = md5checksum(random_subset_fn)
-    logging.info(f'Stored a subset of phrase contours to {relpath(random_subset_fn)}')
-    logging.info(f'md5 checksum: {md5}')
+    store_contours(random_subset, f'{random_name}-subset',
+        'a subset of phrase contours', formats=formats, output_dir=output_dir)
+
+    # Update the manifest. Files that could not be extracted are also listed
+    # (without contours), so that they are not extracted again.
+    for song_id in removed:
+        del files[song_id]
+    phrase_ids = phrase_contours.groupby('song_id').groups
+    random_ids = random_contours.groupby('song_id').groups
+    for filepath in changed:
+        song_id = _song_id(filepath)
+        files[song_id] = dict(
+            md5=checksums[song_id],
+            phrase_contours=list(phrase_ids.get(song_id, [])),
+            random_contours=list(random_ids.get(song_id, [])))
+    store_manifest(manifest, path)
+    logging.info(f'Stored the manifest to {relpath(path)}')
 
 def generate_gregobase_contour_data(genre, num_samples: int = 50,
-    dataset_dir: str = _DATASETS_DIR):
+    dataset_dir: str = _DATASETS_DIR, workers: int = 1, 
+    cache: ParseCache = None, formats: list = ['csv'], 
+    incremental: bool = False, corpus: GregoBaseCorpus = None,
+    tables: dict = None, output_dir: str = _OUTPUT_DIR):
     """Generate a phrase contour dataset from the GregoBase Corpus.
     We extract all chants of a certain genre in the Liber Usualis.
     
@@ -121,46 +404,90 @@ def generate_gregobase_contour_data(genre, num_samples: int = 50,
         The number of points at which the pitch is computed, by default 50
     dataset_dir : str, optional
         The directory in which to find the datasets, defaults to `datasets/`
-    """    
-    genres = {
-        'antiphons': 'an',
-        'hymns': 'hy',
-        'alleluias': 'al',
-        'introits': 'in',
-        'communions': 'co',
-        'responsories': 're',
-        'offertories': 'of',
-        'graduals': 'gr',
-        'kyries': 'ky',
-        'tracts': 'tr'
-    }
-    genre_key = genres[genre]
+    workers : int, optional
+        The number of processes used to extract the phrase contours, 
+        by default 1
+    cache : ParseCache, optional
+        A cache of parsed GABC files. By default None, in which case all 
+        files are parsed (twice: also for the random contours).
+    formats : list, optional
+        The formats in which the contours are stored: `csv`, `npz` and/or 
+        `parquet`. By default only `csv`.
+    incremental : bool, optional
+        Only extract files that changed since the previous run, see
+        :func:`update_contour_data`. By default False.
+    corpus : GregoBaseCorpus, optional
+        The loaded GregoBase Corpus, which can be shared by several genres. 
+        By default it is loaded from `dataset_dir`.
+    tables : dict, optional
+        Note tables of files that were parsed beforehand, see 
+        :func:`generate_contour_data`
+    output_dir : str, optional
+        The directory where the datasets and the log are stored, by default
+        `data/phrase-contours`
+    """
+    if genre not in GENRES:
+        raise ValueError(f'Unknown genre "{genre}"')
     dataset_id = f'liber-{genre}'
-    log_fn = os.path.join(_OUTPUT_DIR, f'{dataset_id}.log')
-    logging.basicConfig(filename=log_fn, **_LOGGING_OPTIONS)
-    logging.info(f'Generating contour dataset: {dataset_id}')
-    logging.info(f'Contours of {genre} from the Liber Usualis')
-
-    # Load GregoBase Corpus
-    csv_dir = os.path.join(_DATASETS_DIR, 'gregobasecorpus', 'csv')
-    chants = pd.read_csv(os.path.join(csv_dir, 'chants.csv'), index_col=0)
-    sources = pd.read_csv(os.path.join(csv_dir, 'sources.csv'), index_col=0)
-    chant_sources = pd.read_csv(os.path.join(csv_dir, 'chant_sources.csv'))
-
-    # Select the right subset
-    liber_usualis = chant_sources.query('source==3').chant_id
-    logging.info(f'Number of chants in the liber usualis: {len(liber_usualis)}')
-    right_genre = chants.query(f"office_part == '{genre_key}'").index
-    logging.info(f'Number of {genre}: {len(right_genre)}')
-    subset = right_genre.intersection(liber_usualis)
-    logging.info(f'Number of {genre} in the Liber Usualis: {len(subset)}')
-
-    # Extract all contours
-    pattern = os.path.join(_DATASETS_DIR, 'gregobasecorpus', 'gabc', '{idx:0>5}.gabc')
-    filepaths = sorted([pattern.format(idx=idx) for idx in subset])
-    
-    generate_contour_data(dataset_id=dataset_id, filepaths=filepaths,
-        dataset_dir=dataset_dir, num_samples=num_samples)
+    log_fn = os.path.join(output_dir, f'{dataset_id}.log')
+    with _log_to_file(log_fn):
+        logging.info(f'Generating contour dataset: {dataset_id}')
+        logging.info(f'Contours of {genre} from the Liber Usualis')
+
+        # Load GregoBase Corpus
+        if corpus is None:
+            corpus = GregoBaseCorpus(
+                os.path.join(dataset_dir, 'gregobasecorpus'))
+
+        # Select the right subset
+        num_liber = len(corpus.chant_ids(source=LIBER_USUALIS))
+        logging.info(f'Number of chants in the liber usualis: {num_liber}')
+        num_genre = len(corpus.chant_ids(genre=genre))
+        logging.info(f'Number of {genre}: {num_genre}')
+        filepaths = corpus.filepaths(genre=genre, source=LIBER_USUALIS)
+        logging.info(f'Number of {genre} in the Liber Usualis: {len(filepaths)}')
+
+        # Extract all contours
+        generate_contour_data(dataset_id=dataset_id, filepaths=filepaths,
+            dataset_dir=dataset_dir, num_samples=num_samples, workers=workers,
+            cache=cache, formats=formats, incremental=incremental,
+            output_dir=output_dir, tables=tables)
+
+def generate_all_gregobase_contour_data(genres: list = list(GENRES.keys()),
+    num_samples: int = 50, dataset_dir: str = _DATASETS_DIR, 
+    workers: int = 1, cache: ParseCache = None, formats: list = ['csv'], 
+    incremental: bool = False, corpus: GregoBaseCorpus = None,
+    output_dir: str = _OUTPUT_DIR):
+    """Generate the contour datasets of several genres (by default all) in a
+    single process. The files of all genres are first parsed at once (in 
+    `workers` processes), and every file is parsed only once: the phrase 
+    and random contours are then extracted from the parsed note tables. 
+    The datasets and logs are the same as those generated by 
+    :func:`generate_gregobase_contour_data` for every genre separately.
+    With `incremental=True`, only changed files are extracted, so no files 
+    are parsed up front. See :func:`generate_gregobase_contour_data` for the 
+    other parameters."""
+    for genre in genres:
+        if genre not in GENRES:
+            raise ValueError(f'Unknown genre "{genre}"')
+    if corpus is None:
+        corpus = GregoBaseCorpus(os.path.join(dataset_dir, 'gregobasecorpus'))
+
+    tables = None
+    if not incremental:
+        filepaths = [filepath for genre in genres
+            for filepath in corpus.filepaths(genre=genre, source=LIBER_USUALIS)]
+        tables = parse_note_tables(sorted(set(filepaths)), cache=cache, 
+            workers=workers)
+        # Extracting contours from parsed files is fast, and not worth 
+        # sending the note tables to worker processes
+        workers = 1
+
+    for genre in genres:
+        generate_gregobase_contour_data(genre, num_samples=num_samples,
+            dataset_dir=dataset_dir, workers=workers, cache=cache, 
+            formats=formats, incremental=incremental, corpus=corpus,
+            tables=tables, output_dir=output_dir)
 
 def main():
     """CLI for the generation of contours
@@ -172,16 +499,26 @@ def main():
         'Genre of the dataset to generate, `antiphons`, `responsories`, '
         '`kyries`, etc. Use `--genre=all` (default) to generate datasets for all genres'
     ))
+    parser.add_argument('--workers', type=int, default=1, help=(
+        'Number of processes used to extract the phrase contours (default: 1)'
+    ))
+    parser.add_argument('--no-cache', action='store_true', help=(
+        'Do not use the parse cache in .cache/parse-cache'
+    ))
+    parser.add_argument('--format', type=str, default='csv', help=(
+        'Comma-separated formats of the output files: `csv` (default), '
+        '`npz` and/or `parquet`, e.g. `--format=csv,npz`'
+    ))
+    parser.add_argument('--incremental', action='store_true', help=(
+        'Only extract files that changed since the previous (incremental) run. '
+        'Note that this uses different contour ids and random contours.'
+    ))
     args = parser.parse_args()
-    if args.genre == 'all':
-        genres = [
-            'antiphons', 'hymns', 'alleluias', 'introits', 'communions',
-            'responsories', 'offertories', 'graduals', 'kyries', 'tracts'
-        ]
-        for genre in genres:
-            generate_gregobase_contour_data(genre)
-    else:
-        generate_gregobase_contour_data(args.genre)
+    cache = None if args.no_cache else ParseCache()
+    formats = args.format.split(',')
+    genres = list(GENRES.keys()) if args.genre == 'all' else [args.genre]
+    generate_all_gregobase_contour_data(genres, workers=args.workers, 
+        cache=cache, formats=formats, incremental=args.incremental)
 
 if __name__ == '__main__':
     main()
@@ -11,11 +11,19 @@ Usage: `python -m src.generate_differentiae.py`
 """
 import os
 import logging
+import numpy as np
 import pandas as pd
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 import chant21
-from music21 import converter
 from .helpers import relpath
 from .helpers import md5checksum
+from .note_tables import NoteTable
+from .note_tables import parse_cantus_note_table
+from .parse_cache import ParseCache
+from .volpiano import decode_volpiano
+from .connections import write_connections
+from .cantus_corpus import iter_chants
 from .cantus_filters import *
 
 _CUR_DIR = os.path.dirname(__file__)
@@ -28,32 +36,109 @@ _LOGGING_OPTIONS = dict(
     datefmt='%d-%m-%y %H:%M:%S',
     level=logging.INFO)
 
-@log_filter
-def filter_chants_not_ending_on_euouae(chants, logger=None):
+@mask_filter
+def filter_chants_not_ending_on_euouae(chants):
     """Exclude all chants that don't end on variants of EUOUAE"""
     euouae = 'S?e ?u ?o ?u ?a ?e$'
     ends_on_euouae = chants.full_text_manuscript.str.contains(euouae, case=False)
-    return chants[ends_on_euouae == True]
+    return ends_on_euouae == True
+
+_ANTIPHON_FILTERS = FilterPipeline([
+    filter_chants_without_volpiano,
+    filter_chants_without_notes,
+    (filter_chants_without_simple_mode, dict(include_transposed=False)),
+    filter_chants_without_full_text,
+    filter_chants_where_incipit_is_full_text,
+    (filter_chants_by_genre, dict(include=['genre_a'])),
+    filter_chants_not_ending_on_euouae,
+    filter_chants_not_starting_with_G_clef,
+    filter_chants_with_F_clef,
+    filter_chants_with_nonvolpiano_chars,
+    filter_chants_without_word_boundary,
+])
 
 def filter_antiphons(chants):
-    opts = dict(logger=lambda msg: logging.info(f' . {msg}'))
-    chants = filter_chants_without_volpiano(chants, **opts)
-    chants = filter_chants_without_notes(chants, **opts)
-    chants = filter_chants_without_simple_mode(
-        chants, include_transposed=False, **opts)
-    chants = filter_chants_without_full_text(chants, **opts)
-    chants = filter_chants_where_incipit_is_full_text(chants, **opts)
-    chants = filter_chants_by_genre(chants, include=['genre_a'], **opts)
-    chants = filter_chants_not_ending_on_euouae(chants, **opts)
-
-    chants = filter_chants_not_starting_with_G_clef(chants, **opts)
-    chants = filter_chants_with_F_clef(chants, **opts)
-    chants = filter_chants_with_nonvolpiano_chars(chants, **opts)
-    chants = filter_chants_without_word_boundary(chants, **opts)
-    return chants
+    """Select the antiphons from a dataframe with chants, or from an iterable
+    of chunks of the chants table (see :func:`src.cantus_corpus.iter_chants`)"""
+    logger = lambda msg: logging.info(f' . {msg}')
+    if isinstance(chants, pd.DataFrame):
+        return _ANTIPHON_FILTERS.apply(chants, logger=logger)
+    return _ANTIPHON_FILTERS.apply_chunks(chants, logger=logger)
+
+_PARSERS = ['chant21', 'volpiano']
+
+def note_table_pitches(table: NoteTable) -> tuple:
+    """The midi pitches of all notes in a note table, and the bounds of the 
+    sections in that array, in the format of 
+    :func:`src.volpiano.decode_volpiano`"""
+    cum_num_notes = np.concatenate([[0], np.cumsum(table.is_note)])
+    pitches = np.round(table.pitches[table.is_note]).astype(int)
+    return pitches, cum_num_notes[table.section_bounds]
+
+def _decode_chant(volpiano: str, full_text: str, parser: str = 'chant21',
+    force_source: bool = False, cache = None) -> tuple:
+    """Decode a chant to a tuple `(pitches, section_bounds)`, using chant21
+    (and possibly a :class:`ParseCache`) or by decoding the volpiano"""
+    if parser == 'volpiano':
+        return decode_volpiano(volpiano)
+    table = parse_cantus_note_table(f'{volpiano}/{full_text}', 
+        force_source=force_source, cache=cache)
+    return note_table_pitches(table)
+
+def _section_pitches(pitches, section_bounds, section: int, 
+    max_length: int) -> list:
+    """The first `max_length` pitches of a section (e.g. -1 for the last
+    section) as a list of ints"""
+    start = section_bounds[:-1][section]
+    end = section_bounds[1:][section]
+    return [int(p) for p in pitches[start:end][:max_length]]
+
+def _extract_connections_chunk(records: list, force_source: bool = False, 
+    min_length: int = 3, max_length: int = 15, cache = None, 
+    parser: str = 'chant21') -> tuple:
+    """Extract the connections of a list of records `(id, volpiano, 
+    full_text_manuscript, mode, siglum)`. This function is applied to every 
+    chunk by :func:`extract_connections`, possibly in a worker process.
+    
+    Returns
+    -------
+    tuple
+        A tuple `(entries, messages)` with a list of entries (the rows of the
+        connections dataframe) and a list of `(level, message)` tuples, which
+        are logged by the main process.
+    """
+    entries = []
+    messages = []
+    for idx, volpiano, full_text, mode, siglum in records:
+        try:
+            pitches, section_bounds = _decode_chant(volpiano, full_text, 
+                parser=parser, force_source=force_source, cache=cache)
+        except Exception as e:
+            messages.append((logging.ERROR, f'{idx} could not be parsed: {e}'))
+            continue
+
+        # Differentia (the final section) and antiphon opening (the first
+        # section) as lists of midi pitches, prefixed with Nones
+        entry = [idx, mode, siglum]
+        for name, section in [('differentiae', -1), ('antiphon opening', 0)]:
+            section_pitches = _section_pitches(pitches, section_bounds, 
+                section, max_length)
+            if len(section_pitches) < min_length: 
+                messages.append((logging.WARNING,
+                    f'Skipping {idx}; {name} has length {len(section_pitches)}, '
+                    f'which is shorter than min_length={min_length}'
+                ))
+                entry = None
+                break
+            empty_prefix = [None] * (max_length - len(section_pitches))
+            entry.extend(empty_prefix + section_pitches)
+        if entry is not None:
+            entries.append(entry)
+    return entries, messages
 
 def extract_connections(antiphons, force_source=False, min_length=3,
-                        max_length=15):
+                        max_length=15, cache=None, workers=1, 
+                        chunk_size=500, parser='chant21'):
     """
     Extract differentia-antiphon connections from a dataframe with antiphons.
     The volpiano and full_text_manuscript columns from the dataframe are 
@@ -61,46 +146,40 @@ def extract_connections(antiphons, force_source=False, min_length=3,
     and the first ``max_length`` notes of the antiphon are concatenated,
     possibly filling the beginning with Nones, so that the antiphon always 
     starts at the 15th note. If the antiphon or differentia has fewer than 3 
-    notes, they are ignored.
+    notes, they are ignored. If a :class:`ParseCache` is passed, the chants
+    are only parsed if their note tables cannot be found in the cache.
+
+    The antiphons are processed in chunks of ``chunk_size`` chants, which are
+    distributed over ``workers`` processes if ``workers > 1``. The result,
+    and the order of the log messages, does not depend on the number of
+    workers.
+
+    With ``parser='volpiano'``, the volpiano is decoded directly to MIDI 
+    pitches using :func:`src.volpiano.decode_volpiano`, which is much faster
+    and gives the same pitches as chant21, but skips music21 and the text. 
+    Chants are then not skipped when only their text cannot be parsed.
     """
-    entries = []
-    for idx, data in antiphons.iterrows():
-        input_str = f'{data.volpiano}/{data.full_text_manuscript}'
-        try:
-            ch = converter.parse(input_str, format='cantus', 
-                                 forceSource=force_source)
-        except Exception as e:
-            logging.error(f'{idx} could not be parsed: {e}')
-            continue
+    if parser not in _PARSERS:
+        raise ValueError(f'Unknown parser "{parser}"; use one of {_PARSERS}')
+    records = list(zip(antiphons.index, antiphons['volpiano'], 
+        antiphons['full_text_manuscript'], antiphons['mode'], 
+        antiphons['siglum']))
+    chunks = [records[i:i + chunk_size] 
+              for i in range(0, len(records), chunk_size)]
+    extract = partial(_extract_connections_chunk, force_source=force_source,
+        min_length=min_length, max_length=max_length, cache=cache,
+        parser=parser)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(extract, chunks))
+    else:
+        results = map(extract, chunks)
 
-        # Differentia: the final section as a list of midi pitches
-        differentia = [n.pitch.midi for n in ch[-1].flat.notes[:max_length]]
-        if len(differentia) < min_length: 
-            logging.warning(
-                f'Skipping {idx}; differentiae has length {len(differentia)}, '
-                f'which is shorter than min_length={min_length}'
-            )
-            continue
-        if len(differentia) < max_length:
-            empty_prefix = [None] * (max_length - len(differentia))
-            differentia = empty_prefix + differentia
-        
-        # Antiphon opening as a list of midi pitches
-        opening = [n.pitch.midi for n in ch[0].flat.notes[:max_length]]
-        if len(opening) < min_length: 
-            logging.warning(
-                f'Skipping {idx}; antiphon opening has length {len(opening)}, '
-                f'which is shorter than min_length={min_length}'
-            )
-            continue
-        if len(opening) < max_length:
-            empty_prefix = [None] * (max_length - len(opening))
-            opening = empty_prefix + opening
-        
-        entry = [idx, data['mode'], data['siglum']]
-        entry.extend(differentia)
-        entry.extend(opening)
-        entries.append(entry)
+    entries = []
+    for chunk_entries, messages in results:
+        for level, message in messages:
+            logging.log(level, message)
+        entries.extend(chunk_entries)
     
     columns = ['id', 'mode', 'siglum']
     columns.extend(range(-max_length, 0))
@@ -108,7 +187,7 @@ def extract_connections(antiphons, force_source=False, min_length=3,
     df = pd.DataFrame(entries, columns=columns).set_index('id').sort_index()
     return df
 
-def main():
+def main(cache=None, workers=1, parser='chant21', formats=['csv']):
     output_dir = os.path.join(_DATA_DIR, 'differentiae')
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -118,14 +197,35 @@ def main():
     logging.info('Start generating the differentia-antiphon connections.')
     
     chants_fn = os.path.join(_DATASETS_DIR, 'cantuscorpus', 'csv', 'chant.csv')
-    chants = pd.read_csv(chants_fn, index_col=0)
-    antiphons = filter_antiphons(chants)
+    antiphons = filter_antiphons(iter_chants(chants_fn))
     
-    connections = extract_connections(antiphons)
-    connections_fn = os.path.join(output_dir, 'connections.csv')
-    connections.to_csv(connections_fn)
-    logging.info(f'Stored connections to {relpath(connections_fn)}')
-    logging.info(f'md5 checksum: {md5checksum(connections_fn)}')
+    connections = extract_connections(antiphons, cache=cache, workers=workers,
+        parser=parser)
+    for format in formats:
+        connections_fn = os.path.join(output_dir, f'connections.{format}')
+        write_connections(connections, connections_fn)
+        logging.info(f'Stored connections to {relpath(connections_fn)}')
+        logging.info(f'md5 checksum: {md5checksum(connections_fn)}')
 
 if __name__ == '__main__':
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Extract the differentia-antiphon connections')
+    parser.add_argument('--no-cache', action='store_true', help=(
+        'Do not use the parse cache in .cache/parse-cache'
+    ))
+    parser.add_argument('--workers', type=int, default=1, help=(
+        'Number of processes used to parse the antiphons (default: 1)'
+    ))
+    parser.add_argument('--parser', type=str, default='chant21', 
+        choices=_PARSERS, help=(
+        'Use `chant21` (default) to parse the chants with chant21, or '
+        '`volpiano` to decode the volpiano directly, without music21'
+    ))
+    parser.add_argument('--format', type=str, default='csv', help=(
+        'Comma-separated formats of the output files: `csv` (default) '
+        'and/or `npz`, e.g. `--format=csv,npz`'
+    ))
+    args = parser.parse_args()
+    main(cache=None if args.no_cache else ParseCache(), workers=args.workers,
+        parser=args.parser, formats=args.format.split(','))
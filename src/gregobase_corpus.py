@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""The GregoBase Corpus (`datasets/gregobasecorpus`), loaded once and indexed
+by genre and source, so that chants of any genre in any source can be
+selected without reading or querying the tables again. For example, after
+`corpus = GregoBaseCorpus()`, the ids and GABC files of the antiphons in the
+Liber Usualis are `corpus.chant_ids(genre='antiphons', source=LIBER_USUALIS)`
+and `corpus.filepaths(genre='antiphons', source=LIBER_USUALIS)`. This needs
+the GregoBase Corpus in `datasets/gregobasecorpus`.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+_CUR_DIR = os.path.dirname(__file__)
+_ROOT_DIR = os.path.abspath(os.path.join(_CUR_DIR, os.path.pardir))
+_CORPUS_DIR = os.path.join(_ROOT_DIR, 'datasets', 'gregobasecorpus')
+
+# The genres (office parts) of the contour datasets and their keys in GregoBase
+GENRES = {
+    'antiphons': 'an',
+    'hymns': 'hy',
+    'alleluias': 'al',
+    'introits': 'in',
+    'communions': 'co',
+    'responsories': 're',
+    'offertories': 'of',
+    'graduals': 'gr',
+    'kyries': 'ky',
+    'tracts': 'tr'
+}
+
+# Id of the Liber Usualis in `sources.csv`
+LIBER_USUALIS = 3
+
+class GregoBaseCorpus(object):
+    """The chants, sources and chant-source pairs of the GregoBase Corpus.
+
+    The tables are read once, and the ids of the chants of every genre
+    (office part) and in every source are stored as sets. Selections of a
+    genre in a source are intersections of these sets.
+
+    Parameters
+    ----------
+    corpus_dir : str, optional
+        The directory of the corpus, by default `datasets/gregobasecorpus`.
+        It should contain the tables in `csv/` and the chants in `gabc/`.
+    """
+
+    def __init__(self, corpus_dir: str = _CORPUS_DIR):
+        self.corpus_dir = corpus_dir
+        csv_dir = os.path.join(corpus_dir, 'csv')
+        self.chants = pd.read_csv(os.path.join(csv_dir, 'chants.csv'),
+            index_col=0)
+        self.sources = pd.read_csv(os.path.join(csv_dir, 'sources.csv'),
+            index_col=0)
+        self.chant_sources = pd.read_csv(
+            os.path.join(csv_dir, 'chant_sources.csv'))
+
+        self._all_ids = frozenset(self.chants.index)
+        self._ids_by_office_part = {
+            office_part: frozenset(ids) for office_part, ids
+            in self.chants.groupby('office_part').groups.items()}
+        self._ids_by_source = {
+            source: frozenset(ids) for source, ids
+            in self.chant_sources.groupby('source')['chant_id']}
+
+    def _genre_ids(self, genre: str) -> frozenset:
+        if genre not in GENRES:
+            raise ValueError(f'Unknown genre "{genre}"; use one of: '
+                + ', '.join(GENRES.keys()))
+        return self._ids_by_office_part.get(GENRES[genre], frozenset())
+
+    def chant_ids(self, genre: str = None, source: int = None) -> np.array:
+        """The sorted ids of all chants of a genre (see :data:`GENRES`)
+        in a source. By default, chants of all genres or all sources are
+        selected."""
+        ids = self._all_ids
+        if genre is not None:
+            ids = ids & self._genre_ids(genre)
+        if source is not None:
+            ids = ids & self._ids_by_source.get(source, frozenset())
+        return np.array(sorted(ids), dtype=int)
+
+    def gabc_path(self, chant_id: int) -> str:
+        """The path to the GABC file of a chant"""
+        return os.path.join(self.corpus_dir, 'gabc', f'{chant_id:0>5}.gabc')
+
+    def filepaths(self, genre: str = None, source: int = None) -> list:
+        """The paths to the GABC files of the chants selected by
+        :meth:`chant_ids`, in order of chant id"""
+        return [self.gabc_path(chant_id)
+                for chant_id in self.chant_ids(genre=genre, source=source)]
@@ -13,4 +13,8 @@ def md5checksum(path):
     with open(path, "rb") as handle:
         for chunk in iter(lambda: handle.read(4096), b""):
             hash_md5.update(chunk)
-    return hash_md5.hexdigest()
\ No newline at end of file
+    return hash_md5.hexdigest()
+
+def md5string(string):
+    """Return an md5 checksum of a string"""
+    return hashlib.md5(string.encode('utf-8')).hexdigest()
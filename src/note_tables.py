@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""Note tables: a compact, columnar representation of the notes in a chant.
+
+Most of the analyses only need the onsets, durations and pitches of the
+notes in a chant, and the boundaries of its phrases and sections. A
+:class:`NoteTable` stores exactly that in a couple of numpy arrays, which
+makes it cheap to store (see :mod:`src.parse_cache`) and to work with.
+"""
+import numpy as np
+import music21
+from music21 import converter
+from music21 import common
+from music21 import note
+import chant21
+
+from .helpers import md5checksum
+from .helpers import md5string
+
+class NoteTable(object):
+    """A table with all notes and rests in a chant, or in a part of a chant.
+
+    Rows correspond to notes and rests, in the order in which they occur in
+    the flattened chant. Rests have pitch `NaN`. Onsets are measured from
+    the start of the phrase that contains the note (in quarter notes), that
+    is, they correspond to the offsets of the notes in `chant.phrases`.
+
+    Phrases (the segments between two pausas) and sections (the top-level
+    elements of the chant) are stored as row boundaries: phrase `i` consists
+    of rows `phrase_bounds[i]` up to `phrase_bounds[i+1]`. Notes after the
+    last pausa do not belong to any phrase.
+    """
+
+    def __init__(self, onsets, durations, pitches, duration: float = None,
+        phrase_bounds = None, phrase_durations = None, section_bounds = None):
+        """
+        Parameters
+        ----------
+        onsets : array_like
+            The onsets of the notes, relative to the start of their phrase
+        durations : array_like
+            The durations of the notes
+        pitches : array_like
+            The pitches (`pitch.ps`) of the notes; NaN for rests
+        duration : float, optional
+            The total duration. Defaults to the sum of all durations.
+        phrase_bounds : array_like, optional
+            The boundaries of the phrases; an array of length P + 1
+        phrase_durations : array_like, optional
+            The durations of all P phrases
+        section_bounds : array_like, optional
+            The boundaries of the sections; an array of length S + 1
+        """
+        self.onsets = np.asarray(onsets, dtype=float)
+        self.durations = np.asarray(durations, dtype=float)
+        self.pitches = np.asarray(pitches, dtype=float)
+        if duration is None:
+            duration = self.durations.sum()
+        self.duration = float(duration)
+        if phrase_bounds is None:
+            phrase_bounds = [0]
+        self.phrase_bounds = np.asarray(phrase_bounds, dtype=int)
+        if phrase_durations is None:
+            phrase_durations = []
+        self.phrase_durations = np.asarray(phrase_durations, dtype=float)
+        if section_bounds is None:
+            section_bounds = [0]
+        self.section_bounds = np.asarray(section_bounds, dtype=int)
+
+    def __len__(self):
+        return len(self.onsets)
+
+    def __repr__(self):
+        return (f'<NoteTable: {len(self)} notes and rests, '
+                f'{self.num_phrases} phrases>')
+
+    @property
+    def is_note(self) -> np.array:
+        """Boolean mask that is True for notes and False for rests"""
+        return np.isnan(self.pitches) == False
+
+    @property
+    def num_notes(self) -> int:
+        """The number of notes (excluding rests)"""
+        return int(self.is_note.sum())
+
+    @property
+    def num_phrases(self) -> int:
+        return len(self.phrase_bounds) - 1
+
+    @property
+    def num_sections(self) -> int:
+        return len(self.section_bounds) - 1
+
+    def phrase_lengths(self) -> np.array:
+        """Return the number of notes (excluding rests) in every phrase"""
+        cum_num_notes = np.concatenate([[0], np.cumsum(self.is_note)])
+        return (cum_num_notes[self.phrase_bounds[1:]] 
+                - cum_num_notes[self.phrase_bounds[:-1]])
+
+    def phrase(self, i: int) -> 'NoteTable':
+        """Return a note table of the i-th phrase"""
+        start, end = self.phrase_bounds[i], self.phrase_bounds[i + 1]
+        return NoteTable(
+            onsets=self.onsets[start:end],
+            durations=self.durations[start:end],
+            pitches=self.pitches[start:end],
+            duration=self.phrase_durations[i])
+
+    def phrases(self) -> list:
+        """Return a list of note tables of all phrases"""
+        return [self.phrase(i) for i in range(self.num_phrases)]
+
+    def section(self, i: int) -> 'NoteTable':
+        """Return a note table of the i-th section. Like python lists,
+        negative indices count from the end."""
+        i = range(self.num_sections)[i]
+        return self.segment(self.section_bounds[i], self.section_bounds[i + 1])
+
+    def segment(self, start: int, end: int) -> 'NoteTable':
+        """Return a note table of rows `start` up to `end`. The notes and
+        rests are concatenated, so the onsets are recomputed from their
+        durations (like appending the notes to a new music21 Stream)."""
+        durations = self.durations[start:end]
+        ends = np.cumsum(durations)
+        onsets = ends - durations
+        duration = ends[-1] if len(ends) > 0 else 0
+        return NoteTable(onsets=onsets, durations=durations,
+            pitches=self.pitches[start:end], duration=duration)
+
+    def segments(self, starts, ends) -> 'NoteTable':
+        """Return a note table whose phrases are the segments consisting of 
+        rows `starts[i]` up to `ends[i]`. As in :meth:`segment`, the onsets 
+        are recomputed from the durations, but for all segments at once.
+
+        >>> table = NoteTable([0, 1, 0, 2], [1, 2, 2, 1], [60, 62, 64, 65])
+        >>> segments = table.segments([0, 1], [2, 4])
+        >>> segments.onsets
+        array([0., 1., 0., 2., 4.])
+        >>> segments.phrase_durations
+        array([3., 5.])
+        """
+        starts = np.asarray(starts, dtype=int)
+        ends = np.asarray(ends, dtype=int)
+        lengths = ends - starts
+        phrase_bounds = np.concatenate([[0], np.cumsum(lengths)])
+        rows = (np.repeat(starts - phrase_bounds[:-1], lengths) 
+                + np.arange(phrase_bounds[-1]))
+        durations = self.durations[rows]
+        
+        # Onsets are cumulative durations, starting from 0 in every segment
+        cum_durations = np.concatenate([[0], np.cumsum(durations)])
+        segment_starts = np.repeat(cum_durations[phrase_bounds[:-1]], lengths)
+        onsets = cum_durations[:-1] - segment_starts
+        phrase_durations = (cum_durations[phrase_bounds[1:]] 
+                            - cum_durations[phrase_bounds[:-1]])
+        return NoteTable(onsets=onsets, durations=durations, 
+            pitches=self.pitches[rows], phrase_bounds=phrase_bounds,
+            phrase_durations=phrase_durations)
+
+    def to_arrays(self) -> dict:
+        """Return a dictionary with all arrays, e.g. to store the table"""
+        return dict(
+            onsets=self.onsets,
+            durations=self.durations,
+            pitches=self.pitches,
+            duration=np.array(self.duration),
+            phrase_bounds=self.phrase_bounds,
+            phrase_durations=self.phrase_durations,
+            section_bounds=self.section_bounds)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> 'NoteTable':
+        """Create a note table from a dictionary of arrays, as returned by
+        :meth:`to_arrays`"""
+        return cls(
+            onsets=arrays['onsets'],
+            durations=arrays['durations'],
+            pitches=arrays['pitches'],
+            duration=float(arrays['duration']),
+            phrase_bounds=arrays['phrase_bounds'],
+            phrase_durations=arrays['phrase_durations'],
+            section_bounds=arrays['section_bounds'])
+
+    @classmethod
+    def concatenate(cls, tables: list) -> 'NoteTable':
+        """Concatenate several note tables into a single table in which
+        every table forms a phrase. Onsets are not changed, so they remain
+        relative to the start of the original tables.
+        
+        >>> a = NoteTable([0, 1], [1, 1], [60, 62])
+        >>> b = NoteTable([0], [2], [64])
+        >>> table = NoteTable.concatenate([a, b])
+        >>> table
+        <NoteTable: 3 notes and rests, 2 phrases>
+        >>> table.phrase_durations
+        array([2., 2.])
+        """
+        lengths = [len(table) for table in tables]
+        def concat(arrays):
+            return np.concatenate(arrays) if len(arrays) > 0 else []
+        return cls(
+            onsets=concat([table.onsets for table in tables]),
+            durations=concat([table.durations for table in tables]),
+            pitches=concat([table.pitches for table in tables]),
+            phrase_bounds=np.cumsum([0] + lengths),
+            phrase_durations=[table.duration for table in tables])
+
+    @classmethod
+    def from_stream(cls, stream: music21.stream.Stream) -> 'NoteTable':
+        """Create a note table from the notes in a music21 stream. The
+        onsets are the offsets of the notes, and the duration is the 
+        duration of the stream."""
+        notes = stream.recurse().notes
+        return cls(
+            onsets=[float(n.offset) for n in notes],
+            durations=[float(n.quarterLength) for n in notes],
+            pitches=[n.pitch.ps for n in notes],
+            duration=stream.quarterLength)
+
+    @classmethod
+    def from_chant(cls, chant: chant21.chant.Chant) -> 'NoteTable':
+        """Create a note table from a (chant21) chant.
+
+        The phrases are the same as those in `chant.phrases`: segments
+        between two pausas. Every top-level element of the chant is a section.
+        """
+        onsets = []
+        durations = []
+        pitches = []
+        phrase_bounds = [0]
+        phrase_durations = []
+        time = 0.0
+        for el in chant.flat:
+            if isinstance(el, chant21.chant.Pausa):
+                phrase_bounds.append(len(onsets))
+                phrase_durations.append(float(time))
+                time = 0.0
+                continue
+            if isinstance(el, (note.Note, note.Rest)):
+                onsets.append(float(time))
+                durations.append(float(el.quarterLength))
+                is_note = isinstance(el, note.Note)
+                pitches.append(el.pitch.ps if is_note else np.nan)
+            time = common.opFrac(time + el.quarterLength)
+
+        section_lengths = []
+        for el in chant:
+            if el.isStream:
+                section_lengths.append(len(el.flat.notesAndRests))
+            else:
+                section_lengths.append(
+                    int(isinstance(el, (note.Note, note.Rest))))
+        section_bounds = np.cumsum([0] + section_lengths)
+
+        return cls(onsets=onsets, durations=durations, pitches=pitches,
+            phrase_bounds=phrase_bounds,
+            phrase_durations=phrase_durations, section_bounds=section_bounds)
+
+def parse_note_table(filepath: str, cache = None, 
+    tables: dict = None) -> NoteTable:
+    """Parse a file (e.g. a GABC file) and return its note table. If a
+    :class:`src.parse_cache.ParseCache` is passed, the note table is
+    looked up by the md5 checksum of the file, and only parsed (and then
+    stored in the cache) if it cannot be found.
+
+    Files that were already parsed can be passed as `tables`, a dictionary 
+    mapping file paths to tuples `(table, error)` (see 
+    :func:`src.contours.parse_note_tables`). Those files are not parsed 
+    again; if parsing failed, the error is raised again.
+    """
+    if tables is not None and filepath in tables:
+        table, error = tables[filepath]
+        if error is not None:
+            raise Exception(error)
+        return table
+
+    if cache is not None:
+        key = f'file-{md5checksum(filepath)}'
+        arrays = cache.get(key)
+        if arrays is not None:
+            return NoteTable.from_arrays(arrays)
+
+    table = NoteTable.from_chant(converter.parse(filepath))
+    if cache is not None:
+        cache.put(key, table.to_arrays())
+    return table
+
+def parse_cantus_note_table(input_str: str, force_source: bool = False,
+    cache = None) -> NoteTable:
+    """Parse a Cantus string of the form `volpiano/text` using chant21 and
+    return its note table. If a :class:`src.parse_cache.ParseCache` is
+    passed, the note table is looked up by the md5 checksum of the string.
+    """
+    if cache is not None:
+        key = f'cantus-{int(force_source)}-{md5string(input_str)}'
+        arrays = cache.get(key)
+        if arrays is not None:
+            return NoteTable.from_arrays(arrays)
+
+    chant = converter.parse(input_str, format='cantus',
+        forceSource=force_source)
+    table = NoteTable.from_chant(chant)
+    if cache is not None:
+        cache.put(key, table.to_arrays())
+    return table
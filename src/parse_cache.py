@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: MIT
+# -------------------------------------------------------------------
+"""A persistent, content-addressed cache for parsed chants.
+
+Parsing GABC files or Cantus volpiano with chant21 is by far the slowest
+step when generating the datasets. The :class:`ParseCache` stores the result
+of a parse (a set of numpy arrays, see :class:`src.note_tables.NoteTable`) on
+disk, keyed by an md5 checksum of the input. Reruns then skip music21
+entirely. The cache is bounded in size: when it grows too large, the least
+recently used entries are removed.
+"""
+import os
+import tempfile
+import numpy as np
+
+_CUR_DIR = os.path.dirname(__file__)
+_ROOT_DIR = os.path.abspath(os.path.join(_CUR_DIR, os.path.pardir))
+_CACHE_DIR = os.path.join(_ROOT_DIR, '.cache', 'parse-cache')
+
+# Increase this whenever the contents of the cached entries change, to
+# invalidate all existing entries
+_CACHE_VERSION = 1
+
+class ParseCache(object):
+    """A size-bounded on-disk cache of numpy arrays with LRU eviction.
+    Every entry is stored as an `.npz` file named after its key. Reading
+    an entry updates its modification time, which is used to determine
+    which entries were least recently used.
+
+    The cache only stores its location and size, so it can safely be passed
+    to worker processes. Entries are written atomically, so several processes
+    can share the same cache. (Every process keeps track of the size of 
+    the cache separately, so `max_size` is then only approximately enforced.)
+
+    >>> tmp_dir = tempfile.TemporaryDirectory()
+    >>> cache = ParseCache(tmp_dir.name)
+    >>> cache.put('abc', dict(pitches=np.array([60., 62.])))
+    >>> cache.get('abc')['pitches']
+    array([60., 62.])
+    >>> cache.get('def') is None
+    True
+    >>> tmp_dir.cleanup()
+    """
+
+    def __init__(self, directory: str = _CACHE_DIR,
+        max_size: int = 512 * 2**20):
+        """
+        Parameters
+        ----------
+        directory : str, optional
+            The directory where the entries are stored, by default
+            `.cache/parse-cache` in the root of the repository
+        max_size : int, optional
+            The maximum total size of the cache in bytes, by default 512MB
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        """Return the path of the file storing the entry with a given key"""
+        return os.path.join(self.directory, f'v{_CACHE_VERSION}-{key}.npz')
+
+    def get(self, key: str) -> dict:
+        """Return the arrays stored under `key`, or None if there is no
+        such entry"""
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            # Missing (or possibly corrupt) entry
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def put(self, key: str, arrays: dict):
+        """Store a dictionary of numpy arrays under a key"""
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                np.savez(tmp_file, **arrays)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self.path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Only scan the cache directory when it (probably) grew too large
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += size
+        if self._size > self.max_size:
+            self.evict()
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def entries(self) -> list:
+        """Returns a list of `(last_used, size, path)` tuples of all entries,
+        sorted from least to most recently used."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                except FileNotFoundError:
+                    # Evicted by another process
+                    pass
+        return sorted(entries)
+
+    def size(self) -> int:
+        """The total size of all entries in bytes"""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the total size of
+        the cache no longer exceeds `max_size`"""
+        entries = self.entries()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        self._size = total_size
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
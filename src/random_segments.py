@@ -5,10 +5,10 @@
 # License: MIT
 # -------------------------------------------------------------------
 import os
-from music21 import converter
-from music21 import stream
 import numpy as np
-import chant21
+from .note_tables import NoteTable
+from .note_tables import parse_note_table
+from .parse_cache import ParseCache
 
 def positive_poisson_sample(lam: float) -> int:
     """Return a sample from a shifted Poisson distribution
@@ -64,8 +64,157 @@ def poisson_segmentation(iterable: list, lam: float,
     
     return segments
 
+def _poisson_cut_points(num_items: int, lam: float, 
+    rng: np.random.Generator) -> np.array:
+    """Draw segment lengths from a shifted Poisson distribution in batches, 
+    until their cumulative sum reaches `num_items`. Returns the cumulative 
+    sums: the cut points."""
+    batch_size = int(1.2 * num_items / lam) + 10
+    lengths = 1 + rng.poisson(lam=lam - 1, size=batch_size)
+    while lengths.sum() < num_items:
+        more_lengths = 1 + rng.poisson(lam=lam - 1, size=batch_size)
+        lengths = np.concatenate([lengths, more_lengths])
+    return np.cumsum(lengths)
+
+def poisson_segment_bounds(num_items: int, lam: float, 
+    omit_first_and_last: bool = True, rng = None) -> tuple:
+    """Vectorized version of :func:`poisson_segmentation` that returns 
+    index ranges rather than the segments themselves. All segment lengths 
+    are drawn in one batch from a (shifted) Poisson distribution and the 
+    cut points are computed as their cumulative sum.
+
+    Note that the segments are not the same as those returned by 
+    :func:`poisson_segmentation`, which uses the global random state.
+
+    >>> starts, ends = poisson_segment_bounds(10, lam=1)
+    >>> starts
+    array([1, 2, 3, 4, 5, 6, 7, 8])
+    >>> ends
+    array([2, 3, 4, 5, 6, 7, 8, 9])
+    
+    Parameters
+    ----------
+    num_items : int
+        The number of items to segment
+    lam : float
+        The parameter of the poisson
+    omit_first_and_last : bool
+        Omit the first and final segment? Defaults to true
+    rng : numpy.random.Generator, optional
+        The random number generator, or a seed for 
+        `numpy.random.default_rng`. By default None.
+    
+    Returns
+    -------
+    (np.array, np.array)
+        The start and (exclusive) end indices of the segments
+    """
+    if lam < 1: raise ValueError('Lambda should be > 1.')
+    rng = np.random.default_rng(rng)
+    
+    # All cut points strictly before the end of the iterable
+    cuts = _poisson_cut_points(num_items, lam, rng)
+    if not omit_first_and_last:
+        cuts = np.concatenate([[0], cuts])
+    cuts = cuts[:np.searchsorted(cuts, num_items, side='left')]
+    starts, ends = cuts[:-1], cuts[1:]
+    if not omit_first_and_last and len(cuts) > 0:
+        starts = np.append(starts, cuts[-1])
+        ends = np.append(ends, num_items)
+    return starts, ends
+
+def batch_poisson_segment_bounds(bounds, lam: float, 
+    omit_first_and_last: bool = True, rng = None) -> tuple:
+    """Segment many sequences at once, like :func:`poisson_segment_bounds`.
+    The sequences are given by their boundaries: sequence `i` consists of 
+    items `bounds[i]` up to `bounds[i+1]`. The segment lengths for all 
+    sequences are drawn in a single batch. Segments never cross the boundary
+    between two sequences.
+
+    >>> starts, ends = batch_poisson_segment_bounds([0, 4, 7], lam=1, 
+    ...     omit_first_and_last=False)
+    >>> starts
+    array([0, 1, 2, 3, 4, 5, 6])
+    >>> ends
+    array([1, 2, 3, 4, 5, 6, 7])
+
+    Parameters
+    ----------
+    bounds : array_like
+        The boundaries of the sequences: an array of length N + 1
+    lam : float
+        The parameter of the poisson
+    omit_first_and_last : bool
+        Omit the first and final segment of every sequence? Defaults to true
+    rng : numpy.random.Generator, optional
+        The random number generator, or a seed for 
+        `numpy.random.default_rng`. By default None.
+
+    Returns
+    -------
+    (np.array, np.array)
+        The start and (exclusive) end indices of the segments, ordered by
+        sequence and position.
+    """
+    if lam < 1: raise ValueError('Lambda should be > 1.')
+    rng = np.random.default_rng(rng)
+    bounds = np.asarray(bounds, dtype=int)
+    sizes = np.diff(bounds)
+    seq_ids = np.arange(len(sizes))
+
+    # Draw the segment lengths of all sequences in one go, and compute the
+    # cut points as cumulative sums within every sequence
+    batch_sizes = (1.2 * sizes / lam).astype(int) + 10
+    batch_bounds = np.concatenate([[0], np.cumsum(batch_sizes)])
+    lengths = 1 + rng.poisson(lam=lam - 1, size=batch_bounds[-1])
+    cum_lengths = np.concatenate([[0], np.cumsum(lengths)])
+    cut_seq_ids = np.repeat(seq_ids, batch_sizes)
+    cuts = cum_lengths[1:] - cum_lengths[batch_bounds[:-1]][cut_seq_ids]
+
+    # In the rare case that the cut points do not cover a sequence, segment
+    # that sequence separately
+    totals = cum_lengths[batch_bounds[1:]] - cum_lengths[batch_bounds[:-1]]
+    uncovered = totals < sizes
+    if np.any(uncovered):
+        keep = uncovered[cut_seq_ids] == False
+        cuts, cut_seq_ids = cuts[keep], cut_seq_ids[keep]
+        for i in np.flatnonzero(uncovered):
+            extra_cuts = _poisson_cut_points(sizes[i], lam, rng)
+            cuts = np.concatenate([cuts, extra_cuts])
+            cut_seq_ids = np.concatenate([cut_seq_ids, 
+                np.repeat(i, len(extra_cuts))])
+
+    if not omit_first_and_last:
+        cuts = np.concatenate([cuts, np.zeros(len(sizes), dtype=int)])
+        cut_seq_ids = np.concatenate([cut_seq_ids, seq_ids])
+    
+    # Keep all cut points strictly before the end of their sequence
+    keep = cuts < sizes[cut_seq_ids]
+    cuts, cut_seq_ids = cuts[keep], cut_seq_ids[keep]
+    order = np.lexsort((cuts, cut_seq_ids))
+    cuts, cut_seq_ids = cuts[order], cut_seq_ids[order]
+    
+    # Segments lie between consecutive cut points of the same sequence
+    same_seq = cut_seq_ids[:-1] == cut_seq_ids[1:]
+    starts = cuts[:-1][same_seq]
+    ends = cuts[1:][same_seq]
+    seg_seq_ids = cut_seq_ids[:-1][same_seq]
+    if not omit_first_and_last:
+        # Final segments from the last cut point to the end of the sequence
+        is_last = np.append(same_seq == False, len(cuts) > 0)
+        starts = np.concatenate([starts, cuts[is_last]])
+        ends = np.concatenate([ends, sizes[cut_seq_ids[is_last]]])
+        seg_seq_ids = np.concatenate([seg_seq_ids, cut_seq_ids[is_last]])
+        order = np.lexsort((starts, seg_seq_ids))
+        starts, ends = starts[order], ends[order]
+        seg_seq_ids = seg_seq_ids[order]
+    
+    offsets = bounds[:-1][seg_seq_ids]
+    return starts + offsets, ends + offsets
+
 def extract_random_segments_from_file(filepath: str, lam: float,
-    omit_first_and_last: bool = True) -> list:
+    omit_first_and_last: bool = True, cache: ParseCache = None,
+    rng = None, tables: dict = None) -> NoteTable:
     """Extract random segments of notes with a Poisson length-distribution
     from a file.
 
@@ -77,23 +226,31 @@ def extract_random_segments_from_file(filepath: str, lam: float,
         The Poisson parameter: average length
     omit_first_and_last : bool
         Omit the first and last segment? Default to True
+    cache : ParseCache, optional
+        A cache of parsed files, by default None
+    rng : numpy.random.Generator, optional
+        If passed, the segments are drawn from this random number generator
+        using :func:`poisson_segment_bounds`. By default None, in which case
+        :func:`poisson_segmentation` is used, which uses the global random 
+        state (this is how the published datasets were generated).
+    tables : dict, optional
+        Note tables of files that were already parsed, see 
+        :func:`src.note_tables.parse_note_table`
     
     Returns
     -------
-    list
-        List of random segments as music21.stream.Stream objects
+    NoteTable
+        A note table whose phrases are the random segments. Just as when 
+        the segments are appended to new streams, the onsets of the notes
+        are relative to the start of the segments.
     """
-    s = converter.parse(filepath)
-    elements = s.flat.notesAndRests 
-    segments = poisson_segmentation(elements, lam=lam, 
-        omit_first_and_last=omit_first_and_last)
-    
-    # Turn the segments into streams and return
-    streams = []
-    for segment in segments:
-        segment_stream = stream.Stream()
-        for el in segment:
-            segment_stream.append(el)
-        streams.append(segment_stream)
-    return streams
-    
\ No newline at end of file
+    table = parse_note_table(filepath, cache=cache, tables=tables)
+    if rng is None:
+        segments = poisson_segmentation(np.arange(len(table)), lam=lam, 
+            omit_first_and_last=omit_first_and_last)
+        starts = [segment[0] for segment in segments]
+        ends = [segment[-1] + 1 for segment in segments]
+    else:
+        starts, ends = poisson_segment_bounds(len(table), lam=lam, 
+            omit_first_and_last=omit_first_and_last, rng=rng)
+    return table.segments(starts, ends)
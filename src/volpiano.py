@@ -11,6 +11,66 @@ Volpiano helpers
 Some helpers for working with Volpiano strings.
 """
 import re
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from functools import partial
+
+# ASCII control characters that temporarily mark boundaries and bars while
+# cleaning a volpiano string. They never survive, since all other characters 
+# are removed first, and str.translate can use its fast path for ASCII strings.
+_NEUME_MARKER, _SYLLABLE_MARKER, _WORD_MARKER, _BAR_MARKER = '\x01\x02\x03\x04'
+
+# Flats and the notes they flatten
+_FLATTENED_NOTES = dict(i='j', y='b', z='q', w='e', x='m')
+_DELETE_NATURALS = str.maketrans('', '', 'IYZWX')
+
+class _CharacterFilter(dict):
+    """Translation table for :meth:`str.translate` that maps the kept 
+    characters to their replacement (by default themselves) and all other 
+    characters to `default`: by default, they are deleted. Lookups are 
+    memoized in the table itself."""
+
+    def __init__(self, kept_chars, replacements={}, default=None):
+        super().__init__()
+        self.kept_chars = kept_chars
+        self.replacements = {ord(char): repl for char, repl in replacements.items()}
+        self.default = default
+    
+    def __missing__(self, key):
+        if chr(key) in self.kept_chars:
+            value = self.replacements.get(key, key)
+        else:
+            value = self.default
+        self[key] = value
+        return value
+
+@lru_cache(maxsize=None)
+def _accidental_scopes(barlines):
+    """Compiled regexes that match the scope of every flat: from the flat up
+    to the next corresponding natural or barline."""
+    barlines = ''.join(c for c in barlines if c not in 'iyzwxIYZWX')
+    scopes = []
+    for flat, note in _FLATTENED_NOTES.items():
+        stop = re.escape(flat.upper() + barlines)
+        scopes.append((flat, note, re.compile(f'{flat}[^{stop}]*')))
+    return scopes
+
+# Separates the strings when a batch of strings is processed at once
+_BATCH_SEPARATOR = '\x00'
+
+def _map_batch(func, batch_func, volpianos):
+    """Applies a string function to all volpiano strings at once, by applying
+    `batch_func` to the joined strings. That function should keep the 
+    separator and treat it as a boundary. If the strings contain the 
+    separator, `func` is applied to every string separately."""
+    volpianos = list(volpianos)
+    if len(volpianos) == 0:
+        return []
+    joined = _BATCH_SEPARATOR.join(volpianos)
+    if joined.count(_BATCH_SEPARATOR) != len(volpianos) - 1:
+        return [func(volpiano) for volpiano in volpianos]
+    return batch_func(joined).split(_BATCH_SEPARATOR)
 
 def expand_accidentals(volpiano, omit_notes=False, barlines='3456'):
     """Expand all accidentals in a volpiano string by adding the accidental
@@ -61,47 +121,95 @@ def expand_accidentals(volpiano, omit_notes=False, barlines='3456'):
     str
         A volpiano string with all flats added
     """
-    in_scope = { 'i': False, 'y': False, 'z': False, 'w': False, 'x': False}
-    output = ''
-    for char in volpiano:
-        # If the character is a flat, enter its scope
-        if char in 'iyzwx': 
-            in_scope[char] = True
-
-        # If a natural, exit the corresponding flats scope
-        elif char in 'IYZWX': 
-            in_scope[char.lower()] = False
-        
-        # Reset scope on barlines (single, double, bold or middle)
-        elif char in barlines:
-            output += char
-            for key in in_scope.keys():
-                in_scope[key] = False
-
-        # Central b flat?
-        elif in_scope['i'] and char == 'j':
-            output += 'i' if omit_notes else 'ij'
-
-        # Low b flat?
-        elif in_scope['y'] and char == 'b':
-            output += 'y' if omit_notes else 'yb'
-        
-        # High b flat?
-        elif in_scope['z'] and char == 'q':
-            output += 'z' if omit_notes else 'zq'
-
-        # Low e flat?
-        elif in_scope['w'] and char == 'e':
-            output += 'w' if omit_notes else 'we'
-
-        # High e flat?
-        elif in_scope['x'] and char == 'm':
-            output += 'x' if omit_notes else 'xm'
-
-        # Another note
-        else:
-            output += char
-    return output
+    for flat, note, scope in _accidental_scopes(barlines):
+        if flat in volpiano:
+            flattened = flat if omit_notes else flat + note
+            volpiano = scope.sub(lambda match: (match.group()
+                .replace(flat, '').replace(note, flattened)), volpiano)
+    return volpiano.translate(_DELETE_NATURALS)
+
+def expand_accidentals_batch(volpianos, omit_notes=False, barlines='3456'):
+    """Expand the accidentals in a sequence of volpiano strings. This gives 
+    the same result as applying :func:`expand_accidentals` to every string, 
+    but processes all strings at once, which is much faster for large corpora.
+
+    >>> expand_accidentals_batch(['ijjj', 'jj', 'ij3j'])
+    ['ijijij', 'jj', 'ij3j']
+
+    Parameters
+    ----------
+    volpianos : iterable of str
+        The volpiano strings
+    omit_notes : bool, optional
+        Whether to omit notes, by default False
+    barlines : str, optional
+        Volpiano characters that end the scope of all accidentals, by
+        default '3456'
+
+    Returns
+    -------
+    list
+        A list of volpiano strings with all flats added
+    """
+    expand = partial(expand_accidentals, omit_notes=omit_notes, 
+                     barlines=barlines)
+    expand_joined = partial(expand_accidentals, omit_notes=omit_notes, 
+                            barlines=barlines + _BATCH_SEPARATOR)
+    return _map_batch(expand, expand_joined, volpianos)
+
+@lru_cache(maxsize=None)
+def _volpiano_cleaner(allowed_chars, keep_boundaries, neume_boundary, 
+    syllable_boundary, word_boundary, keep_bars, allowed_bars, bar,
+    separator=''):
+    """Returns a function that cleans a volpiano string; see 
+    :func:`clean_volpiano`. A single translation removes all characters that 
+    are not kept and marks the bars, after which runs of dashes are replaced 
+    by boundary markers. The `separator` is always kept, and separates the 
+    strings in a batch."""
+    if not allowed_chars:
+        allowed_chars = volpiano_characters('liquescents', 'notes', 'flats', 'naturals')    
+    if keep_boundaries:
+        allowed_chars = allowed_chars.replace('-', '')
+    
+    # Allowed characters take precedence over dashes, and dashes over bars
+    bars = ''
+    if keep_bars:
+        bars = ''.join(c for c in allowed_bars if c not in allowed_chars 
+                       and not (keep_boundaries and c == '-')
+                       and c not in separator)
+    kept_chars = (allowed_chars + ('-' if keep_boundaries else '') 
+                  + bars + separator)
+    
+    if not keep_boundaries:
+        table = _CharacterFilter(kept_chars, {char: bar for char in bars})
+        def clean(volpiano):
+            return volpiano.translate(table)
+        return clean
+
+    table = _CharacterFilter(kept_chars, {char: _BAR_MARKER for char in bars})
+    markers_table = str.maketrans({
+        '-': neume_boundary,
+        _NEUME_MARKER: neume_boundary, 
+        _SYLLABLE_MARKER: syllable_boundary,
+        _WORD_MARKER: word_boundary, 
+        _BAR_MARKER: bar
+    })
+    # Dashes are counted across the bars in a run, and bars are kept in place.
+    # So after replacing the triple dashes, the one or two dashes left before 
+    # the first bar of a run are moved past that bar (and past the word 
+    # boundaries following it), where they join the next dashes.
+    B, W = _BAR_MARKER, _WORD_MARKER
+    dashes_before_bar = re.compile(
+        f'(?<![-{B}{W}])([{B}{W}]*)(-{{1,2}})({B}+)({W}*-*)')
+
+    def clean(volpiano):
+        volpiano = volpiano.translate(table).replace('---', _WORD_MARKER)
+        while '-' + _BAR_MARKER in volpiano:
+            volpiano = dashes_before_bar.sub(r'\1\3\4\2', volpiano)
+            volpiano = volpiano.replace('---', _WORD_MARKER)
+        volpiano = volpiano.replace('--', _SYLLABLE_MARKER)
+        return volpiano.translate(markers_table)
+    return clean
 
 def clean_volpiano(volpiano, allowed_chars=None, keep_boundaries=False, 
     neume_boundary=' ', syllable_boundary=' ', word_boundary=' ',
@@ -155,37 +263,35 @@ def clean_volpiano(volpiano, allowed_chars=None, keep_boundaries=False,
     str
         A clean volpiano string
     """
-    if not allowed_chars:
-        allowed_chars = volpiano_characters('liquescents', 'notes', 'flats', 'naturals')    
+    clean = _volpiano_cleaner(allowed_chars, keep_boundaries, 
+        neume_boundary, syllable_boundary, word_boundary, 
+        keep_bars, allowed_bars, bar)
+    return clean(volpiano)
 
-    if keep_boundaries:
-        # Remove dashes from the allowed characters
-        allowed_chars = ''.join(c for c in allowed_chars if c not in '-')
-
-    output = ''
-    num_spaces = 0
-    boundaries = { 1: neume_boundary, 2: syllable_boundary, 3: word_boundary }
-    for char in volpiano:
-        if char in allowed_chars:
-            if num_spaces > 0:
-                output += boundaries[num_spaces]
-                num_spaces = 0
-            output += char
-
-        elif keep_boundaries and char == '-':
-            num_spaces += 1
-            if num_spaces == 3:
-                output += word_boundary
-                num_spaces = 0
-
-        elif keep_bars and char in allowed_bars:
-            output += bar
-    
-    # Handle spaces at the end
-    if num_spaces > 0:
-        output += boundaries[num_spaces]
-        
-    return output
+def clean_volpiano_batch(volpianos, allowed_chars=None, keep_boundaries=False, 
+    neume_boundary=' ', syllable_boundary=' ', word_boundary=' ',
+    keep_bars=False, allowed_bars='345', bar='|'):
+    """Cleans a sequence of volpiano strings. This gives the same result as 
+    applying :func:`clean_volpiano` to every string, but processes all strings
+    at once, which is much faster for large corpora. See 
+    :func:`clean_volpiano` for a description of the parameters.
+
+    >>> clean_volpiano_batch(['1---fg---h--ij-h-3-f-4', '1---g-f--'])
+    ['fghijhf', 'gf']
+    >>> clean_volpiano_batch(['1---fg-3-h--', 'g-'], keep_boundaries=True,
+    ...     keep_bars=True, neume_boundary='.', syllable_boundary='-')
+    [' fg|-h-', 'g.']
+
+    Returns
+    -------
+    list
+        A list of clean volpiano strings
+    """
+    options = (allowed_chars, keep_boundaries, neume_boundary, 
+        syllable_boundary, word_boundary, keep_bars, allowed_bars, bar)
+    clean = _volpiano_cleaner(*options)
+    clean_joined = _volpiano_cleaner(*options, separator=_BATCH_SEPARATOR)
+    return _map_batch(clean, clean_joined, volpianos)
 
 def volpiano_characters(*groups):
     """Returns accepted Volpiano characters
@@ -331,6 +437,434 @@ def split_volpiano(volpiano, sep, keep_sep=True):
     items[-1] += '-' * num_final_dashes
     return items
 
+# Decoding volpiano to MIDI pitches
+# ---------------------------------
+
+_NOTE_POSITIONS = '89abcdefghjklmnopqrs'
+_LIQUESCENTS = '()ABCDEFGHJKLMNOPQRS'
+_FLATS = 'iwxyz'
+_NATURALS = 'IWXYZ'
+_ALTERATION_POSITIONS = 'jembq'
+_BREAKS = ('777', '77', '7')
+_MISSING_PITCHES = re.compile(r'(?:777|77|7)?6---\??---6(?:777|77|7)?')
+_STEP_SEMITONES = [0, 2, 4, 5, 7, 9, 11]
+
+def _position_pitch(position, clef):
+    """Return the step (0 for C, ..., 6 for B) and the MIDI pitch of a note at
+    a volpiano position, in a G clef (`'g'`) or an F clef (`'f'`)"""
+    c_index, c_octave = (4, 4) if clef == 'g' else (9, 3)
+    steps_above_c = _NOTE_POSITIONS.index(position) - c_index
+    step = steps_above_c % 7
+    octave = c_octave + steps_above_c // 7
+    return step, 12 * (octave + 1) + _STEP_SEMITONES[step]
+
+def _preprocess_cantus_volpiano(volpiano):
+    """Correct common deviations from the standard volpiano syntax in the same 
+    way as chant21 does (in non-strict mode) before parsing Cantus volpiano"""
+    if len(volpiano) == 0 or volpiano[0] not in '12':
+        raise ValueError('Missing clef: the volpiano does not start with a clef (1 or 2)')
+    if re.match('^[12]-?[^-]', volpiano):
+        raise ValueError('Invalid clef hyphenation: chant should start with 1-- or 1---')
+
+    has_standard_hyphenation = volpiano.startswith(('1---', '2---'))
+    if not has_standard_hyphenation and re.match('.*[^-]---[^-]', volpiano):
+        volpiano = volpiano[0] + '---' + volpiano[3:]
+    elif not has_standard_hyphenation:
+        volpiano = (volpiano.replace('--', '$$$')
+                            .replace('-', '--')
+                            .replace('$$$', '---'))
+
+    def replace_by_word_boundary(match):
+        return re.sub('-+', '---', match.group())
+    if re.match('.*[^-]-{4,5}[^-]', volpiano):
+        volpiano = re.sub('[^-]-{4,5}[^-]', replace_by_word_boundary, volpiano)
+        volpiano = re.sub('[^-]-{4,5}[^-]', replace_by_word_boundary, volpiano)
+
+    if re.match('.*6-{7,}6', volpiano):
+        volpiano = re.sub('6-{7,}6', '6------6', volpiano)
+
+    def add_hyphens(match):
+        vol = match.group()
+        if vol[2] != '-': vol = '-' + vol
+        if vol[-3] != '-': vol += '-'
+        return vol
+    if (re.match('.*[^-]--7*6------6', volpiano) 
+        or re.match('.*6------67*--[^-]', volpiano)):
+        volpiano = re.sub('-+7*6------67*-+', add_hyphens, volpiano)
+
+    volpiano = volpiano.replace('.', '').replace('33', '4').replace('5', '4')
+
+    def fix_barline_hyphens(match):
+        vol = match.group()
+        return vol[0] + '---' + vol[-1]
+    if has_standard_hyphenation and re.match('.*[^-]-{1,2}[34]', volpiano):
+        volpiano = re.sub('[^-]-{1,2}[34]', fix_barline_hyphens, volpiano)
+    if has_standard_hyphenation and re.match('.*[34]-{1,2}[^-]', volpiano):
+        volpiano = re.sub('[34]-{1,2}[^-]', fix_barline_hyphens, volpiano)
+    return volpiano
+
+def _match_neume(volpiano, pos, events):
+    """Match a neume at position `pos` and add its notes and alterations to
+    `events`. Returns the position after the neume, or -1 if there is none."""
+    def match_barline_or_break(pos):
+        if volpiano.startswith('6', pos):
+            events.append(('barline', None))
+            return pos + 1
+        for brk in _BREAKS:
+            if volpiano.startswith(brk, pos):
+                return pos + len(brk)
+        return pos
+
+    num_events = len(events)
+    pos = match_barline_or_break(pos)
+    start = pos
+    while pos < len(volpiano):
+        char = volpiano[pos]
+        if char in _NOTE_POSITIONS:
+            events.append(('note', char))
+        elif char in _LIQUESCENTS:
+            events.append(('note', _NOTE_POSITIONS[_LIQUESCENTS.index(char)]))
+        elif char in _FLATS or char in _NATURALS:
+            events.append(('alteration', char))
+        else:
+            break
+        pos += 1
+    if pos == start:
+        del events[num_events:]
+        return -1
+    return match_barline_or_break(pos)
+
+def _match_syllable(volpiano, pos, events):
+    """Match a syllable: a clef, barline, missing pitches or a sequence of
+    neumes separated by neume boundaries"""
+    char = volpiano[pos:pos + 1]
+    if char in ('1', '2'):
+        events.append(('clef', 'g' if char == '1' else 'f'))
+        return pos + 1
+    elif char in ('3', '4'):
+        events.append(('pausa', None))
+        return pos + 1
+    missing_pitches = _MISSING_PITCHES.match(volpiano, pos)
+    if missing_pitches:
+        return missing_pitches.end()
+
+    pos = _match_neume(volpiano, pos, events)
+    while pos >= 0 and volpiano.startswith('-', pos):
+        next_pos = _match_neume(volpiano, pos + 1, events)
+        if next_pos < 0:
+            break
+        pos = next_pos
+    return pos
+
+def _match_word(volpiano, pos, events):
+    """Match a word: syllables separated by syllable boundaries"""
+    pos = _match_syllable(volpiano, pos, events)
+    while pos >= 0 and volpiano.startswith('--', pos):
+        num_events = len(events)
+        next_pos = _match_syllable(volpiano, pos + 2, events)
+        if next_pos < 0:
+            del events[num_events:]
+            break
+        pos = next_pos
+    return pos
+
+def decode_volpiano(volpiano):
+    """Decode a Cantus volpiano string to MIDI pitches, without music21.
+
+    The result is identical to parsing the volpiano with chant21 (in 
+    non-strict mode, as in `converter.parse(volpiano, format='cantus')`): the 
+    string is first corrected in the same way, and a ValueError is raised if
+    chant21 cannot parse it. As in chant21, the sections of the chant end at 
+    single and double barlines (3 and 4), flats apply to all Bs or Es (in any
+    octave) until the next alteration, pausa or word boundary, and naturals
+    are ignored. Only the text is not parsed.
+
+    >>> pitches, section_bounds = decode_volpiano('1---g-ij---3---h--j---4')
+    >>> pitches
+    array([67, 70, 69, 71])
+    >>> section_bounds
+    array([0, 2, 4])
+
+    Parameters
+    ----------
+    volpiano : str
+        The volpiano string
+
+    Returns
+    -------
+    tuple
+        A tuple `(pitches, section_bounds)` of numpy arrays. The MIDI pitches 
+        of section `i` are `pitches[section_bounds[i]:section_bounds[i+1]]`.
+    """
+    volpiano = _preprocess_cantus_volpiano(str(volpiano))
+
+    # Split the volpiano in words, and every word in events
+    words = []
+    events = []
+    pos = _match_word(volpiano, 0, events)
+    if pos < 0:
+        raise ValueError('Invalid volpiano at position 0')
+    words.append(events)
+    while volpiano.startswith('---', pos):
+        events = []
+        next_pos = _match_word(volpiano, pos + 3, events)
+        if next_pos < 0:
+            break
+        words.append(events)
+        pos = next_pos
+    end = pos
+    while volpiano.startswith('-', end):
+        end += 1
+    if end != len(volpiano):
+        raise ValueError(f'Invalid volpiano at position {end}')
+    has_final_dashes = end > pos
+
+    # Determine pitches and sections. Sections (other than the first) start
+    # with the word containing the barline that ends the previous section.
+    pitches = []
+    word_bounds = [0]
+    sections = []
+    section = []
+    clef = None
+    for i, events in enumerate(words):
+        section.append(i)
+        b_is_flat = e_is_flat = False
+        for kind, value in events:
+            if kind == 'note' or kind == 'alteration':
+                if clef is None:
+                    raise ValueError('Missing clef')
+            if kind == 'note':
+                step, midi = _position_pitch(value, clef)
+                if (b_is_flat and step == 6) or (e_is_flat and step == 2):
+                    midi -= 1
+                pitches.append(midi)
+            elif kind == 'alteration':
+                is_flat = value in _FLATS
+                index = (_FLATS if is_flat else _NATURALS).index(value)
+                step, _ = _position_pitch(_ALTERATION_POSITIONS[index], clef)
+                b_is_flat = is_flat and step == 6
+                e_is_flat = is_flat and step == 2
+            elif kind == 'pausa':
+                b_is_flat = e_is_flat = False
+                is_last_word = i == len(words) - 1 and not has_final_dashes
+                if not is_last_word:
+                    section.remove(i)
+                    sections.append(section)
+                    section = [i]
+                else:
+                    sections.append(section)
+                    section = []
+            elif kind == 'clef':
+                clef = value
+            elif kind == 'barline':
+                raise ValueError('Barlines (6) cannot be part of a neume')
+        word_bounds.append(len(pitches))
+    if len(section) > len(sections):
+        sections.append(section)
+
+    section_pitches = []
+    section_bounds = [0]
+    for section in sections:
+        for i in section:
+            section_pitches.extend(pitches[word_bounds[i]:word_bounds[i + 1]])
+        section_bounds.append(len(section_pitches))
+    return np.array(section_pitches, dtype=int), np.array(section_bounds)
+
+# Volpiano features
+# -----------------
+
+# Bits of the feature bitmask computed by volpiano_features
+HAS_NOTES = 1
+HAS_ONLY_VOLPIANO_CHARS = 2
+HAS_F_CLEF = 4
+STARTS_WITH_G_CLEF = 8
+HAS_MISSING_PITCHES = 16
+HAS_WORD_BOUNDARY = 32
+HAS_VOLPIANO = 64
+
+# Translates volpiano to ASCII codes of character classes: notes (n), invalid
+# characters (x), other volpiano characters (.), and the characters that 
+# occur in the features themselves.
+_FEATURE_CLASSES = _CharacterFilter(
+    volpiano_characters() + '\n',
+    replacements={
+        **{char: '.' for char in volpiano_characters() if char not in '126-'},
+        **{char: 'n' for char in volpiano_characters('notes', 'liquescents')},
+    },
+    default='x')
+
+def _any_per_string(matches, starts, lengths):
+    """Tests for every string whether any of its positions matches"""
+    result = np.zeros(len(lengths), dtype=bool)
+    nonempty = lengths > 0
+    if nonempty.any():
+        result[nonempty] = np.logical_or.reduceat(matches, starts[nonempty])
+    return result
+
+def _find_pattern(codes, pattern, ends):
+    """Returns the indices of the strings that contain a pattern, given the
+    codes of all strings and the end positions of all strings. Candidates are
+    selected using the first character, so this is fast for patterns 
+    starting with a rare character."""
+    pattern = pattern.encode('ascii')
+    size = len(pattern)
+    positions = np.flatnonzero(codes[:len(codes) - size + 1] == pattern[0])
+    for offset, code in enumerate(pattern[1:], start=1):
+        positions = positions[codes[positions + offset] == code]
+    strings = np.searchsorted(ends, positions, side='right')
+    return strings[positions + size <= ends[strings]]
+
+def _find_dash_runs(codes, num_dashes, ends):
+    """Marks the start of all runs of `num_dashes` dashes that do not cross
+    the end of a string. Dashes are frequent, so unlike 
+    :func:`_find_pattern` this uses boolean arrays."""
+    is_dash = codes == ord('-')
+    num_windows = len(codes) - num_dashes + 1
+    runs = np.zeros(len(codes), dtype=bool)
+    if num_windows <= 0:
+        return runs
+    runs[:num_windows] = is_dash[:num_windows]
+    for offset in range(1, num_dashes):
+        runs[:num_windows] &= is_dash[offset:offset + num_windows]
+    for offset in range(1, num_dashes):
+        crossing = ends - offset
+        runs[crossing[crossing >= 0]] = False
+    return runs
+
+def volpiano_features(volpianos):
+    """Computes a feature bitmask for every volpiano string, in a single pass 
+    over all strings. The bits indicate whether a string contains notes or 
+    liquescents (`HAS_NOTES`), contains only volpiano characters 
+    (`HAS_ONLY_VOLPIANO_CHARS`), contains an F clef (`HAS_F_CLEF`), starts 
+    with a G clef (`STARTS_WITH_G_CLEF`), contains missing pitches 
+    `6------6` (`HAS_MISSING_PITCHES`) and contains a word boundary `---`
+    (`HAS_WORD_BOUNDARY`).
+
+    All strings are translated at once to character classes, after which the
+    features are computed using numpy.
+
+    >>> features = volpiano_features(['1---fg---3', '2---&'])
+    >>> features & HAS_NOTES
+    array([1, 0], dtype=uint8)
+    >>> features & HAS_ONLY_VOLPIANO_CHARS
+    array([2, 0], dtype=uint8)
+    >>> (features & STARTS_WITH_G_CLEF) > 0
+    array([ True, False])
+
+    Parameters
+    ----------
+    volpianos : iterable of str
+        The volpiano strings
+
+    Returns
+    -------
+    np.ndarray
+        An array of type uint8 with the feature bitmasks
+    """
+    volpianos = list(volpianos)
+    lengths = np.fromiter(map(len, volpianos), dtype=np.int64, 
+                          count=len(volpianos))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    classes = ''.join(volpianos).translate(_FEATURE_CLASSES)
+    codes = np.frombuffer(classes.encode('ascii'), dtype=np.uint8)
+    
+    # Like re.match('^[...]*$'), allow a newline at the very end
+    invalid = codes == ord('x')
+    newlines = np.flatnonzero(codes == ord('\n'))
+    strings = np.searchsorted(ends, newlines, side='right')
+    invalid[newlines[newlines != ends[strings] - 1]] = True
+
+    nonempty = lengths > 0
+    starts_with_G_clef = np.zeros(len(volpianos), dtype=bool)
+    starts_with_G_clef[nonempty] = codes[starts[nonempty]] == ord('1')
+
+    features = np.zeros(len(volpianos), dtype=np.uint8)
+    features[_any_per_string(codes == ord('n'), starts, lengths)] |= HAS_NOTES
+    features[_any_per_string(codes == ord('2'), starts, lengths)] |= HAS_F_CLEF
+    features[~_any_per_string(invalid, starts, lengths)] |= HAS_ONLY_VOLPIANO_CHARS
+    features[_find_pattern(codes, '6------6', ends)] |= HAS_MISSING_PITCHES
+    word_boundaries = _find_dash_runs(codes, 3, ends)
+    features[_any_per_string(word_boundaries, starts, lengths)] |= HAS_WORD_BOUNDARY
+    features[starts_with_G_clef] |= STARTS_WITH_G_CLEF
+    return features
+
+# Pandas accessor
+# ---------------
+
+@pd.api.extensions.register_series_accessor('vp')
+class VolpianoAccessor:
+    """Pandas accessor for a series of volpiano strings, which is available as
+    ``series.vp`` once this module has been imported. The methods process all
+    strings at once, and return a series with the same index. Missing values
+    remain missing.
+
+    >>> volpianos = pd.Series(['1---fg-ij---3', '1---3', None])
+    >>> volpianos.vp.clean().tolist()
+    ['fgij', '', nan]
+    >>> volpianos.vp.expand_accidentals().tolist()
+    ['1---fg-ij---3', '1---3', nan]
+    >>> volpianos.vp.contains_notes().tolist()
+    [True, False, False]
+    >>> volpianos.vp.note_count().tolist()
+    [4.0, 0.0, nan]
+    """
+
+    def __init__(self, series):
+        self._series = series
+
+    def _apply_batch(self, batch_func, **kwargs):
+        """Applies a batch function to all strings that are not missing"""
+        is_missing = self._series.isnull().values
+        output = np.full(len(self._series), np.nan, dtype=object)
+        volpianos = self._series[~is_missing].to_numpy(dtype=object)
+        values = batch_func(volpianos, **kwargs)
+        output[~is_missing] = np.array(values, dtype=object)
+        return pd.Series(output, index=self._series.index, 
+                         name=self._series.name)
+
+    def clean(self, **kwargs):
+        """Cleans all volpiano strings; see :func:`clean_volpiano` for all 
+        keyword arguments"""
+        return self._apply_batch(clean_volpiano_batch, **kwargs)
+
+    def expand_accidentals(self, omit_notes=False, barlines='3456'):
+        """Expands the accidentals in all volpiano strings; see 
+        :func:`expand_accidentals`"""
+        return self._apply_batch(expand_accidentals_batch, 
+            omit_notes=omit_notes, barlines=barlines)
+
+    def contains_notes(self, accidentals_are_notes=True):
+        """Tests which volpiano strings contain notes; see 
+        :func:`contains_notes`. Missing values do not contain notes."""
+        groups = ['notes', 'liquescents']
+        if accidentals_are_notes: 
+            groups.extend(['flats', 'naturals'])
+        expr = f'[{re.escape(volpiano_characters(*groups))}]'
+        contains = self._series.str.contains(expr, regex=True, na=False)
+        return contains.astype(bool)
+
+    def note_count(self, accidentals_are_notes=True):
+        """Counts the notes in all volpiano strings, including liquescents 
+        and, by default, accidentals. With accidentals, this is the length of
+        the cleaned volpiano string."""
+        groups = ['notes', 'liquescents']
+        if accidentals_are_notes: 
+            groups.extend(['flats', 'naturals'])
+        notes = self.clean(allowed_chars=volpiano_characters(*groups))
+        return notes.str.len()
+
+    def features(self):
+        """Computes the feature bitmask of all volpiano strings; see 
+        :func:`volpiano_features`. Missing values have no features, all other
+        strings also have the bit `HAS_VOLPIANO`."""
+        is_missing = self._series.isnull().values
+        features = np.zeros(len(self._series), dtype=np.uint8)
+        volpianos = self._series[~is_missing].to_numpy(dtype=object)
+        features[~is_missing] = volpiano_features(volpianos) | HAS_VOLPIANO
+        return pd.Series(features, index=self._series.index, 
+                         name=self._series.name)
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from src.cantus_corpus import *
+from src.cantus_filters import *
+
+class TestCantusCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'chant.csv')
+        num_chants = 50
+        chants = pd.DataFrame({
+            'id': [f'chant_{i:06d}' for i in range(num_chants)],
+            'incipit': ['Ave', 'Gloria'] * (num_chants // 2),
+            'cantus_id': ['001234', 'g00123', '001235', None, '001234'] * 10,
+            'mode': ['1', '8', '2T', None, '*'] * 10,
+            'siglum': ['A-x 12', 'B'] * (num_chants // 2),
+            'feast_id': 'feast_1',
+            'genre_id': ['genre_a'] * 40 + ['genre_b'] * 10,
+            'full_text': ['Ave', 'Gloria in excelsis', None, 'Ave maria',
+                          'Gloria'] * 10,
+            'full_text_manuscript': 'Ave maria',
+            'volpiano': ['1---fg---h---3', '1---f---3', None, '1---3',
+                         '1---g-h---4'] * 10,
+            'notes': 'A note',
+        })
+        chants.to_csv(self.path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_chants(self):
+        chants = read_chants(self.path)
+        self.assertEqual(chants.index.name, 'id')
+        self.assertListEqual(sorted(chants.columns), sorted(CHANT_COLUMNS))
+        for column in CATEGORICAL_COLUMNS:
+            self.assertIsInstance(chants[column].dtype, pd.CategoricalDtype)
+        self.assertEqual(chants.loc['chant_000000', 'cantus_id'], '001234')
+        self.assertTrue(pd.isnull(chants.loc['chant_000003', 'mode']))
+
+        all_columns = read_chants(self.path, columns=None, categorical=False)
+        self.assertEqual(len(all_columns.columns), 10)
+        with self.assertRaises(ValueError):
+            read_chants(self.path, columns=['volpiano', 'melody_id'])
+
+    def test_cache(self):
+        cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        chants = read_chants(self.path, cache=True, cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        cached = read_chants(self.path, cache=True, cache_dir=cache_dir)
+        pd.testing.assert_frame_equal(chants, cached)
+        read_chants(self.path, columns=['volpiano'], cache=True,
+            cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_apply_chunks(self):
+        pipeline = FilterPipeline([
+            filter_chants_without_volpiano,
+            filter_chants_without_notes,
+            (filter_chants_without_simple_mode, dict(include_transposed=True)),
+            (filter_chants_by_genre, dict(include=['genre_a'])),
+            filter_chants_where_incipit_is_full_text,
+        ])
+        target_log, log = [], []
+        target = pipeline.apply(read_chants(self.path), logger=target_log.append)
+        chunks = iter_chants(self.path, chunksize=7)
+        filtered = pipeline.apply_chunks(chunks, logger=log.append)
+        pd.testing.assert_frame_equal(filtered, target, check_categorical=False)
+        self.assertIsInstance(filtered['mode'].dtype, pd.CategoricalDtype)
+        self.assertListEqual(log, target_log)
+
+        pipeline.add(filter_chants_with_duplicated_notes)
+        with self.assertRaises(ValueError):
+            pipeline.apply_chunks(iter_chants(self.path, chunksize=7))
+
+    def test_concat_chunks(self):
+        chants = concat_chunks(iter_chants(self.path, chunksize=7))
+        pd.testing.assert_frame_equal(chants, read_chants(self.path),
+            check_categorical=False)
+        empty = concat_chunks(iter([]), columns=CHANT_COLUMNS)
+        self.assertEqual(len(empty), 0)
+        self.assertListEqual(list(empty.columns), CHANT_COLUMNS)
+
+if __name__ == '__main__':
+    unittest.main()
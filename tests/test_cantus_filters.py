@@ -0,0 +1,91 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.cantus_filters import *
+
+class TestFilterPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.chants = pd.DataFrame({
+            'volpiano': ['1---fg---h---3', None, '1---f&g', '2---fg',
+                         '1---3', '1---f-g---4', '1---fg---h---3'],
+            'genre_id': ['genre_a', 'genre_a', 'genre_a', 'genre_b',
+                         'genre_a', 'genre_a', 'genre_a'],
+        }, index=[7, 3, 5, 1, 0, 2, 4])
+        self.filters = [
+            (filter_chants_without_volpiano, {}),
+            (filter_chants_without_notes, {}),
+            (filter_chants_by_genre, dict(include=['genre_a'])),
+            (filter_chants_with_nonvolpiano_chars, {}),
+            (filter_chants_with_duplicated_notes, {}),
+        ]
+
+    def test_same_as_filters(self):
+        target_log = []
+        target = self.chants
+        for func, kwargs in self.filters:
+            target = func(target, logger=target_log.append, **kwargs)
+
+        log = []
+        pipeline = FilterPipeline(self.filters)
+        filtered = pipeline.apply(self.chants, logger=log.append)
+        self.assertTrue(filtered.equals(target))
+        self.assertListEqual(list(filtered.index), [7, 2])
+        self.assertListEqual(log, target_log)
+
+    def test_stored_volpiano_features(self):
+        chants = self.chants.copy()
+        chants['volpiano_features'] = 0
+        filtered = filter_chants_without_notes(chants, logger=False)
+        self.assertEqual(len(filtered), 0)
+        filtered = FilterPipeline([filter_chants_without_notes]).apply(
+            self.chants, logger=False)
+        self.assertListEqual(list(filtered.index), [7, 5, 1, 2, 4])
+
+    def test_add(self):
+        pipeline = FilterPipeline()
+        pipeline.add(filter_chants_by_genre, exclude=['genre_a'])
+        mask = pipeline.mask(self.chants)
+        self.assertListEqual(list(mask), [False] * 3 + [True] + [False] * 3)
+        with self.assertRaises(ValueError):
+            pipeline.add(sample_one_chant_per_mode_and_cantus_id)
+
+def sample_with_queries(chants, random_state=0):
+    """The original, query-based implementation of 
+    sample_one_chant_per_mode_and_cantus_id"""
+    ids = []
+    seed = random_state
+    unique_cantus_ids = chants['cantus_id'].unique()
+    for cantus_id in unique_cantus_ids:
+        subset = chants.query(f'cantus_id=="{cantus_id}"')
+        modes = subset['mode'].unique()
+        for mode in modes:
+            chant = subset.query(f'mode=="{mode}"').sample(random_state=seed)
+            ids.append(chant.index[0])
+            seed += 1
+    return chants.loc[ids, :]
+
+class TestSampleOneChantPerModeAndCantusId(unittest.TestCase):
+
+    def test_same_as_queries(self):
+        rng = np.random.default_rng(0)
+        num_chants = 500
+        cantus_ids = rng.integers(0, 60, size=num_chants).astype(str).astype(object)
+        cantus_ids[rng.random(num_chants) < 0.05] = None
+        chants = pd.DataFrame({
+            'cantus_id': cantus_ids,
+            'mode': rng.choice(['1', '2', '3', '7', '8'], size=num_chants),
+        }, index=rng.permutation(num_chants) + 1000)
+        for random_state in [0, 3]:
+            sampled = sample_one_chant_per_mode_and_cantus_id(
+                chants, random_state=random_state, logger=False)
+            target = sample_with_queries(chants, random_state=random_state)
+            self.assertTrue(sampled.equals(target))
+
+    def test_empty(self):
+        chants = pd.DataFrame({'cantus_id': [None], 'mode': ['1']})
+        sampled = sample_one_chant_per_mode_and_cantus_id(chants, logger=False)
+        self.assertEqual(len(sampled), 0)
+
+if __name__ == '__main__':
+    unittest.main()
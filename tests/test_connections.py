@@ -0,0 +1,184 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from collections import Counter
+from src.connections import *
+
+def random_connections(num_chants=300, seed=0):
+    rng = np.random.RandomState(seed)
+    pitches = rng.choice([60., 62., 64., 65., 67.], size=(num_chants, 30))
+    lengths = rng.randint(3, 16, size=num_chants)
+    for i, length in enumerate(lengths):
+        pitches[i, :15 - length] = np.nan
+    connections = pd.DataFrame(pitches, columns=range(-15, 15),
+        index=[f'chant_{i}' for i in range(num_chants)])
+    connections.insert(0, 'mode', rng.choice(['1', '2', '3'], size=num_chants))
+    connections.insert(1, 'siglum', 'A')
+    return connections
+
+def entropy_with_counter(connections, mode, start, window):
+    subset = connections[connections['mode'] == mode]
+    columns = list(range(start, start + window))
+    counts = Counter(tuple(np.nan_to_num(row, nan=-1)) 
+                     for row in subset[columns].values)
+    probs = np.array(list(counts.values())) / len(subset)
+    return -(probs * np.log2(probs)).sum()
+
+class TestWindowEntropies(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = random_connections()
+
+    def test_window_keys(self):
+        keys = window_keys(self.connections, window=2, starts=[-15, 0])
+        self.assertEqual(keys.shape, (2, 300))
+        pitches = self.connections[[-15, -14, 0, 1]].fillna(0).values
+        windows = [tuple(row[:2]) for row in pitches] + [tuple(row[2:]) for row in pitches]
+        self.assertEqual(len(set(windows)), len(np.unique(keys)))
+        key_of = {}
+        for window, key in zip(windows, keys.ravel()):
+            self.assertEqual(key_of.setdefault(window, key), key)
+
+    def test_same_as_counter(self):
+        for window in [1, 4, 12]:
+            entropies = window_entropies(self.connections, window=window)
+            self.assertEqual(len(entropies), 31 - window)
+            self.assertListEqual(list(entropies.columns), ['1', '2', '3'])
+            for start in [-15, -2, 15 - window]:
+                for mode in ['1', '3']:
+                    self.assertAlmostEqual(entropies.loc[start, mode],
+                        entropy_with_counter(self.connections, mode, start, window))
+
+    def test_modes(self):
+        entropies = window_entropies(self.connections, starts=[-4, 0], 
+            modes=['2', '8'])
+        self.assertListEqual(list(entropies.index), [-4, 0])
+        self.assertTrue(np.isnan(entropies['8']).all())
+        self.assertAlmostEqual(entropies.loc[0, '2'], 
+            entropy_with_counter(self.connections, '2', 0, 4))
+        with self.assertRaises(ValueError):
+            window_entropies(self.connections, window=4, starts=[12])
+
+    def test_bootstrap(self):
+        samples = bootstrap_window_entropies(self.connections, window=2, 
+            starts=[-1, 0], num_samples=20)
+        self.assertEqual(samples.shape, (20, 2, 3))
+        again = bootstrap_window_entropies(self.connections, window=2, 
+            starts=[-1, 0], num_samples=20)
+        self.assertTrue(np.array_equal(samples, again))
+        entropies = window_entropies(self.connections, window=2, starts=[-1, 0])
+        self.assertTrue(np.all(np.abs(samples.mean(axis=0) - entropies.values) < 0.5))
+
+class TestConnectionTable(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = random_connections()
+
+    def test_from_frame(self):
+        table = ConnectionTable.from_frame(self.connections)
+        self.assertEqual(table.intervals.dtype, np.int8)
+        self.assertListEqual(list(table.positions), list(range(-15, 15)))
+        valid = self.connections[list(range(-15, 15))].notnull().values
+        self.assertTrue(np.array_equal(table.valid, valid))
+        self.assertEqual(table.intervals[0, -1], 
+            self.connections[14].iloc[0] - MODE_FINALS[int(table.modes[0])])
+        pitches = table.pitches(fill_value=0)
+        target = self.connections[list(range(-15, 15))].fillna(0).values
+        self.assertTrue(np.array_equal(pitches, target))
+        differentia_lengths, opening_lengths = table.lengths()
+        self.assertTrue(np.array_equal(differentia_lengths, valid[:, :15].sum(1)))
+        self.assertTrue(np.all(opening_lengths == 15))
+        pd.testing.assert_frame_equal(table.to_frame(), self.connections,
+            check_dtype=False, check_names=False)
+
+        connections = self.connections.copy()
+        connections.loc['chant_0', 'mode'] = '9'
+        with self.assertRaises(ValueError):
+            ConnectionTable.from_frame(connections)
+
+    def test_save_and_load(self):
+        table = ConnectionTable.from_frame(self.connections)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'connections.npz')
+            write_connections(self.connections, path)
+            loaded = read_connections(path)
+            self.assertIsInstance(loaded.intervals, np.memmap)
+            pd.testing.assert_frame_equal(loaded.to_frame(), 
+                self.connections, check_dtype=False, check_names=False)
+            del loaded
+
+            csv_path = os.path.join(tmp_dir, 'connections.csv')
+            write_connections(table, csv_path)
+            from_csv = read_connections(csv_path)
+            self.assertTrue(np.array_equal(from_csv.intervals, table.intervals))
+            self.assertTrue(np.array_equal(from_csv.packed_valid, 
+                table.packed_valid))
+
+    def test_window_entropies(self):
+        table = ConnectionTable.from_frame(self.connections)
+        entropies = window_entropies(table, window=3)
+        target = window_entropies(self.connections, window=3)
+        self.assertTrue(np.allclose(entropies.values, target.values))
+        subset = table.select(table.modes == '2')
+        self.assertEqual(len(subset), (self.connections['mode'] == '2').sum())
+        self.assertListEqual(list(window_entropies(subset).columns), ['2'])
+
+def distribution_with_counter(connections, suffix, opening_length, by):
+    columns = list(range(-len(suffix), 0))
+    pitches = connections[columns].fillna(-1).values
+    matches = connections[(pitches == suffix).all(axis=1)]
+    counts = Counter()
+    for _, row in matches.iterrows():
+        opening = tuple(None if np.isnan(p) else int(p) 
+                        for p in row[list(range(opening_length))])
+        counts[tuple(row[by]) + (opening,)] += 1
+    return counts
+
+class TestConnectionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = random_connections(num_chants=500)
+        self.connections[list(range(-15, 15))] -= 3
+        self.index = ConnectionIndex(self.connections, max_suffix=4, 
+            opening_length=2)
+
+    def test_distribution(self):
+        for suffix in [[], [57], [62, 61], [59, 57, 64, 62]]:
+            for by in [['mode', 'siglum'], ['mode'], []]:
+                df = self.index.distribution(suffix, by=by)
+                target = distribution_with_counter(self.connections, suffix, 
+                    opening_length=2, by=by)
+                counts = {tuple(row[by]) + (row['opening'],): row['count']
+                          for _, row in df.iterrows()}
+                self.assertDictEqual(counts, dict(target))
+        table = ConnectionTable.from_frame(self.connections)
+        index = ConnectionIndex(table, max_suffix=4, opening_length=2)
+        self.assertTrue(index.distribution([62, 61]).equals(
+            self.index.distribution([62, 61])))
+
+    def test_missing_pitches(self):
+        short = self.connections[self.connections[-4].isnull()].iloc[0]
+        suffix = [None] + list(short[[-3, -2, -1]].astype(int))
+        df = self.index.distribution(suffix, by=[])
+        target = distribution_with_counter(self.connections, 
+            [-1] + suffix[1:], opening_length=2, by=[])
+        self.assertGreater(df['count'].sum(), 0)
+        self.assertEqual(df['count'].sum(), sum(target.values()))
+        self.assertEqual(len(self.index.distribution([100])), 0)
+        with self.assertRaises(ValueError):
+            self.index.distribution([57] * 5)
+
+    def test_entropy(self):
+        probs = self.index.probabilities([61], by='mode')
+        totals = probs.groupby('mode')['probability'].sum()
+        self.assertTrue(np.allclose(totals, 1))
+        entropies = self.index.entropy([61], by='mode')
+        for mode, group in probs.groupby('mode'):
+            p = group['probability'].values
+            self.assertAlmostEqual(entropies[mode], -(p * np.log2(p)).sum())
+        self.assertIsInstance(self.index.entropy([61], by=[]), float)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from src.contour_io import read_contours
+from src.contour_corpus import build_contour_corpus
+from src.contour_corpus import ContourCorpus
+from src.contours import normalized_contours
+
+class TestContourCorpus(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.datasets = ['liber-kyries', 'liber-tracts']
+        build_contour_corpus(cls.datasets, corpus_dir=cls.tmp_dir.name)
+        cls.corpus = ContourCorpus(cls.tmp_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def load(self, dataset, kind, subset=False):
+        suffix = '-subset' if subset else ''
+        return read_contours(
+            f'data/phrase-contours/{dataset}-{kind}-contours{suffix}.csv')
+
+    def test_datasets(self):
+        self.assertIsInstance(self.corpus.pitches, np.memmap)
+        self.assertEqual(self.corpus.pitches.dtype, np.int8)
+        self.assertListEqual(sorted(self.corpus.datasets), [
+            'liber-kyries', 'liber-kyries-random',
+            'liber-tracts', 'liber-tracts-random'])
+        for dataset in self.datasets:
+            df = self.load(dataset, 'phrase')
+            pitches = self.corpus.contours(dataset)
+            self.assertTrue(np.array_equal(pitches, df.iloc[:, 4:].values))
+
+    def test_subset(self):
+        df = self.load('liber-tracts', 'random', subset=True)
+        pitches = self.corpus.contours('liber-tracts-random', subset=True)
+        self.assertEqual(len(pitches), len(df))
+        self.assertTrue(np.array_equal(
+            self.corpus.normalized('liber-tracts-random', subset=True),
+            normalized_contours(df)))
+
+    def test_rows(self):
+        df = self.load('liber-kyries', 'phrase')
+        song_id = df['song_id'].iloc[10]
+        rows = self.corpus.rows('liber-kyries', song_id)
+        index = self.corpus.index.iloc[rows]
+        self.assertListEqual(list(index['contour_id']),
+            list(df.index[df['song_id'] == song_id]))
+
+        phrase_num = index['phrase_num'].iloc[-1]
+        row = self.corpus.rows('liber-kyries', song_id, phrase_num)
+        self.assertEqual(row.stop - row.start, 1)
+        self.assertEqual(self.corpus.index['phrase_num'].iloc[row.start],
+            phrase_num)
+
+    def test_chunked_normalization(self):
+        expected = normalized_contours(self.corpus.pitches)
+        out = np.empty(expected.shape)
+        normalized = self.corpus.normalized(chunk_size=123, out=out)
+        self.assertIs(normalized, out)
+        self.assertTrue(np.array_equal(normalized, expected))
+        mean = self.corpus.mean_normalized_contour(chunk_size=123)
+        self.assertTrue(np.allclose(mean, expected.mean(axis=0)))
+
+    def test_pitch_range(self):
+        df = self.load('liber-kyries', 'phrase')
+        df['49'] = df['49'].astype(float)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for value in [60.5, 200]:
+                df.loc[df.index[0], '49'] = value
+                for suffix in ['', '-subset']:
+                    df.to_csv(os.path.join(tmp_dir, 
+                        f'test-phrase-contours{suffix}.csv'))
+                with self.assertRaises(ValueError):
+                    build_contour_corpus(['test'], include_random=False,
+                        contours_dir=tmp_dir, corpus_dir=tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.contour_index import ContourIndex
+from src.contours import normalized_contours
+
+def random_walks(num_contours, num_samples=50, seed=0):
+    rng = np.random.RandomState(seed)
+    steps = rng.choice([-2, -1, 0, 0, 0, 1, 2], size=(num_contours, num_samples))
+    return 60 + np.cumsum(steps, axis=1)
+
+class TestContourIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.contours = random_walks(500)
+        self.queries = random_walks(40, seed=1)
+        normalized = normalized_contours(self.contours)
+        queries = normalized_contours(self.queries)
+        self.distances = np.sqrt(((normalized[np.newaxis, :, :]
+            - queries[:, np.newaxis, :]) ** 2).sum(axis=2))
+
+    def test_exact_query(self):
+        index = ContourIndex(self.contours, num_components=4)
+        distances, positions = index.query(self.queries, k=5, candidates=10,
+            exact=True)
+        self.assertEqual(distances.shape, (40, 5))
+        target = np.sort(self.distances, axis=1)[:, :5]
+        self.assertTrue(np.allclose(distances, target))
+        self.assertTrue(np.allclose(distances, np.take_along_axis(
+            self.distances, positions, axis=1)))
+
+        distances, positions = index.query(self.contours[7])
+        self.assertListEqual(list(positions[:, 0]), [7])
+        self.assertAlmostEqual(distances[0, 0], 0)
+
+    def test_query_radius(self):
+        index = ContourIndex(self.contours, num_components=4)
+        radius = np.median(self.distances)
+        distances, positions = index.query_radius(self.queries, radius)
+        for i in range(len(self.queries)):
+            target = np.flatnonzero(self.distances[i] <= radius)
+            self.assertListEqual(sorted(positions[i]), list(target))
+            self.assertTrue(np.all(np.diff(distances[i]) >= 0))
+
+    def test_add(self):
+        df = pd.DataFrame(self.contours[300:],
+            columns=[str(i) for i in range(50)],
+            index=[f'contour-{i}' for i in range(300, 500)])
+        index = ContourIndex(self.contours[:300], num_components=4)
+        index.add(df)
+        self.assertEqual(len(index), 500)
+        self.assertEqual(index.labels[299], 299)
+        self.assertEqual(index.labels[300], 'contour-300')
+
+        distances, positions = index.query(self.queries, k=3, exact=True)
+        target = np.sort(self.distances, axis=1)[:, :3]
+        self.assertTrue(np.allclose(distances, target))
+        with self.assertRaises(ValueError):
+            index.add(self.contours[:2], labels=['a'])
+
+if __name__ == '__main__':
+    unittest.main()
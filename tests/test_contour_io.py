@@ -0,0 +1,46 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.contour_io import read_contours
+from src.contour_io import write_contours
+from src.contour_io import load_npz
+from src.contours import normalized_contours
+
+class TestContourIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df = read_contours(
+            'data/phrase-contours/liber-kyries-phrase-contours-subset.csv')
+        
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_npz_round_trip(self):
+        path = os.path.join(self.tmp_dir.name, 'contours.npz')
+        write_contours(self.df, path)
+        df = read_contours(path)
+        self.assertListEqual(list(df.index), list(self.df.index))
+        self.assertListEqual(list(df.columns), list(self.df.columns))
+        self.assertListEqual(list(df['song_id']), list(self.df['song_id']))
+        self.assertTrue(np.array_equal(df.iloc[:, 1:].values, 
+            self.df.iloc[:, 1:].values))
+        self.assertTrue(np.array_equal(normalized_contours(df), 
+            normalized_contours(self.df)))
+
+    def test_typed_and_memory_mapped(self):
+        path = os.path.join(self.tmp_dir.name, 'contours.npz')
+        write_contours(self.df, path)
+        arrays = load_npz(path)
+        self.assertIsInstance(arrays['pitches'], np.memmap)
+        self.assertEqual(arrays['pitches'].dtype, np.int8)
+        self.assertEqual(arrays['pitches'].shape, (len(self.df), 50))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            write_contours(self.df, os.path.join(self.tmp_dir.name, 'a.txt'))
+
+if __name__ == '__main__':
+    unittest.main()
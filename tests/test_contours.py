@@ -1,7 +1,41 @@
 import unittest
+import os
+import tempfile
+import time
 import numpy as np
+import pandas as pd
 from music21 import converter
 from src.contours import interpolate_stream
+from src.contours import extract_phrase_contours
+from src.contours import extract_phrases_from_file
+from src.contours import iter_phrase_contours
+from src.contours import write_phrase_contours
+from src.contours import interpolate_batch
+from src.contours import interpolate_phrases
+from src.contours import random_contour_bands
+from src.contours import _iter_parallel
+from src.note_tables import NoteTable
+
+_GABC_CHANTS = [
+    '(c4) A(dc)B(c,) C(dc) (::)',
+    '(c4) A(fg)B(h;) C(gf) D(e) (::)',
+    '(c4) (,) A(d) (::)',
+    '(c4) A(hg)B(fgh:) C(dc/ef) D(d.) (::)',
+]
+
+def write_gabc_files(dirname):
+    filepaths = []
+    for i, gabc in enumerate(_GABC_CHANTS):
+        filepath = os.path.join(dirname, f'{i:0>5}.gabc')
+        with open(filepath, 'w') as handle:
+            handle.write(f'name:Test {i};\n%%\n{gabc}')
+        filepaths.append(filepath)
+    return filepaths
+
+def touch(path):
+    time.sleep(0.005)
+    open(path, 'w').close()
+    return path
 
 class TestContourInterpolation(unittest.TestCase):
 
@@ -41,5 +75,111 @@ class TestContourInterpolation(unittest.TestCase):
             ys = interpolate_stream(s, num_samples=N)
             self.assertEqual(len(ys), N)
 
+class TestBatchInterpolation(unittest.TestCase):
+
+    def setUp(self):
+        self.streams = [
+            converter.parse('tinyNotation: C D E F'),
+            converter.parse('tinyNotation: C4. D8 E16 F16 G8'),
+            converter.parse('tinyNotation: C4 r4 D4 r4 r4'),
+            converter.parse('tinyNotation: r4 C4 D8 r8'),
+        ]
+        tables = [NoteTable.from_stream(s) for s in self.streams]
+        self.table = NoteTable.concatenate(tables)
+
+    def test_identical_to_interpolate_stream(self):
+        for num_samples in [1, 4, 5, 12, 50]:
+            targets = [interpolate_stream(s, num_samples=num_samples)
+                       for s in self.streams]
+            contours = interpolate_phrases(self.table, num_samples=num_samples)
+            self.assertEqual(contours.shape, (len(targets), num_samples))
+            for ys, target in zip(contours, targets):
+                self.assertListEqual(list(ys), list(target))
+
+    def test_phrase_starting_with_rest(self):
+        contours = interpolate_batch([0, 2], [1, 2], [48, 50], [3], 
+            num_samples=4)
+        self.assertListEqual(list(contours[0]), [48, 48, 50, 50])
+
+    def test_empty_phrase(self):
+        with self.assertRaises(ValueError):
+            interpolate_batch([0, 2, 2], [0, 1], [48, 50], [2, 1])
+
+class TestExtractPhraseContours(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepaths = write_gabc_files(self.tmp_dir.name)
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_extract_phrase_contours(self):
+        df = extract_phrase_contours(self.filepaths, num_samples=10)
+        self.assertListEqual(list(df.index), 
+            ['001', '002', '003', '004', '005', '006'])
+        # The third chant contains an empty phrase and is skipped entirely
+        self.assertListEqual(list(df['song_id']), 
+            ['00000', '00000', '00001', '00001', '00003', '00003'])
+        self.assertListEqual(list(df['phrase_length']), [3, 2, 3, 3, 5, 5])
+        self.assertListEqual(list(df.loc['001', 0:]), [62]*3 + [60]*7)
+
+    def test_extract_phrases_from_file(self):
+        phrases = extract_phrases_from_file(self.filepaths[0])
+        self.assertEqual(len(phrases), 2)
+        self.assertEqual(len(phrases[0].recurse().notes), 3)
+        df = extract_phrase_contours(self.filepaths, num_samples=10,
+            extractor=extract_phrases_from_file)
+        pd.testing.assert_frame_equal(df, 
+            extract_phrase_contours(self.filepaths, num_samples=10))
+
+    def test_random_contour_bands(self):
+        bands = random_contour_bands(self.filepaths, lam=2, num_replicates=20,
+            num_samples=10)
+        self.assertEqual(bands['mean'].shape, (10,))
+        self.assertEqual(bands['bands'].shape, (2, 10))
+        self.assertEqual(bands['replicate_means'].shape, (20, 10))
+        self.assertTrue(np.all(bands['bands'][0] <= bands['bands'][1]))
+
+        # Replicates do not depend on the number of replicates
+        fewer = random_contour_bands(self.filepaths, lam=2, num_replicates=5,
+            num_samples=10)
+        self.assertTrue(np.array_equal(fewer['replicate_means'], 
+            bands['replicate_means'][:5]))
+
+    def test_workers(self):
+        serial = extract_phrase_contours(self.filepaths, num_samples=10)
+        parallel = extract_phrase_contours(self.filepaths, num_samples=10, 
+            workers=2)
+        self.assertTrue(serial.equals(parallel))
+
+    def test_stop_parallel_extraction(self):
+        paths = [os.path.join(self.tmp_dir.name, f'{i}.txt') for i in range(400)]
+        results = _iter_parallel(touch, paths, workers=2, chunksize=5)
+        self.assertListEqual([next(results) for _ in range(3)], paths[:3])
+        # The queued files are cancelled
+        results.close()
+        num_processed = sum(os.path.exists(path) for path in paths)
+        self.assertLessEqual(num_processed, 50)
+        results = _iter_parallel(touch, paths, workers=2, chunksize=5)
+        self.assertListEqual(list(results), paths)
+
+    def test_iter_phrase_contours(self):
+        df = extract_phrase_contours(self.filepaths, num_samples=10)
+        batches = list(iter_phrase_contours(self.filepaths, num_samples=10,
+            batch_size=3))
+        # The contours of a file are never split over batches
+        self.assertListEqual([len(batch) for batch in batches], [4, 2])
+        self.assertTrue(pd.concat(batches).equals(df))
+
+    def test_write_phrase_contours(self):
+        df = extract_phrase_contours(self.filepaths, num_samples=10)
+        path = os.path.join(self.tmp_dir.name, 'contours.csv')
+        num_contours = write_phrase_contours(self.filepaths, path,
+            num_samples=10, batch_size=1)
+        self.assertEqual(num_contours, 6)
+        with open(path, 'r') as handle:
+            self.assertEqual(handle.read(), df.to_csv())
+
 if __name__ == '__main__':
     unittest.main()    
\ No newline at end of file
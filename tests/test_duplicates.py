@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.duplicates import *
+
+class TestHashes(unittest.TestCase):
+
+    def test_contour_hashes(self):
+        pitches = np.array([[60, 62, 64], [60, 62, 64], [62, 64, 66],
+                            [60, 62, 64.4]])
+        hashes = contour_hashes(pitches)
+        self.assertEqual(hashes.dtype, np.uint64)
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertEqual(len(set(hashes)), 3)
+        self.assertTrue(np.array_equal(hashes[:3],
+            contour_hashes(pitches[:3].astype(np.int8))))
+
+        transposed = contour_hashes(pitches, transpose=True)
+        self.assertEqual(len(set(transposed)), 2)
+        rounded = contour_hashes(pitches, transpose=True, resolution=1)
+        self.assertEqual(len(set(rounded)), 1)
+
+    def test_volpiano_hashes(self):
+        volpianos = pd.Series(['1---f-g---3', '1---fg', '1---F-g', None,
+            np.nan, '1---I-g'])
+        hashes = volpiano_hashes(volpianos)
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertNotEqual(hashes[0], hashes[2])
+        self.assertEqual(hashes[3], hashes[4])
+        near = volpiano_hashes(volpianos, ignore_liquescents=True)
+        self.assertEqual(near[0], near[2])
+        self.assertNotEqual(near[0], near[5])
+
+class TestDuplicateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.contours = pd.DataFrame({
+            'song_id': ['a', 'a', 'b', 'c', 'c'],
+            'phrase_num': [0, 1, 0, 0, 1],
+            'phrase_length': [3, 3, 3, 3, 3],
+            'phrase_duration': [3., 3., 3., 3., 3.],
+            '0': [60, 62, 60, 60, 62],
+            '1': [62, 64, 62, 62, 64],
+        }, index=pd.Index(['c1', 'c2', 'c3', 'c4', 'c5'], name='contour_id'))
+
+    def test_duplicates(self):
+        index = DuplicateIndex.from_contours(self.contours)
+        target = self.contours.iloc[:, 4:].duplicated()
+        self.assertListEqual(list(index.duplicated()), list(target))
+        self.assertListEqual(list(index.unique_index()), ['c1', 'c2'])
+        self.assertListEqual(list(index.members('c4')), ['c1', 'c3', 'c4'])
+        self.assertListEqual(list(index.group_ids), [0, 1, 0, 0, 1])
+
+        groups = index.groups()
+        self.assertListEqual(list(groups['size']), [3, 2])
+        self.assertListEqual(list(groups['first']), ['c1', 'c2'])
+        self.assertListEqual(list(index.duplicated(keep=False)), [True] * 5)
+
+    def test_save_and_load(self):
+        index = DuplicateIndex.from_contours(self.contours)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'index.npz')
+            index.save(path)
+            loaded = DuplicateIndex.load(path)
+        self.assertTrue(np.array_equal(loaded.hashes, index.hashes))
+        self.assertTrue(loaded.index.equals(self.contours.index))
+        self.assertEqual(loaded.index.name, 'contour_id')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+import os
+import json
+import tempfile
+import pandas as pd
+from unittest import mock
+from src.generate_contours import update_contour_data
+from src.generate_contours import generate_contour_data
+from src.generate_contours import generate_gregobase_contour_data
+from src.generate_contours import generate_all_gregobase_contour_data
+from src.gregobase_corpus import GregoBaseCorpus
+from tests.test_contours import write_gabc_files
+
+class TestIncrementalUpdate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.gabc_dir = os.path.join(self.tmp_dir.name, 'gabc')
+        self.output_dir = os.path.join(self.tmp_dir.name, 'output')
+        os.makedirs(self.gabc_dir)
+        os.makedirs(self.output_dir)
+        self.filepaths = write_gabc_files(self.gabc_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def load(self, output_dir, kind='phrase'):
+        return pd.read_csv(os.path.join(output_dir, 
+            f'test-{kind}-contours.csv'), index_col=0, dtype={'song_id': str})
+
+    def test_update(self):
+        update_contour_data('test', self.filepaths, 
+            output_dir=self.output_dir)
+        phrases = self.load(self.output_dir)
+        self.assertListEqual(list(phrases.index), 
+            ['test-00000-000', 'test-00000-001', 'test-00001-000', 
+             'test-00001-001', 'test-00003-000', 'test-00003-001'])
+        
+        # Change one file and remove another
+        with open(self.filepaths[1], 'w') as handle:
+            handle.write('name:Changed;\n%%\n(c4) A(g) B(h) (::)')
+        filepaths = [fp for i, fp in enumerate(self.filepaths) if i != 3]
+        update_contour_data('test', filepaths, output_dir=self.output_dir)
+        updated = self.load(self.output_dir)
+        self.assertListEqual(list(updated.index), 
+            ['test-00000-000', 'test-00000-001', 'test-00001-000'])
+        self.assertTrue(updated.loc['test-00000-000'].equals(
+            phrases.loc['test-00000-000']))
+        self.assertListEqual(list(updated.loc['test-00001-000'][4:]), 
+            [67] * 25 + [69] * 25)
+
+        # The result equals that of a fresh run (given the same lambda)
+        with open(os.path.join(self.output_dir, 'test-manifest.json')) as h:
+            manifest = json.load(h)
+        self.assertListEqual(sorted(manifest['files'].keys()), 
+            ['00000', '00001', '00002'])
+        self.assertListEqual(manifest['files']['00002']['phrase_contours'], [])
+        
+        fresh_dir = os.path.join(self.tmp_dir.name, 'fresh')
+        os.makedirs(fresh_dir)
+        with open(os.path.join(fresh_dir, 'test-manifest.json'), 'w') as h:
+            json.dump(dict(manifest, files={}), h)
+        update_contour_data('test', filepaths, output_dir=fresh_dir)
+        for kind in ['phrase', 'random']:
+            pd.testing.assert_frame_equal(self.load(self.output_dir, kind), 
+                self.load(fresh_dir, kind))
+
+class TestGenerateContourData(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepaths = write_gabc_files(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_streaming(self):
+        streamed_dir = os.path.join(self.tmp_dir.name, 'streamed')
+        in_memory_dir = os.path.join(self.tmp_dir.name, 'in-memory')
+        os.makedirs(streamed_dir)
+        os.makedirs(in_memory_dir)
+        generate_contour_data('test', self.filepaths, output_dir=streamed_dir)
+        generate_contour_data('test', self.filepaths, 
+            output_dir=in_memory_dir, formats=['csv', 'npz'])
+        filenames = sorted(os.listdir(streamed_dir))
+        self.assertEqual(len(filenames), 4)
+        for filename in filenames:
+            with open(os.path.join(streamed_dir, filename)) as handle:
+                streamed = handle.read()
+            with open(os.path.join(in_memory_dir, filename)) as handle:
+                self.assertEqual(streamed, handle.read())
+        subset = pd.read_csv(os.path.join(streamed_dir, 
+            'test-phrase-contours-subset.csv'))
+        self.assertEqual(len(subset), 2)
+
+class TestAllGenres(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        corpus_dir = os.path.join(self.tmp_dir.name, 'gregobasecorpus')
+        os.makedirs(os.path.join(corpus_dir, 'gabc'))
+        os.makedirs(os.path.join(corpus_dir, 'csv'))
+        write_gabc_files(os.path.join(corpus_dir, 'gabc'))
+        pd.DataFrame({'id': [0, 1, 2, 3], 'office_part': ['an', 'hy', 'an', 'hy']}
+            ).to_csv(os.path.join(corpus_dir, 'csv', 'chants.csv'), index=False)
+        pd.DataFrame({'id': [3], 'title': ['Liber Usualis']}
+            ).to_csv(os.path.join(corpus_dir, 'csv', 'sources.csv'), index=False)
+        pd.DataFrame({'chant_id': [0, 1, 2, 3], 'source': 3}).to_csv(
+            os.path.join(corpus_dir, 'csv', 'chant_sources.csv'), index=False)
+        self.corpus = GregoBaseCorpus(corpus_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_log(self, output_dir, genre):
+        with open(os.path.join(output_dir, f'liber-{genre}.log')) as handle:
+            # Strip the times and the output directory
+            return [line.split(' ', 3)[::3] for line in 
+                handle.read().replace(output_dir, '').splitlines()]
+
+    def test_shared_parsing(self):
+        genres = ['antiphons', 'hymns']
+        separate_dir = os.path.join(self.tmp_dir.name, 'separate')
+        shared_dir = os.path.join(self.tmp_dir.name, 'shared')
+        os.makedirs(separate_dir)
+        os.makedirs(shared_dir)
+        for genre in genres:
+            generate_gregobase_contour_data(genre, corpus=self.corpus,
+                output_dir=separate_dir)
+
+        from src.note_tables import converter
+        with mock.patch('src.note_tables.converter.parse', 
+            wraps=converter.parse) as parse:
+            generate_all_gregobase_contour_data(genres, corpus=self.corpus,
+                output_dir=shared_dir)
+            self.assertEqual(parse.call_count, 4)
+
+        self.assertListEqual(sorted(os.listdir(separate_dir)), 
+            sorted(os.listdir(shared_dir)))
+        for filename in os.listdir(separate_dir):
+            if filename.endswith('.csv'):
+                separate = pd.read_csv(os.path.join(separate_dir, filename))
+                shared = pd.read_csv(os.path.join(shared_dir, filename))
+                pd.testing.assert_frame_equal(separate, shared)
+        for genre in genres:
+            log = self.read_log(shared_dir, genre)
+            self.assertListEqual(log, self.read_log(separate_dir, genre))
+            self.assertIn(['INFO', f'Generating contour dataset: liber-{genre}'],
+                log)
+
+if __name__ == '__main__':
+    unittest.main()
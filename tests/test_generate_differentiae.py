@@ -0,0 +1,51 @@
+import unittest
+import tempfile
+import pandas as pd
+from src.generate_differentiae import extract_connections
+from src.parse_cache import ParseCache
+
+class TestExtractConnections(unittest.TestCase):
+
+    def setUp(self):
+        volpianos = [
+            '1---fg---h--ij-h---g-f---3---h-g-f-g---4---fgh-g-f---3',
+            '1---f---3---g---4',
+            '1---gh---j---k-j-h---3---g-h-j---4---h-g-f-gh-g---3',
+        ]
+        self.antiphons = pd.DataFrame({
+            'volpiano': volpianos * 3,
+            'full_text_manuscript': ['Ave Maria gratia plena E u o u a e'] * 9,
+            'mode': ['1', '2', '3'] * 3,
+            'siglum': ['A'] * 9,
+        }, index=[f'id{i}' for i in range(9)])
+
+    def test_extract_connections(self):
+        connections = extract_connections(self.antiphons)
+        # The second antiphon is too short
+        self.assertListEqual(list(connections.index), 
+            ['id0', 'id2', 'id3', 'id5', 'id6', 'id8'])
+        self.assertEqual(connections.shape[1], 2 + 2 * 15)
+
+    def test_workers(self):
+        serial = extract_connections(self.antiphons)
+        with self.assertLogs(level='WARNING') as logs:
+            parallel = extract_connections(self.antiphons, workers=2, 
+                chunk_size=2)
+        self.assertTrue(serial.equals(parallel))
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn('id1', logs.output[0])
+
+    def test_volpiano_parser(self):
+        connections = extract_connections(self.antiphons)
+        decoded = extract_connections(self.antiphons, parser='volpiano')
+        self.assertTrue(connections.equals(decoded))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ParseCache(tmp_dir)
+            for _ in range(2):
+                cached = extract_connections(self.antiphons, cache=cache)
+                self.assertTrue(connections.equals(cached))
+        with self.assertRaises(ValueError):
+            extract_connections(self.antiphons, parser='music21')
+
+if __name__ == '__main__':
+    unittest.main()
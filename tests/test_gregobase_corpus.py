@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.gregobase_corpus import GregoBaseCorpus
+from src.gregobase_corpus import LIBER_USUALIS
+
+class TestGregoBaseCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        csv_dir = os.path.join(self.tmp_dir.name, 'csv')
+        os.makedirs(csv_dir)
+        pd.DataFrame({
+            'id': [1, 2, 3, 4, 5, 6],
+            'incipit': ['Alma', 'Ave', 'Veni', 'Kyrie', 'Puer', 'Salve'],
+            'office_part': ['an', 'an', 'hy', 'ky', 'in', None],
+        }).to_csv(os.path.join(csv_dir, 'chants.csv'), index=False)
+        pd.DataFrame({
+            'id': [2, 3],
+            'title': ['Antiphonale', 'Liber Usualis'],
+        }).to_csv(os.path.join(csv_dir, 'sources.csv'), index=False)
+        pd.DataFrame({
+            'chant_id': [1, 2, 2, 3, 4, 6, 7],
+            'source': [3, 3, 2, 3, 2, 3, 3],
+            'page': [1, 2, 3, 4, 5, 6, 7],
+        }).to_csv(os.path.join(csv_dir, 'chant_sources.csv'), index=False)
+        self.corpus = GregoBaseCorpus(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chant_ids(self):
+        corpus = self.corpus
+        self.assertListEqual(list(corpus.chant_ids()), [1, 2, 3, 4, 5, 6])
+        self.assertListEqual(list(corpus.chant_ids(genre='antiphons')), [1, 2])
+        self.assertListEqual(list(corpus.chant_ids(source=LIBER_USUALIS)),
+            [1, 2, 3, 6])
+        self.assertListEqual(list(corpus.chant_ids(genre='kyries',
+            source=LIBER_USUALIS)), [])
+        self.assertListEqual(list(corpus.chant_ids(genre='hymns', source=3)),
+            [3])
+        self.assertListEqual(list(corpus.chant_ids(genre='tracts')), [])
+        self.assertListEqual(list(corpus.chant_ids(source=1)), [])
+        with self.assertRaises(ValueError):
+            corpus.chant_ids(genre='an')
+
+    def test_filepaths(self):
+        filepaths = self.corpus.filepaths(genre='antiphons', source=3)
+        gabc_dir = os.path.join(self.tmp_dir.name, 'gabc')
+        self.assertListEqual(filepaths, [os.path.join(gabc_dir, '00001.gabc'),
+            os.path.join(gabc_dir, '00002.gabc')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import tempfile
+import numpy as np
+from music21 import converter
+from src.note_tables import NoteTable
+from src.note_tables import parse_note_table
+from src.parse_cache import ParseCache
+
+class TestNoteTable(unittest.TestCase):
+
+    def setUp(self):
+        gabc = '(c4) A(dc~)B(c/e,) C(dc/fg) (::) D(h)'
+        self.chant = converter.parse(gabc, format='gabc')
+        self.table = NoteTable.from_chant(self.chant)
+
+    def test_phrases(self):
+        phrases = self.chant.phrases
+        self.assertEqual(self.table.num_phrases, len(phrases))
+        for phrase, table in zip(phrases, self.table.phrases()):
+            notes = phrase.recurse().notes
+            self.assertListEqual(list(table.onsets), 
+                [float(n.offset) for n in notes])
+            self.assertListEqual(list(table.pitches), 
+                [n.pitch.ps for n in notes])
+            self.assertEqual(table.duration, phrase.quarterLength)
+
+    def test_phrase_lengths(self):
+        lengths = [len(p.flat.notes) for p in self.chant.phrases]
+        self.assertListEqual(list(self.table.phrase_lengths()), lengths)
+
+    def test_from_stream(self):
+        s = converter.parse('tinyNotation: r4 C4 D8 r8')
+        table = NoteTable.from_stream(s)
+        self.assertListEqual(list(table.onsets), [1, 2])
+        self.assertEqual(table.duration, 3)
+
+    def test_trailing_notes(self):
+        # The final D(h) does not belong to any phrase
+        self.assertEqual(len(self.table), 9)
+        self.assertEqual(self.table.phrase_bounds[-1], 8)
+
+    def test_segment(self):
+        segment = self.table.segment(3, 6)
+        self.assertListEqual(list(segment.onsets), [0, 1, 2])
+        self.assertListEqual(list(segment.pitches), [64, 62, 60])
+        self.assertEqual(segment.duration, 3)
+
+    def test_rests(self):
+        table = NoteTable([0, 1, 2], [1, 1, 2], [60, np.nan, 62])
+        self.assertEqual(table.num_notes, 2)
+        self.assertEqual(table.duration, 4)
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ParseCache(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cached_note_table(self):
+        table = parse_note_table('notebooks/kyrie.gabc', cache=self.cache)
+        self.assertEqual(len(self.cache.entries()), 1)
+        cached = parse_note_table('notebooks/kyrie.gabc', cache=self.cache)
+        for key, value in table.to_arrays().items():
+            self.assertTrue(np.array_equal(value, cached.to_arrays()[key]))
+
+    def test_eviction(self):
+        arrays = dict(values=np.zeros(1000))
+        self.cache.put('a', arrays)
+        self.cache.max_size = 2.5 * self.cache.size()
+        self.cache.put('b', arrays)
+        self.cache.get('a')
+        self.cache.put('c', arrays)
+        self.assertTrue('a' in self.cache)
+        self.assertFalse('b' in self.cache)
+        self.assertTrue('c' in self.cache)
+
+if __name__ == '__main__':
+    unittest.main()
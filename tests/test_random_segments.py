@@ -10,6 +10,7 @@ import unittest
 import os
 import numpy as np
 from src.random_segments import poisson_segmentation
+from src.random_segments import poisson_segment_bounds
 from src.random_segments import extract_random_segments_from_file
 
 class TestPoissonSegmentation(unittest.TestCase):
@@ -52,5 +53,42 @@ class TestPoissonSegmentation(unittest.TestCase):
             mean_len = np.mean([len(s) for s in segments])
             self.assertAlmostEqual(mean_len, lam, delta=.2)
 
+class TestPoissonSegmentBounds(unittest.TestCase):
+
+    def test_with_first_and_final_segment(self):
+        starts, ends = poisson_segment_bounds(20, lam=3, 
+            omit_first_and_last=False, rng=0)
+        self.assertEqual(starts[0], 0)
+        self.assertEqual(ends[-1], 20)
+        self.assertListEqual(list(starts[1:]), list(ends[:-1]))
+
+    def test_without_first_and_final_segments(self):
+        starts, ends = poisson_segment_bounds(20, lam=1, 
+            omit_first_and_last=True, rng=0)
+        self.assertListEqual(list(starts), list(range(1, 19)))
+        self.assertListEqual(list(ends), list(range(2, 20)))
+
+    def test_large_lam(self):
+        starts, ends = poisson_segment_bounds(20, lam=200, 
+            omit_first_and_last=False, rng=0)
+        self.assertListEqual(list(starts), [0])
+        self.assertListEqual(list(ends), [20])
+        starts, ends = poisson_segment_bounds(20, lam=200, 
+            omit_first_and_last=True, rng=0)
+        self.assertEqual(len(starts), 0)
+
+    def test_reproducible(self):
+        starts1, _ = poisson_segment_bounds(1000, lam=5, 
+            rng=np.random.default_rng(1))
+        starts2, _ = poisson_segment_bounds(1000, lam=5, 
+            rng=np.random.default_rng(1))
+        self.assertListEqual(list(starts1), list(starts2))
+
+    def test_mean_close_to_lambda(self):
+        rng = np.random.default_rng(0)
+        for lam in range (5, 15, 2):
+            starts, ends = poisson_segment_bounds(10000, lam=lam, rng=rng)
+            self.assertAlmostEqual(np.mean(ends - starts), lam, delta=.2)
+
 if __name__ == '__main__':
     unittest.main()    
\ No newline at end of file
@@ -0,0 +1,174 @@
+import unittest
+import numpy as np
+import pandas as pd
+from music21 import converter
+import chant21
+from src.volpiano import decode_volpiano
+from src.volpiano import clean_volpiano
+from src.volpiano import clean_volpiano_batch
+from src.volpiano import expand_accidentals
+from src.volpiano import expand_accidentals_batch
+from src.volpiano import volpiano_features
+from src.volpiano import HAS_NOTES, HAS_ONLY_VOLPIANO_CHARS, HAS_F_CLEF
+from src.volpiano import STARTS_WITH_G_CLEF, HAS_MISSING_PITCHES
+from src.volpiano import HAS_WORD_BOUNDARY, HAS_VOLPIANO
+
+class TestCleanVolpiano(unittest.TestCase):
+
+    def test_boundaries(self):
+        bounds = dict(neume_boundary='.', syllable_boundary='-', 
+            word_boundary='$', keep_boundaries=True)
+        self.assertEqual(clean_volpiano('f-----g', **bounds), 'f$-g')
+        self.assertEqual(clean_volpiano('f--1-g', **bounds), 'f$g')
+        self.assertEqual(clean_volpiano('--f--', **bounds), '-f-')
+        self.assertEqual(clean_volpiano('f-', allowed_chars='f-'), 'f-')
+
+    def test_bars(self):
+        bounds = dict(neume_boundary='.', syllable_boundary='-', 
+            word_boundary='$', keep_boundaries=True, keep_bars=True)
+        self.assertEqual(clean_volpiano('f--3-g', **bounds), 'f|$g')
+        self.assertEqual(clean_volpiano('f---3-g', **bounds), 'f$|.g')
+        self.assertEqual(clean_volpiano('f-3--4-g', **bounds), 'f|$|.g')
+        self.assertEqual(clean_volpiano('f-3-3-3g', **bounds), 'f||$|g')
+        self.assertEqual(clean_volpiano('f3-3--g', **bounds), 'f||$g')
+        self.assertEqual(clean_volpiano('f----3--3-g', **bounds), 'f$|$|.g')
+        self.assertEqual(clean_volpiano('f3g', keep_bars=True, bar='||'), 'f||g')
+        self.assertEqual(clean_volpiano('f3g', keep_bars=True, 
+            allowed_chars='fg3'), 'f3g')
+
+    def test_batch(self):
+        volpianos = ['1---fg---h--ij-h-3-f-4', '', '-3--f', 'g-', '1---ij-j']
+        for kwargs in [{}, dict(keep_boundaries=True), dict(keep_bars=True),
+                       dict(keep_boundaries=True, keep_bars=True)]:
+            target = [clean_volpiano(v, **kwargs) for v in volpianos]
+            self.assertListEqual(clean_volpiano_batch(volpianos, **kwargs), 
+                                 target)
+        self.assertListEqual(clean_volpiano_batch([]), [])
+        self.assertListEqual(clean_volpiano_batch(['f\x00g', 'h']), ['fg', 'h'])
+
+class TestVolpianoAccessor(unittest.TestCase):
+
+    def setUp(self):
+        self.volpianos = pd.Series(
+            ['1---fg-ij---3', None, '1---3', '1---j--ij-I-j---4'], 
+            index=[10, 12, 11, 10], name='volpiano')
+
+    def test_clean(self):
+        clean = self.volpianos.vp.clean(keep_boundaries=True)
+        self.assertListEqual(list(clean.index), [10, 12, 11, 10])
+        self.assertEqual(clean.name, 'volpiano')
+        self.assertEqual(clean.iloc[0], clean_volpiano('1---fg-ij---3', 
+                                                      keep_boundaries=True))
+        self.assertTrue(pd.isnull(clean.iloc[1]))
+        self.assertEqual(clean.iloc[2], ' ')
+
+    def test_expand_accidentals(self):
+        expanded = self.volpianos.vp.expand_accidentals()
+        self.assertEqual(expanded.iloc[3], '1---j--ij--j---4')
+        self.assertTrue(pd.isnull(expanded.iloc[1]))
+
+    def test_notes(self):
+        contains_notes = self.volpianos.vp.contains_notes()
+        self.assertListEqual(list(contains_notes), [True, False, False, True])
+        counts = self.volpianos.vp.note_count(accidentals_are_notes=False)
+        self.assertListEqual(list(counts.fillna(-1)), [3, -1, 0, 3])
+
+class TestVolpianoFeatures(unittest.TestCase):
+
+    def assertFeature(self, volpianos, bit, targets):
+        features = volpiano_features(volpianos)
+        self.assertListEqual(list((features & bit) > 0), targets)
+
+    def test_features(self):
+        self.assertFeature(['1---f', '1---i', '', '(-'], HAS_NOTES, 
+                           [True, False, False, True])
+        self.assertFeature(['1---f', 'f&', 'f\n', '\nf', ''], 
+                           HAS_ONLY_VOLPIANO_CHARS, 
+                           [True, False, True, False, True])
+        self.assertFeature(['1---f', '2---f', 'f2'], HAS_F_CLEF, 
+                           [False, True, True])
+        self.assertFeature(['1---f', '2---1', '', '-1'], STARTS_WITH_G_CLEF,
+                           [True, False, False, False])
+        self.assertFeature(['6------6', 'f6------6-', '6-------6'], 
+                           HAS_MISSING_PITCHES, [True, True, False])
+
+    def test_patterns_within_strings(self):
+        self.assertFeature(['f--', '-g', 'f---', '--', '-', '---'], 
+                           HAS_WORD_BOUNDARY, 
+                           [False, False, True, False, False, True])
+        self.assertFeature(['6---', '---6', '6------', '6'], 
+                           HAS_MISSING_PITCHES, [False] * 4)
+
+    def test_accessor(self):
+        volpianos = pd.Series(['1---f', None, ''])
+        features = volpianos.vp.features()
+        self.assertListEqual(list(features & HAS_VOLPIANO > 0), 
+                             [True, False, True])
+        self.assertEqual(features[1], 0)
+
+class TestExpandAccidentals(unittest.TestCase):
+
+    def test_scopes(self):
+        self.assertEqual(expand_accidentals('ijyb-j-b-Yb-j'), 'ijyb-ij-yb-b-ij')
+        self.assertEqual(expand_accidentals('wef4e'), 'wef4e')
+        self.assertEqual(expand_accidentals('ijj3j', barlines='4'), 'ijij3ij')
+        self.assertEqual(expand_accidentals('xmiXm', omit_notes=True), 'xm')
+
+    def test_batch(self):
+        volpianos = ['ijjj', 'jj', 'ij3j', 'wIe', '', 'i']
+        for omit_notes in [False, True]:
+            target = [expand_accidentals(v, omit_notes=omit_notes) 
+                      for v in volpianos]
+            self.assertListEqual(
+                expand_accidentals_batch(volpianos, omit_notes=omit_notes), 
+                target)
+
+class TestDecodeVolpiano(unittest.TestCase):
+
+    def assertSameAsChant21(self, volpiano):
+        chant = converter.parse(volpiano, format='cantus')
+        target = [[n.pitch.midi for n in section.flat.notes] 
+                  for section in chant]
+        pitches, bounds = decode_volpiano(volpiano)
+        sections = [list(pitches[bounds[i]:bounds[i+1]]) 
+                    for i in range(len(bounds) - 1)]
+        self.assertListEqual(sections, target, volpiano)
+
+    def test_pitches(self):
+        pitches, bounds = decode_volpiano('1---9-8-s---4')
+        self.assertListEqual(list(pitches), [55, 53, 86])
+        self.assertListEqual(list(bounds), [0, 3])
+        self.assertSameAsChant21('2---a-h-j---4')
+        self.assertSameAsChant21('1---a---2---a---4')
+        self.assertSameAsChant21('1---FG-(---H---4')
+
+    def test_accidentals(self):
+        self.assertSameAsChant21('1---ij-b---j--j---b---4')
+        self.assertSameAsChant21('1---iIj---j---4')
+        self.assertSameAsChant21('1---wef---e---xmm---4')
+        self.assertSameAsChant21('1---ij-3-j')
+
+    def test_sections(self):
+        self.assertSameAsChant21('1---a---3---b---4')
+        self.assertSameAsChant21('1---a---3---b---4---')
+        self.assertSameAsChant21('1---a---3---4')
+        self.assertSameAsChant21('1---3---a---4')
+        self.assertSameAsChant21('1---a---4---b---4')
+        self.assertSameAsChant21('1---a-3---b---4')
+
+    def test_preprocessing(self):
+        self.assertSameAsChant21('1--a-b--c')
+        self.assertSameAsChant21('1---a----b')
+        self.assertSameAsChant21('1---a---33---b---5')
+        self.assertSameAsChant21('1---a7---b77---4')
+        self.assertSameAsChant21('1---a--6---------6--b---4')
+
+    def test_errors(self):
+        for volpiano in ['f-g', '1---a---34---b', '1---a6---b---4', '1---a---&']:
+            with self.assertRaises(Exception):
+                converter.parse(volpiano, format='cantus')
+            with self.assertRaises(ValueError):
+                decode_volpiano(volpiano)
+
+if __name__ == '__main__':
+    unittest.main()